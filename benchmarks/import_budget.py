@@ -0,0 +1,52 @@
+# Measures the cold-import cost of the headless engine and checks it never pulls in tkinter.
+# Run from the repository root with "python3 benchmarks/import_budget.py".
+
+# Imports.
+import os
+import statistics
+import subprocess
+import sys
+
+# Global Constants.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Median cold import of engine.py in a fresh interpreter, in milliseconds. Worker processes pay this on every spawn.
+IMPORT_BUDGET_MS = 3.0
+RUNS = 15
+# Each run is a brand new interpreter so nothing is cached in sys.modules. It starts normally (site and all), the way users run the tracker;
+# only the engine import itself is timed.
+PROBE = (
+    "import sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import engine\n"
+    "t1 = time.perf_counter()\n"
+    "print((t1 - t0) * 1000.0, int(any(m == 'tkinter' or m.startswith('tkinter.') for m in sys.modules)))\n"
+)
+
+# Runs the probe once and returns (milliseconds, tkinter_loaded).
+def measure_once(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), out[1] == "1"
+
+# Primary function/entry point.
+def main():
+    # Bytecode caching is forced on so the numbers match a normal install; the first run only warms __pycache__.
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    measure_once(env)
+    samples = []
+    for _ in range(RUNS):
+        ms, tk_loaded = measure_once(env)
+        if tk_loaded:
+            print("FAIL: importing engine loaded tkinter.")
+            return 1
+        samples.append(ms)
+    median = statistics.median(samples)
+    print(f"engine cold import: median {median:.2f} ms, min {min(samples):.2f} ms, max {max(samples):.2f} ms over {RUNS} runs (budget {IMPORT_BUDGET_MS:.1f} ms)")
+    if median > IMPORT_BUDGET_MS:
+        print("FAIL: engine import is over budget.")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
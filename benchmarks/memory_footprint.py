@@ -0,0 +1,64 @@
+# Measures the memory cost of the engine's objects: bytes per combatant and bytes per condition.
+# Run from the repository root with "python3 benchmarks/memory_footprint.py".
+
+# Imports.
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import Tracker, Condition
+from roster_store import RosterStore
+
+# Global Constants.
+COMBATANTS = 2000
+CONDITIONS_PER_COMBATANT = 5
+# Names with no uniqueness rule, so every application is kept.
+SPREAD = ("blinded", "charmed", "deafened", "frightened", "grappled", "poisoned", "prone", "restrained")
+
+# Returns the bytes still allocated after running build(), which must return whatever it wants kept alive.
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+# Builds a roster of bare combatants, optionally on the columnar backend.
+def build_roster(columnar=False):
+    tracker = Tracker(store=RosterStore() if columnar else None)
+    for i in range(COMBATANTS):
+        tracker.add_warrior(f"Goblin {i}", i % 20, "enemy" if i % 2 else "ally", 15, 7, 7, None)
+    return tracker
+
+# Builds a batch of free-standing conditions.
+def build_conditions():
+    return [Condition(SPREAD[i % len(SPREAD)], duration=3, tick_timing="start", tick_owner="target") for i in range(COMBATANTS * CONDITIONS_PER_COMBATANT)]
+
+# Primary function/entry point.
+def main():
+    roster_bytes = measure(build_roster)
+    columnar_bytes = measure(lambda: build_roster(columnar=True))
+    condition_bytes = measure(build_conditions)
+    # Applying conditions also grows each warrior's indexes and the tracker's, so that is measured on top of a prebuilt roster.
+    tracker = build_roster()
+    def apply_all():
+        for w in tracker.warriors:
+            for j in range(CONDITIONS_PER_COMBATANT):
+                w.apply_condition(Condition(SPREAD[j], duration=3, tick_timing="start", tick_owner="target", target=w))
+        return None
+    applied_bytes = measure(apply_all)
+    total_conditions = COMBATANTS * CONDITIONS_PER_COMBATANT
+    print(f"bytes per combatant (no conditions): {roster_bytes / COMBATANTS:.0f}")
+    print(f"bytes per columnar combatant:        {columnar_bytes / COMBATANTS:.0f}")
+    print(f"bytes per free-standing condition:   {condition_bytes / total_conditions:.0f}")
+    print(f"bytes per applied condition:         {applied_bytes / total_conditions:.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# Measures how long a fresh tracker takes to put its first frame on screen, phase by phase, and checks it against a budget.
+# Run from the repository root with "python3 benchmarks/startup_budget.py". Needs a display; without $DISPLAY it starts Xvfb if installed.
+
+# Imports.
+import json
+import os
+import statistics
+import subprocess
+import sys
+from suite import ensure_display
+
+# Global Constants.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Median time from a fresh interpreter to the first frame (importing main, Tk, building the window, first render), in milliseconds.
+STARTUP_BUDGET_MS = 350.0
+RUNS = 7
+# Each run is a brand new interpreter, as when the tracker is relaunched between encounters.
+PROBE = (
+    "import json, time\n"
+    "t0 = time.perf_counter()\n"
+    "import main\n"
+    "imported = (time.perf_counter() - t0) * 1000.0\n"
+    "window = main.Window(main.Tracker(), open_add_modal_on_start=False)\n"
+    "while window.startup_ms is None:\n"
+    "    window.root.update()\n"
+    "window.root.update()\n"
+    "phases = dict(import_main=imported, **window.startup_phases)\n"
+    "window.root.destroy()\n"
+    "print(json.dumps({'first_frame_ms': imported + window.startup_ms, 'phases': phases}))\n"
+)
+
+# Runs the probe once and returns its result dict.
+def measure_once(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+# Primary function/entry point.
+def main():
+    if not ensure_display():
+        print("SKIP: no display and no Xvfb to start one.")
+        return 0
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    # The first run only warms __pycache__.
+    measure_once(env)
+    runs = [measure_once(env) for _ in range(RUNS)]
+    for name in runs[0]["phases"]:
+        print(f"  {name:<16} {statistics.median(r['phases'][name] for r in runs):8.2f} ms")
+    samples = [r["first_frame_ms"] for r in runs]
+    median = statistics.median(samples)
+    print(f"time to first frame: median {median:.1f} ms, min {min(samples):.1f} ms, max {max(samples):.1f} ms over {RUNS} runs (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    if median > STARTUP_BUDGET_MS:
+        print("FAIL: startup is over budget.")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
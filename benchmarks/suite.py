@@ -0,0 +1,230 @@
+# Times the engine and GUI hot paths on synthetic encounters from 10 to 10,000 combatants, at several condition densities.
+# Run from the repository root with "python3 benchmarks/suite.py".
+#   --save PATH      write the results as a JSON baseline (default benchmarks/baseline.json)
+#   --compare PATH   compare against a saved baseline and exit 1 if anything regressed
+#   --threshold PCT  how much slower counts as a regression (default 25)
+#   --quick          stop at 1,000 combatants
+#   --no-gui         skip the Window cases
+# GUI cases need a display. Without $DISPLAY the suite starts Xvfb if it is installed, and otherwise skips them.
+
+# Imports.
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import Condition, Tracker
+
+# Global Constants.
+SIZES = (10, 100, 1000, 10000)
+QUICK_SIZES = (10, 100, 1000)
+# Conditions per combatant.
+DENSITIES = (0, 1, 4)
+REPEATS = 5
+# Each repeat runs the operation for at least this long, so fast cases get enough calls to time.
+MIN_REPEAT_SECONDS = 0.02
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD_PCT = 25.0
+# Differences below this many microseconds are treated as noise when comparing.
+NOISE_FLOOR_US = 2.0
+# One in this many combatants is a caster holding concentration; the rest of the density is spread over them.
+CASTER_EVERY = 10
+LONG_DURATION = 10**9
+SPREAD = ("blinded", "charmed", "deafened", "frightened", "grappled", "poisoned", "prone", "restrained")
+
+# Builds a synthetic encounter: alternating sides, initiative spread over 1-20 with ties, and density conditions per combatant.
+# The first condition on each combatant ticks on its own turn (never expiring); the rest hang off a caster's concentration.
+def build_encounter(size, density, seed=0):
+    rng = random.Random(seed)
+    tracker = Tracker()
+    tracker.add_warriors([{"name": f"C{i}", "side": "enemy" if i % 2 else "ally", "ac": 12, "hp_cur": 50, "hp_max": 50, "initiative": rng.randint(1, 20), "tiebreak": i} for i in range(size)])
+    tracker.start_combat()
+    casters = tracker.warriors[::CASTER_EVERY]
+    for caster in casters:
+        caster.apply_condition(Condition("concentration"))
+    for w in tracker.warriors:
+        for j in range(density):
+            if j == 0:
+                w.apply_condition(Condition(SPREAD[j], LONG_DURATION, "start", None, w, "target"))
+            else:
+                w.apply_condition(Condition(SPREAD[j % len(SPREAD)], None, None, rng.choice(casters), w, None, "concentration"))
+    return tracker
+
+# Times op() and returns microseconds per call (median and min over REPEATS). setup(), if given, runs untimed before every call.
+def time_op(op, setup=None):
+    samples = []
+    for _ in range(REPEATS):
+        calls = 0
+        spent = 0.0
+        while spent < MIN_REPEAT_SECONDS:
+            if setup is not None:
+                setup()
+                t0 = time.perf_counter()
+                op()
+                spent += time.perf_counter() - t0
+                calls += 1
+            else:
+                t0 = time.perf_counter()
+                for _ in range(100):
+                    op()
+                spent += time.perf_counter() - t0
+                calls += 100
+        samples.append(spent / calls * 1e6)
+    return {"median_us": statistics.median(samples), "min_us": min(samples)}
+
+# Engine cases for one encounter shape. Returns {case name: timing}.
+def engine_cases(size, density):
+    results = {}
+    tracker = build_encounter(size, density)
+    results["next_turn"] = time_op(tracker.next_turn)
+    actor = tracker.warriors[0]
+    results["_tick_for_actor"] = time_op(lambda: tracker._tick_for_actor("start", actor))
+    results["check_team_able"] = time_op(tracker.check_team_able)
+    results["get_initiative_ties"] = time_op(tracker.get_initiative_ties)
+    # Area damage: one point to 15 combatants in one call; setup heals it back.
+    area = tracker.warriors[1:16]
+    ones = [1] * len(area)
+    results["damage_area"] = time_op(lambda: tracker.damage_area(area, ones), setup=lambda: tracker.heal_many(area, ones))
+    # Cascade: a caster drops concentration and every condition tied to it goes too; setup puts it all back.
+    caster = tracker.warriors[0]
+    dependents = [(w, c) for w, c in tracker.get_dependents(caster, "concentration")]
+    def restore_concentration():
+        if not caster.has_condition("concentration"):
+            caster.apply_condition(Condition("concentration"))
+        for w, c in dependents:
+            if w.get_condition_by_id(c.condition_id) is None:
+                w.apply_condition(c)
+    def drop_concentration():
+        tracker.remove_condition(caster, caster._find_condition_by_name("concentration").condition_id)
+    results["remove_condition_cascade"] = time_op(drop_concentration, setup=restore_concentration)
+    # Rebuilding the roster for every add would cost far more than the add itself, so the roster just keeps growing.
+    rng = random.Random(1)
+    results["add_warrior"] = time_op(lambda: tracker.add_warrior("Late", rng.randint(1, 20), "enemy", 12, 10, 10, None))
+    return results
+
+# Starts Xvfb on a free display if there is no display yet. Returns True if a display is available.
+def ensure_display():
+    if os.environ.get("DISPLAY"):
+        return True
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return False
+    for number in range(99, 120):
+        if os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        proc = subprocess.Popen([xvfb, f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        atexit.register(proc.terminate)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ["DISPLAY"] = f":{number}"
+                return True
+            if proc.poll() is not None:
+                break
+            time.sleep(0.05)
+        proc.terminate()
+    return False
+
+# GUI cases for one encounter shape: a full roster render, an incremental one after a single hp change, and _render_all.
+def gui_cases(size, density):
+    import main
+    results = {}
+    tracker = build_encounter(size, density)
+    window = main.Window(tracker, open_add_modal_on_start=False)
+    window.root.withdraw()
+    try:
+        window._flush_render()
+        target = tracker.warriors[size // 2]
+        def cold_setup():
+            for iid in window.roster.get_children():
+                window.roster.delete(iid)
+            window._roster_rows.clear()
+            window._roster_order = []
+        results["render_roster_full"] = time_op(window.render_roster, setup=cold_setup)
+        def touch_one():
+            target.hp_current = 1 + (target.hp_current % 49)
+        results["render_roster_one_change"] = time_op(window.render_roster, setup=touch_one)
+        def render_all():
+            window._render_all()
+            window._flush_render()
+        results["_render_all"] = time_op(render_all, setup=touch_one)
+    finally:
+        window.root.destroy()
+    return results
+
+# Runs every case and returns the results document.
+def run_suite(sizes, densities, gui):
+    results = {}
+    for size in sizes:
+        for density in densities:
+            shape = f"n={size},d={density}"
+            for case, timing in engine_cases(size, density).items():
+                results[f"{case}[{shape}]"] = timing
+                print(f"{case + '[' + shape + ']':<48} {timing['median_us']:>12.2f} us")
+            if gui:
+                for case, timing in gui_cases(size, density).items():
+                    results[f"Window.{case}[{shape}]"] = timing
+                    print(f"{'Window.' + case + '[' + shape + ']':<48} {timing['median_us']:>12.2f} us")
+    return {"python": platform.python_version(), "platform": platform.platform(), "gui": gui, "results": results}
+
+# Compares results with a baseline and returns the cases that got slower by more than threshold_pct.
+def find_regressions(current, baseline, threshold_pct):
+    regressions = []
+    for case, timing in current["results"].items():
+        base = baseline["results"].get(case)
+        if base is None:
+            continue
+        new_us, old_us = timing["median_us"], base["median_us"]
+        if new_us - old_us > NOISE_FLOOR_US and new_us > old_us * (1 + threshold_pct / 100.0):
+            regressions.append((case, old_us, new_us))
+    return regressions
+
+# Helper for reading "--flag [value]" options. Returns None if the flag is missing and default if it has no value.
+def _option(args, flag, default):
+    if flag not in args:
+        return None
+    i = args.index(flag)
+    if i + 1 < len(args) and not args[i + 1].startswith("--"):
+        value = args.pop(i + 1)
+    else:
+        value = default
+    del args[i]
+    return value
+
+# Primary function/entry point.
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    save_path = _option(args, "--save", DEFAULT_BASELINE)
+    compare_path = _option(args, "--compare", DEFAULT_BASELINE)
+    threshold = float(_option(args, "--threshold", DEFAULT_THRESHOLD_PCT) or DEFAULT_THRESHOLD_PCT)
+    quick = "--quick" in args
+    gui = "--no-gui" not in args
+    if gui and not ensure_display():
+        print("No display and no Xvfb: skipping Window cases.")
+        gui = False
+    current = run_suite(QUICK_SIZES if quick else SIZES, DENSITIES, gui)
+    status = 0
+    if compare_path is not None:
+        with open(compare_path, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = find_regressions(current, baseline, threshold)
+        for case, old_us, new_us in regressions:
+            print(f"REGRESSION: {case}: {old_us:.2f} us -> {new_us:.2f} us ({(new_us / old_us - 1) * 100:+.0f}%)")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions over {threshold:.0f}% against {compare_path}.")
+    if save_path is not None:
+        with open(save_path, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=1, sort_keys=True)
+        print(f"Saved baseline to {save_path}.")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
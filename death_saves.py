@@ -0,0 +1,54 @@
+# Exact death saving throw odds, matching Combatant.fail_death_saves / succeed_death_saves. Headless; never imports tkinter.
+# Each turn a dying combatant rolls a d20: 1 is two failures, 2-9 one failure, 10-19 one success, 20 brings them back at 1 hp.
+# Three failures and they are slain; three successes and they are stable.
+# Odds come from a memoized recursion over (failures, successes, turns left), so every reachable state is worked out once.
+
+# Imports.
+from fractions import Fraction
+from functools import lru_cache
+
+# Global Constants.
+# (probability, failures added, successes added, revives) for each band of the d20.
+DEATH_SAVE_ROLLS = (
+    (Fraction(1, 20), 2, 0, False),
+    (Fraction(8, 20), 1, 0, False),
+    (Fraction(10, 20), 0, 1, False),
+    (Fraction(1, 20), 0, 0, True),
+)
+# Results are (stable, dead, revived, still dying).
+_STABLE = (Fraction(1), Fraction(0), Fraction(0), Fraction(0))
+_DEAD = (Fraction(0), Fraction(1), Fraction(0), Fraction(0))
+_REVIVED = (Fraction(0), Fraction(0), Fraction(1), Fraction(0))
+_DYING = (Fraction(0), Fraction(0), Fraction(0), Fraction(1))
+
+# Returns exact (stable, dead, revived, still dying) probabilities for a dying combatant with the given counters
+# after at most turns more death saves, or until it is settled when turns is None. The four always sum to 1.
+def death_save_odds(failures, successes, turns=None):
+    if turns is not None and turns < 0:
+        raise ValueError(f"Error: {turns} must be 0 or more.")
+    return _odds(min(max(failures, 0), 3), min(max(successes, 0), 3), turns)
+
+@lru_cache(maxsize=None)
+def _odds(failures, successes, turns):
+    if failures >= 3:
+        return _DEAD
+    if successes >= 3:
+        return _STABLE
+    if turns == 0:
+        return _DYING
+    remaining = None if turns is None else turns - 1
+    total = [Fraction(0)] * 4
+    for p, fails, passes, revives in DEATH_SAVE_ROLLS:
+        outcome = _REVIVED if revives else _odds(failures + fails, successes + passes, remaining)
+        for i in range(4):
+            total[i] += p * outcome[i]
+    return tuple(total)
+
+# Returns the odds as short display text, e.g. "40% / 45% / 15%" for stable / dead / revived. Cached per state.
+@lru_cache(maxsize=None)
+def death_save_text(failures, successes, turns=None):
+    stable, dead, revived, dying = death_save_odds(failures, successes, turns)
+    text = f"{float(stable):.0%} / {float(dead):.0%} / {float(revived):.0%}"
+    if dying:
+        text += f" ({float(dying):.0%} still dying)"
+    return text
@@ -0,0 +1,894 @@
+# Headless combat engine for Advanced Initiative Tracker. Must never import tkinter.
+
+# Imports.
+import bisect
+import heapq
+import itertools
+import sys
+import types
+
+# Global Constants.
+UNIQUE_CONDITIONS = ("slain", "dying", "unconscious", "stable", "concentration")
+CONDITIONS = ("blinded", "charmed", "concentration", "deafened", "dying", "frightened", "grappled", "incapacitated", "invisible", "paralyzed", "petrified", "poisoned", "prone", "restrained", "slain", "stable", "stunned", "unconscious")
+# Conditions that render a creature unable to act, more or less permanently with regards to combat. Used for detecting team wipes.
+DISABLING_CONDITIONS = ("slain", "dying", "unconscious", "stable")
+BREAKS_CONCENTRATION = ("slain", "unconscious", "dying", "stable", "incapacitated", "paralyzed", "stunned", "petrified")
+# Source of condition ids: small, monotonically increasing integers, unique for the life of the process.
+_condition_ids = itertools.count(1)
+# Shared stand-in for a combatant's condition maps while it has no conditions.
+_NO_CONDITIONS = types.MappingProxyType({})
+
+# Marks a mutating Combatant or Tracker method so the owning tracker can record it for its journal (event_log.EventLog)
+# and undo history (history.UndoHistory). Untracked combatants and trackers with neither attached pay only the check.
+def _recorded(method):
+    name = method.__name__
+    def wrapper(self, *args, **kwargs):
+        tracker = getattr(self, "_tracker", self)
+        if tracker is None or (tracker.journal is None and tracker.history is None):
+            return method(self, *args, **kwargs)
+        return tracker._run_recorded(self, name, method, args, kwargs)
+    # Copied by hand rather than with functools.wraps, which costs more to import than the rest of the engine.
+    wrapper.__name__ = name
+    wrapper.__qualname__ = method.__qualname__
+    return wrapper
+
+# Shared combat rules for anything that fights: death saves, damage, healing and condition bookkeeping.
+# Subclasses supply the stat attributes (name, initiative, side, ac, hp_*, death_save_*, tiebreak_priority) however they store them,
+# and likewise _tracker, handle and conditions_version (see _init_tracking).
+class Combatant:
+    __slots__ = ("_cond_index", "_cond_by_name")
+    # Sets up empty condition storage and applies any starting conditions.
+    def _init_conditions(self, conditions):
+        # Condition id -> condition, in the order applied. This is the single store behind the conditions property.
+        # Both maps start as a shared read-only empty mapping and are only allocated once a condition arrives.
+        self._cond_index = _NO_CONDITIONS
+        # Name -> {condition_id: condition}, kept alongside _cond_index for O(1) lookups by condition name.
+        self._cond_by_name = _NO_CONDITIONS
+        self._init_tracking()
+        if conditions:
+            for cond in conditions:
+                self.apply_condition(cond)
+    # Sets the fields a tracker fills in. Views whose store keeps these in columns override it, since the store starts them itself.
+    def _init_tracking(self):
+        # Owning Tracker, notified of every condition change so its indexes stay in sync. Set by Tracker._attach.
+        self._tracker = None
+        # Small integer naming this combatant within its tracker, stable across undo, journals and saved files. Set by Tracker._attach.
+        self.handle = None
+        # Bumped on every condition change so displays can tell when cached condition text is stale.
+        self.conditions_version = 0
+    # Read-only, insertion-ordered view of active conditions. Iterate over list(...) when removing conditions in the loop.
+    @property
+    def conditions(self):
+        return self._cond_index.values()
+    # Yields (holder, condition) for every condition this combatant brings into a tracker. A horde also yields its members'.
+    def held_conditions(self):
+        for cond in self._cond_index.values():
+            yield self, cond
+    # The combatant whose turn this one acts on: itself, or for a horde member, its horde.
+    @property
+    def turn_owner(self):
+        return self
+    # Handles a combatant's maximum hp receiving a temporary buff and any associated healing effect.
+    @_recorded
+    def buff_max_hp(self, x, healing=False):
+        if x <= 0:
+            raise ValueError(f"Error: {x} must be greater than 0.")
+        if self.is_dead():
+            return
+        self.hp_current_max += x
+        if healing:
+            self.heal(x)
+        self.hp_current = min(self.hp_current, self.hp_current_max)
+    # Handles a combatant's maximum hp receiving a debuff and potential side effects.
+    @_recorded
+    def debuff_max_hp(self, x):
+        if x <= 0:
+            raise ValueError(f"Error: {x} must be greater than 0.")
+        if self.is_dead():
+            return
+        self.hp_current_max = max(self.hp_current_max - x, 0)
+        if self.hp_current_max <= 0:
+            self.hp_current = 0
+            self.apply_condition(Condition("slain"))
+            dying = self._find_condition_by_name("dying")
+            unconscious = self._find_condition_by_name("unconscious")
+            stable = self._find_condition_by_name("stable")
+            if dying is not None:
+                self.remove_condition(dying)
+            if unconscious is not None:
+                self.remove_condition(unconscious)
+            if stable is not None:
+                self.remove_condition(stable)
+            return
+        self.take_damage(x)
+        self.hp_current = min(self.hp_current, self.hp_current_max)
+    # Handles a flat change to a combatant's current maximum hp (never below 0), trimming current hp to fit.
+    @_recorded
+    def set_max_hp(self, value):
+        self.hp_current_max = max(0, value)
+        if self.hp_current > self.hp_current_max:
+            self.hp_current = self.hp_current_max
+    # Handles raising or lowering the current maximum hp by delta (never below 0). A horde moves each member's maximum by delta.
+    @_recorded
+    def adjust_max_hp(self, delta):
+        self.set_max_hp(self.hp_current_max + delta)
+    # Handles a combatant taking damage.
+    @_recorded
+    def take_damage(self, amount, is_critical=False):
+        # Checks if the target is dead already
+        if self.is_dead():
+            return "slain"
+        # Defines whether a target is already at 0
+        was_at_zero = (self.hp_current == 0)
+        # If not, adjusts current hp
+        self.hp_current -= amount
+        # If the target is an enemy and reduced to 0 hp or less, marks them as dead
+        if self.hp_current <= 0 and self.side == "enemy":
+            self.hp_current = 0
+            self.apply_condition(Condition("slain"))
+            return "slain"
+        # Provides conditions for when the target is an ally and reduced to 0 hp or less
+        if self.hp_current <= 0 and self.side == "ally":
+            # If the target is an ally, checks for massive damage
+            if self.hp_current <= -self.hp_current_max:
+                self.hp_current = 0
+                self.apply_condition(Condition("slain"))
+                dying = self._find_condition_by_name("dying")
+                if dying is not None:
+                    self.remove_condition(dying)
+                return "slain"
+            # Provides cases for when the target is an ally and not killed outright
+            else:
+                # If the ally is dropped to 0 hp, they are marked as dying
+                self.apply_condition(Condition("dying"))
+                # If the ally was already at 0, begins accruing death save failures
+                if was_at_zero:
+                    failures = 2 if is_critical else 1
+                    self.death_save_failures += failures
+                    if self.death_save_failures >= 3:
+                        self.apply_condition(Condition("slain"))
+                        dying = self._find_condition_by_name("dying")
+                        if dying is not None:
+                            self.remove_condition(dying)
+                        return "slain"
+                    return "dying"
+                self.hp_current = 0
+                return "dying"
+        return
+    # Helper method for finding conditions by name from string type.
+    def _find_condition_by_name(self, name: str):
+        bucket = self._cond_by_name.get(name.lower())
+        if not bucket:
+            return None
+        return next(iter(bucket.values()))
+    # Helper method for checking whether any condition of the given name is active.
+    def has_condition(self, name: str):
+        return name.lower() in self._cond_by_name
+    # Handles a combatant receiving healing.
+    @_recorded
+    def heal(self, amount, resurrection_effect=False):
+        if self.is_dead():
+            if resurrection_effect:
+                slain = self._find_condition_by_name("slain")
+                if slain is not None:
+                    self.remove_condition(slain)
+            else:
+                return
+        self.reset_death_saves()
+        unconscious = self._find_condition_by_name("unconscious")
+        dying = self._find_condition_by_name("dying")
+        stable = self._find_condition_by_name("stable")
+        if unconscious is not None:
+            self.remove_condition(unconscious)
+        if dying is not None:
+            self.remove_condition(dying)
+        if stable is not None:
+            self.remove_condition(stable)
+        self.hp_current += amount
+        if self.hp_current > self.hp_current_max:
+            self.hp_current = self.hp_current_max
+        return
+    # Helper function for checking death status.
+    def is_dead(self):
+        return "slain" in self._cond_by_name
+    # Helper function for checking unconscious status.
+    def is_unconscious(self):
+        return "unconscious" in self._cond_by_name
+    # Handles applying conditions to a combatant. Returns a token indicating what took place.
+    @_recorded
+    def apply_condition(self, condition):
+        name = condition.name
+        if name not in CONDITIONS:
+            raise ValueError(f"Error: Invalid condition name: {name}")
+        is_unique = (name in UNIQUE_CONDITIONS)
+        has_same = name in self._cond_by_name
+        reset_flag = False
+        token = "added"
+        if name == "concentration" and has_same:
+            return "concentration_replace_requested"
+        elif is_unique and has_same:
+            return "duplicate_ignored"
+        elif name == "slain" or name == "stable":
+            reset_flag = True
+            token = "added_breaks_concentration"
+        elif name in BREAKS_CONCENTRATION:
+            token = "added_breaks_concentration"
+        else:
+            token = "added"
+        if self._cond_index is _NO_CONDITIONS:
+            self._cond_index = {}
+            self._cond_by_name = {}
+        self._cond_index[condition.condition_id] = condition
+        self._cond_by_name.setdefault(name, {})[condition.condition_id] = condition
+        self.conditions_version += 1
+        if self._tracker is not None:
+            self._tracker._on_condition_added(self, condition)
+        if reset_flag:
+            self.reset_death_saves()
+        return token
+    # Handles removing conditions from a combatant.
+    @_recorded
+    def remove_condition(self, condition):
+        if self._cond_index.get(condition.condition_id) is not condition:
+            return 0
+        del self._cond_index[condition.condition_id]
+        self.conditions_version += 1
+        bucket = self._cond_by_name.get(condition.name)
+        if bucket is not None:
+            bucket.pop(condition.condition_id, None)
+            if not bucket:
+                del self._cond_by_name[condition.name]
+        if not self._cond_index:
+            self._cond_index = _NO_CONDITIONS
+            self._cond_by_name = _NO_CONDITIONS
+        if self._tracker is not None:
+            self._tracker._on_condition_removed(self, condition)
+        return 1
+    # Replaces this combatant's conditions with exactly the given (condition, duration) pairs, in order, without applying any rules.
+    # Used by undo/redo to put conditions back as they were; tracker indexes are updated through the usual hooks.
+    def _restore_conditions(self, items):
+        tracker = self._tracker
+        if tracker is not None:
+            for cond in self._cond_index.values():
+                tracker._on_condition_removed(self, cond)
+        self._cond_index = _NO_CONDITIONS
+        self._cond_by_name = _NO_CONDITIONS
+        if items:
+            self._cond_index = {}
+            self._cond_by_name = {}
+            for cond, duration in items:
+                cond.duration = duration
+                self._cond_index[cond.condition_id] = cond
+                self._cond_by_name.setdefault(cond.name, {})[cond.condition_id] = cond
+                if tracker is not None:
+                    tracker._on_condition_added(self, cond)
+        self.conditions_version += 1
+    # Handles retrieving condition id.
+    def get_condition_by_id(self, condition_id):
+        return self._cond_index.get(condition_id)
+    # Debug helper to ensure list and dict are consistent.
+    def assert_index_integrity(self):
+        for cid, cond in self._cond_index.items():
+            assert cond.condition_id == cid
+            assert self._cond_by_name[cond.name][cond.condition_id] is cond
+        assert sum(len(bucket) for bucket in self._cond_by_name.values()) == len(self.conditions)
+    # Handles the mechanics of failed death saving throws.
+    @_recorded
+    def fail_death_saves(self, is_critical=False):
+        if self.hp_current > 0:
+            return
+        if self.is_dead():
+            return "slain"
+        self.death_save_failures += 2 if is_critical else 1
+        if self.death_save_failures >= 3:
+            dying = self._find_condition_by_name("dying")
+            if dying:
+                self.remove_condition(dying)
+            self.apply_condition(Condition("slain"))
+            return "slain"
+    # Handles the mechanics of successful death saving throws.
+    @_recorded
+    def succeed_death_saves(self, is_critical=False):
+        if self.hp_current > 0:
+            return
+        if self.is_dead():
+            return "slain"
+        slain = self._find_condition_by_name("slain")
+        unconscious = self._find_condition_by_name("unconscious")
+        dying = self._find_condition_by_name("dying")
+        self.death_save_successes += 1
+        if is_critical:
+            if slain is not None:
+                self.remove_condition(slain)
+            if unconscious is not None:
+                self.remove_condition(unconscious)
+            if dying is not None:
+                self.remove_condition(dying)
+            self.hp_current = 1
+            self.reset_death_saves()
+            return
+        if self.death_save_successes == 3:
+            if dying is not None:
+                self.remove_condition(dying)
+            self.apply_condition(Condition("stable"))
+    # Resets counts associated with death saving throws when necessary.
+    def reset_death_saves(self):
+        self.death_save_successes = 0
+        self.death_save_failures = 0
+    # Handles condition timers.
+    def tick_conditions(self, timing, current_actor=None):
+        # Loops through a copy of the conditions affecting each combatant.
+        for condition in list(self.conditions):
+            # Checks to see if each condition has a timer and when that timer should tick down. Decrements timer when appropriate.
+            if condition.should_tick(timing, current_actor) and condition.tick():
+                    # When the timer reaches 0 (ie. when condition.tick() returns "True"), the condition is removed.
+                    self.remove_condition(condition)
+
+# Warrior class defines combatants: name, initiative, side, AC, HP, conditions, and associated durations.
+class Warrior(Combatant):
+    __slots__ = ("name", "initiative", "side", "ac", "hp_max", "hp_current_max", "hp_current", "death_save_failures", "death_save_successes", "tiebreak_priority", "_tracker", "handle", "conditions_version")
+    def __init__(self, name, initiative, side, ac, hp_current, hp_max, hp_current_max=None, conditions=None, tiebreak_priority=0):
+        self.name = name
+        self.initiative = initiative
+        self.side = side
+        self.ac = ac
+        self.hp_max = hp_max
+        self.hp_current_max = hp_current_max if hp_current_max is not None else hp_max
+        self.hp_current = min(hp_current, self.hp_current_max)
+        self.death_save_failures = 0
+        self.death_save_successes = 0
+        self.tiebreak_priority = tiebreak_priority
+        self._init_conditions(conditions)
+
+# Conditions class defines various combat conditions.
+class Condition:
+    __slots__ = ("name", "duration", "tick_timing", "source", "target", "tick_owner", "expired", "expires_with_source", "condition_id")
+    def __init__(self, name, duration=None, tick_timing=None, source=None, target=None, tick_owner=None, expires_with_source=None, condition_id=None):
+        # Normalized strings are interned so large numbers of conditions share a handful of string objects.
+        self.name = sys.intern(name.lower())
+        if duration is None:
+            self.duration = duration
+        elif isinstance(duration, bool):
+            raise TypeError("Error: Duration must be None or a whole number greater than 0.")
+        elif isinstance(duration, int) and duration >= 0:
+            self.duration = duration
+        else:
+            raise TypeError("Error: Duration must be None or a whole number greater than 0.")
+        self.tick_timing = sys.intern(tick_timing.lower()) if tick_timing else None
+        assert self.tick_timing in (None, "start", "end"), (f"Error: Invalid tick_timing: {self.tick_timing}")
+        self.source = source
+        assert (self.source is None or hasattr(self.source, "name")), (f"Error: Invalid source: {self.source}")
+        self.target = target
+        assert (self.target is None or hasattr(self.target, "name")), (f"Error: Invalid target: {self.target}")
+        self.tick_owner = sys.intern(tick_owner.lower()) if tick_owner else None
+        assert self.tick_owner in (None, "source", "target"), (f"Error: Invalid tick_owner: {self.tick_owner}")
+        self.expired = False
+        self.expires_with_source = sys.intern(expires_with_source.lower()) if expires_with_source else None
+        self.condition_id = condition_id if condition_id is not None else next(_condition_ids)
+    # Checks condition duration and decrements it, but never below 0. 0 is the expiration condition and will return True.
+    def tick(self):
+        if self.duration is None:
+            return False
+        if self.duration > 0:
+            self.duration -= 1
+        if self.duration == 0 and not self.expired:
+            self.expired = True
+            return True
+        return False
+    # Indicates when a condition duration should tick. Returns True to indicate ticking should occur.
+    def should_tick(self, timing, current_actor):
+        # Helper function to normalize names.
+        def normalize(value):
+            if isinstance(value, Combatant):
+                return value.name.lower()
+            elif isinstance(value, str):
+                return value.lower()
+            else:
+                return None
+        # Normalizes variable names to lower case for comparison.
+        current_actor = normalize(current_actor)
+        target_name = normalize(self.target)
+        source_name = normalize(self.source)
+        towner_name = normalize(self.tick_owner)
+        # Normalizes timing case as safety net.
+        timing = timing.lower() if isinstance(timing, str) else timing
+        # Forces timing match.
+        if self.tick_timing != timing:
+            return False
+        # If no specific owner, always tick when timing matches.
+        if not towner_name:
+            return True
+        # If the tick owner is the target, tick on target's turn.
+        if towner_name == "target":
+            if target_name is None or current_actor is None:
+                return False
+            return current_actor == target_name
+        # If the tick owner is the source, tick on source's turn.
+        if towner_name == "source":
+            if source_name is None or current_actor is None:
+                return False
+            return current_actor == source_name
+        # Returns False by default.
+        return False
+
+# Raised when a combatant spec fails validation. field names the offending spec key so a GUI can focus the right input.
+class WarriorSpecError(ValueError):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+# Validates one combatant spec (a dict with name, side, ac, hp_cur, hp_max, initiative and optional tiebreak, as ints or strings)
+# and returns it normalized. These are the same rules the Add Combatant modal enforces.
+def parse_warrior_spec(spec):
+    def as_int(field, message):
+        try:
+            return int(str(spec.get(field, "")).strip())
+        except ValueError:
+            raise WarriorSpecError(field, message) from None
+    name = str(spec.get("name") or "").strip()
+    if not name:
+        raise WarriorSpecError("name", "Name is required.")
+    side = str(spec.get("side") or "").strip().lower()
+    if side not in ("ally", "enemy"):
+        raise WarriorSpecError("side", "Side is required.")
+    ac = as_int("ac", "AC is not valid.")
+    if ac < 0:
+        raise WarriorSpecError("ac", "AC is not valid.")
+    hp_max = as_int("hp_max", "Max HP must be at least 0.")
+    if hp_max < 0:
+        raise WarriorSpecError("hp_max", "Max HP must be at least 0.")
+    hp_cur = as_int("hp_cur", "Current HP must be at least 0.")
+    hp_cur = max(0, min(hp_cur, hp_max))
+    initiative = as_int("initiative", "Initiative must be entered.")
+    if str(spec.get("tiebreak", "")).strip() == "":
+        tiebreak = 0
+    else:
+        tiebreak = as_int("tiebreak", "Tiebreak must be a whole number, but may default to 0.")
+    return {"name": name, "side": side, "ac": ac, "hp_cur": hp_cur, "hp_max": hp_max, "initiative": initiative, "tiebreak": tiebreak}
+
+# Initiative order key: highest initiative first, then lowest tiebreak priority.
+def _initiative_key(warrior):
+    return (-warrior.initiative, warrior.tiebreak_priority)
+
+# Tracker class creates empty list of combatants, allies/enemies, sets current combatant to 0.
+class Tracker:
+    # store is an optional columnar backend (see roster_store.RosterStore); without one each combatant is a plain Warrior.
+    def __init__(self, store=None):
+        self.store = store
+        self.warriors = []
+        self.allies = []
+        self.enemies = []
+        self.current_warrior_index = 0
+        self.round_number = 1
+        # Used for determining when added warriors can act, in case of mid-combat adds (summonings, animation of corpses, etc.) Keyed by handle.
+        self.eligible_from_round = {}
+        # Handle -> combatant for everything ever attached. Handles count up from 0 and are never reused, so undone adds keep theirs.
+        self._by_handle = {}
+        self._next_handle = 0
+        # Reverse index of source-dependent conditions: (source, expires_with_source) -> {condition_id: (holder, condition)}.
+        self._dependents = {}
+        # Conditions that can tick, bucketed by the actor whose turn drives them: (actor, "start"/"end") -> {condition_id: (holder, condition)}.
+        self._tick_buckets = {}
+        # Number of DISABLING_CONDITIONS each warrior holds, and how many warriors per side hold at least one. Keeps team-wipe checks O(1).
+        self._disabling_held = {}
+        self._disabled_count = {"allies": 0, "enemies": 0}
+        # Set once start_combat has run; before then additions are all eligible from round 1.
+        self.combat_started = False
+        # Optional event_log.EventLog recording every mutating call for replay.
+        self.journal = None
+        # Optional history.UndoHistory keeping reversible records of recent changes.
+        self.history = None
+        # Depth of recorded calls in progress; only the outermost one is journaled or becomes an undo step.
+        self._recording_depth = 0
+    # Handles moving from turn to turn.
+    @_recorded
+    def next_turn(self):
+        # Safely handles cases where next turn is called on an empty list of combatants.
+        if len(self.warriors) == 0:
+            return None
+        # Future proofing.
+        self.current_warrior_index %= len(self.warriors)
+        # Defines current warrior in initiative.
+        current_warrior = self.warriors[self.current_warrior_index]
+        # Loops through current combatant's conditions (if any) and ticks any that decrement at end of turn.
+        self._tick_for_actor("end", current_warrior)
+        # Increments index in list of combatants.
+        self.current_warrior_index += 1
+        # Resets index to 0 and advances round number if reaching the end of initiative list.
+        if self.current_warrior_index >= len(self.warriors):
+            self.current_warrior_index = 0
+            self.round_number += 1
+        # Handles indexing for combatants inserted into an active combat.
+        next_index = self.current_warrior_index
+        i = 0
+        while i < len(self.warriors):
+            candidate = self.warriors[next_index]
+            eligible_from = self.eligible_from_round.get(candidate.handle, 1)
+            if eligible_from <= self.round_number:
+                break
+            else:
+                next_index += 1
+                if next_index == len(self.warriors):
+                    next_index = 0
+                    self.round_number += 1
+            i += 1
+        self.current_warrior_index = next_index
+        # Defines new current warrior.
+        new_warrior = self.warriors[self.current_warrior_index]
+        # Loops through current combatant's conditions (if any) and ticks any that decrement at start of turn.
+        self._tick_for_actor("start", new_warrior)
+        self.check_team_able()
+        # Returns the new current combatant in the list.
+        return new_warrior
+    # Checks for disabled combatants.
+    def _is_disabled(self, warrior):
+        return self._disabling_held.get(warrior, 0) > 0
+    # Maps a warrior to the side list it is kept in.
+    def _side_key(self, warrior):
+        return "enemies" if warrior.side == "enemy" else "allies"
+    # Checks for disabled sides.
+    def check_team_able(self):
+        allies_disabled = len(self.allies) > 0 and self._disabled_count["allies"] == len(self.allies)
+        enemies_disabled = len(self.enemies) > 0 and self._disabled_count["enemies"] == len(self.enemies)
+        return {"allies_disabled": allies_disabled, "enemies_disabled": enemies_disabled}
+    # Adds combatants to lists, determining what round they can first act in if they are added in the midst of combat.
+    @_recorded
+    def add_warrior(self, name, initiative, side, ac, hp_current, hp_max, conditions):
+        if self.store is not None:
+            warrior = self.store.add_row(name, initiative, side, ac, hp_current, hp_max, conditions=conditions)
+        else:
+            warrior = Warrior(name, initiative, side, ac, hp_current, hp_max, conditions=conditions)
+        return self._insert_warrior(warrior)
+    # Adds a horde of count identical creatures with hp maximum hit points each, sharing one initiative slot (see horde.Horde).
+    @_recorded
+    def add_horde(self, name, initiative, side, ac, hp, count, tiebreak_priority=0, hp_current=None):
+        # Imported here, since horde.py builds on this module.
+        from horde import Horde
+        return self._insert_warrior(Horde(name, initiative, side, ac, hp, count, tiebreak_priority=tiebreak_priority, hp_current=hp_current))
+    # Helper for attaching a new combatant and slotting it into the initiative order.
+    def _insert_warrior(self, warrior):
+        self._attach(warrior)
+        if warrior.side == "enemy":
+            self.enemies.append(warrior)
+        else:
+            self.allies.append(warrior)
+        if len(self.warriors) == 0:
+            new_index = 0
+            self.warriors.append(warrior)
+            self.current_warrior_index = 0
+            self.eligible_from_round[warrior.handle] = self.round_number
+        else:
+            # Binary search for the slot; equal keys go after existing ones, matching the stable sort this replaces.
+            new_index = bisect.bisect_right(self.warriors, _initiative_key(warrior), key=_initiative_key)
+            self.warriors.insert(new_index, warrior)
+            # Keeps the current actor pointer on the same combatant.
+            if new_index <= self.current_warrior_index:
+                self.current_warrior_index += 1
+            if new_index > self.current_warrior_index:
+                self.eligible_from_round[warrior.handle] = self.round_number
+            else:
+                self.eligible_from_round[warrior.handle] = self.round_number + 1
+        if self.history is not None:
+            self._note_added([(new_index, warrior)], [warrior])
+        return warrior
+    # Adds many combatants in one operation. specs are validated up front with parse_warrior_spec, so a bad spec adds nothing.
+    # The batch is sorted once and merged into the initiative order; the result matches calling add_warrior for each spec in turn.
+    @_recorded
+    def add_warriors(self, specs):
+        parsed = [parse_warrior_spec(spec) for spec in specs]
+        added = []
+        for p in parsed:
+            if self.store is not None:
+                warrior = self.store.add_row(p["name"], p["initiative"], p["side"], p["ac"], p["hp_cur"], p["hp_max"], tiebreak_priority=p["tiebreak"])
+            else:
+                warrior = Warrior(p["name"], p["initiative"], p["side"], p["ac"], p["hp_cur"], p["hp_max"], tiebreak_priority=p["tiebreak"])
+            self._attach(warrior)
+            if warrior.side == "enemy":
+                self.enemies.append(warrior)
+            else:
+                self.allies.append(warrior)
+            added.append(warrior)
+        if not added:
+            return added
+        batch = added
+        # On an empty tracker the first combatant becomes the current actor, exactly as a lone add_warrior would.
+        if len(self.warriors) == 0:
+            self.warriors.append(added[0])
+            self.current_warrior_index = 0
+            self.eligible_from_round[added[0].handle] = self.round_number
+            batch = added[1:]
+        current_ref = self.warriors[self.current_warrior_index]
+        new_handles = {w.handle for w in batch}
+        # heapq.merge favours the existing list on equal keys, the same as bisect_right insertion.
+        self.warriors = list(heapq.merge(self.warriors, sorted(batch, key=_initiative_key), key=_initiative_key))
+        passed_current = False
+        for i, w in enumerate(self.warriors):
+            if w is current_ref:
+                self.current_warrior_index = i
+                passed_current = True
+            elif w.handle in new_handles:
+                self.eligible_from_round[w.handle] = self.round_number if passed_current else self.round_number + 1
+        if self.history is not None:
+            new_handles.add(added[0].handle)
+            self._note_added([(i, w) for i, w in enumerate(self.warriors) if w.handle in new_handles], added)
+        return added
+    # Helper for telling the undo history where added combatants landed (placed is ascending (index, combatant) pairs, added is
+    # attach order), so undo can take them back out without an image of the whole roster.
+    def _note_added(self, placed, added):
+        self.history.note_roster(("insert", placed, added, [(w.handle, self.eligible_from_round[w.handle]) for w in added]))
+    # Runs a recorded method (see _recorded). The journal gets the outermost call once it succeeds; the undo history
+    # sees every call, so it can snapshot each combatant before the first change to it.
+    def _run_recorded(self, obj, name, method, args, kwargs):
+        journal = self.journal
+        history = self.history
+        outermost = self._recording_depth == 0
+        event = None
+        if outermost and journal is not None and not journal.depth:
+            event = journal.encode(obj, name, args, kwargs)
+        if history is not None:
+            if outermost:
+                history.open(obj, name, args)
+            elif obj is not self:
+                history.touch(obj)
+        self._recording_depth += 1
+        try:
+            result = method(obj, *args, **kwargs)
+        finally:
+            self._recording_depth -= 1
+            if outermost and history is not None:
+                history.close()
+        if event is not None:
+            journal.append(event)
+        return result
+    # Reverts the most recent undo step. Returns its label, or None when there is nothing to undo.
+    @_recorded
+    def undo(self):
+        return self.history.undo() if self.history is not None else None
+    # Re-applies the most recently undone step. Returns its label, or None when there is nothing to redo.
+    @_recorded
+    def redo(self):
+        return self.history.redo() if self.history is not None else None
+    # Hooks a warrior up to this tracker's indexes, picking up any conditions it was created with.
+    # It gets the next free handle, or handle when one is being restored from a journal or saved file.
+    def _attach(self, warrior, handle=None):
+        warrior._tracker = self
+        if handle is None:
+            handle = self._next_handle
+        warrior.handle = handle
+        self._by_handle[handle] = warrior
+        self._next_handle = max(self._next_handle, handle + 1)
+        for holder, cond in warrior.held_conditions():
+            self._on_condition_added(holder, cond)
+    # Returns a combatant's handle: an int, or (horde handle, member index) for a horde member.
+    def handle_of(self, combatant):
+        horde = combatant.turn_owner
+        if horde is not combatant:
+            return (horde.handle, combatant.index)
+        return combatant.handle
+    # Returns the combatant a handle from handle_of refers to, or None if this tracker never had it. Pairs may also be lists.
+    def lookup(self, handle):
+        if isinstance(handle, (tuple, list)):
+            horde = self._by_handle.get(handle[0])
+            return None if horde is None else horde.member(handle[1])
+        return self._by_handle.get(handle)
+    # Returns every combatant this tracker has handed a handle to, in handle order, including any whose adds were undone.
+    def handled_combatants(self):
+        return [self._by_handle[h] for h in sorted(self._by_handle)]
+    # Index maintenance, called by Warrior whenever a condition is applied.
+    def _on_condition_added(self, warrior, condition):
+        if condition.source is not None and condition.expires_with_source:
+            key = (condition.source, condition.expires_with_source)
+            self._dependents.setdefault(key, {})[condition.condition_id] = (warrior, condition)
+        key = self._tick_key(warrior, condition)
+        if key is not None:
+            self._tick_buckets.setdefault(key, {})[condition.condition_id] = (warrior, condition)
+        if condition.name in DISABLING_CONDITIONS:
+            held = self._disabling_held.get(warrior, 0)
+            self._disabling_held[warrior] = held + 1
+            if held == 0:
+                self._set_disabled(warrior, 1)
+    # Index maintenance, called by Warrior whenever a condition is removed.
+    def _on_condition_removed(self, warrior, condition):
+        if condition.source is not None and condition.expires_with_source:
+            key = (condition.source, condition.expires_with_source)
+            bucket = self._dependents.get(key)
+            if bucket is not None:
+                bucket.pop(condition.condition_id, None)
+                if not bucket:
+                    del self._dependents[key]
+        key = self._tick_key(warrior, condition)
+        if key is not None:
+            bucket = self._tick_buckets.get(key)
+            if bucket is not None:
+                bucket.pop(condition.condition_id, None)
+                if not bucket:
+                    del self._tick_buckets[key]
+        if condition.name in DISABLING_CONDITIONS:
+            held = self._disabling_held.get(warrior, 0)
+            if held > 1:
+                self._disabling_held[warrior] = held - 1
+            elif held == 1:
+                del self._disabling_held[warrior]
+                self._set_disabled(warrior, -1)
+    # Moves a combatant into (delta 1) or out of (delta -1) its side's disabled count.
+    # A horde member counts toward its horde instead, and the horde is disabled once every member is.
+    def _set_disabled(self, warrior, delta):
+        unit = warrior.turn_owner
+        if unit is not warrior:
+            size = len(unit)
+            was_disabled = unit.disabled_members == size
+            unit.disabled_members += delta
+            if was_disabled == (unit.disabled_members == size):
+                return
+            warrior = unit
+        self._disabled_count[self._side_key(warrior)] += delta
+    # Returns the (actor, timing) bucket a condition ticks in, or None if it never ticks.
+    def _tick_key(self, holder, condition):
+        if condition.duration is None or condition.tick_timing not in ("start", "end"):
+            return None
+        if condition.tick_owner == "target":
+            return (holder.turn_owner, condition.tick_timing)
+        if condition.tick_owner == "source" and condition.source is not None:
+            return (condition.source.turn_owner, condition.tick_timing)
+        return None
+    # Returns (holder, condition) pairs for every condition that expires when source loses the anchor condition.
+    def get_dependents(self, source, anchor="concentration"):
+        return list(self._dependents.get((source, anchor), {}).values())
+    # Counts dependent conditions per source for one anchor, e.g. how many effects each caster's concentration is holding up.
+    def dependent_counts(self, anchor="concentration"):
+        return {src: len(bucket) for (src, anc), bucket in self._dependents.items() if anc == anchor}
+    # Debug helper to ensure the dependents index matches a full scan of the roster.
+    def assert_index_integrity(self):
+        expected = {}
+        held = [(holder, cond) for w in self.warriors for holder, cond in w.held_conditions()]
+        for w in self.warriors:
+            w.assert_index_integrity()
+            assert self._by_handle.get(w.handle) is w
+        for w, cond in held:
+            if cond.source is not None and cond.expires_with_source:
+                expected.setdefault((cond.source, cond.expires_with_source), {})[cond.condition_id] = (w, cond)
+        assert expected.keys() == self._dependents.keys()
+        for key, bucket in expected.items():
+            assert bucket.keys() == self._dependents[key].keys()
+        expected = {}
+        for w, cond in held:
+            key = self._tick_key(w, cond)
+            if key is not None:
+                expected.setdefault(key, {})[cond.condition_id] = (w, cond)
+        assert expected.keys() == self._tick_buckets.keys()
+        for key, bucket in expected.items():
+            assert bucket.keys() == self._tick_buckets[key].keys()
+        disabled = {holder for holder, cond in held if cond.name in DISABLING_CONDITIONS}
+        # A horde counts as disabled once every one of its members is.
+        disabled_members = {}
+        for holder in disabled:
+            if holder.turn_owner is not holder:
+                disabled_members[holder.turn_owner] = disabled_members.get(holder.turn_owner, 0) + 1
+        for horde, count in disabled_members.items():
+            assert horde.disabled_members == count
+            if count == len(horde):
+                disabled.add(horde)
+        for side, members in (("allies", self.allies), ("enemies", self.enemies)):
+            assert self._disabled_count[side] == sum(1 for w in members if w in disabled)
+    # Applies damage to many combatants in one call, using the columnar fast path when a store backs the roster. Returns take_damage's result per target.
+    @_recorded
+    def damage_many(self, targets, amounts, is_critical=False):
+        if self.store is not None:
+            return self.store.damage_rows(targets, amounts, is_critical=is_critical)
+        return [w.take_damage(n, is_critical=is_critical) for w, n in zip(targets, amounts)]
+    # Applies healing to many combatants in one call.
+    @_recorded
+    def heal_many(self, targets, amounts, resurrection_effect=False):
+        if self.store is not None:
+            self.store.heal_rows(targets, amounts, resurrection_effect=resurrection_effect)
+            return
+        for w, n in zip(targets, amounts):
+            w.heal(n, resurrection_effect=resurrection_effect)
+    # Initiative sorting.
+    @_recorded
+    def sort_warriors(self):
+        # Keeps the current actor pointer on the same combatant across the re-sort.
+        current_ref = self.warriors[self.current_warrior_index] if 0 <= self.current_warrior_index < len(self.warriors) else None
+        before = list(self.warriors) if self.history is not None else None
+        self.warriors.sort(key=_initiative_key)
+        if current_ref is not None:
+            self.current_warrior_index = self.warriors.index(current_ref)
+        # The undo history only keeps the slots that changed hands.
+        if before is not None:
+            self.history.note_roster(("order", [(i, old, new) for i, (old, new) in enumerate(zip(before, self.warriors)) if old is not new]))
+    # Sets a warrior's place among others on the same initiative. Call sort_warriors afterwards to reorder.
+    @_recorded
+    def set_tiebreak_priority(self, warrior, rank):
+        warrior.tiebreak_priority = rank
+    # Starts combat from the top of the initiative order, with everyone already added eligible to act in round 1.
+    @_recorded
+    def start_combat(self):
+        self.current_warrior_index = 0
+        self.round_number = 1
+        changed = []
+        for w in self.warriors:
+            old = self.eligible_from_round.get(w.handle)
+            if old != 1:
+                changed.append((w.handle, old, 1))
+                self.eligible_from_round[w.handle] = 1
+        if changed and self.history is not None:
+            self.history.note_roster(("eligible", changed))
+        self.combat_started = True
+    # Handles condition removal cascade. "cascaded" lists the ids of the tied conditions that went with it,
+    # and "cascaded_conditions" the matching (holder, condition) pairs, since removed ids can no longer be looked up.
+    @_recorded
+    def remove_condition(self, warrior, condition_id):
+        # Establishes specific instance of condition and returns an error if that instance is not found.
+        c_instance = warrior.get_condition_by_id(condition_id)
+        if c_instance is None:
+            return {"removed":0, "primary_id": condition_id, "cascaded":[], "cascaded_conditions":[], "reason":"not_found"}
+        # Removes conditions.
+        removed = warrior.remove_condition(c_instance)
+        if removed == 0:
+            return {"removed":0, "primary_id": condition_id, "cascaded":[], "cascaded_conditions":[], "reason":"not_found"}
+        anchor = "concentration" if c_instance.name == "concentration" else c_instance.name
+        # Only the conditions tied to this source and anchor are visited, never the whole roster.
+        temp_list = self.get_dependents(warrior, anchor)
+        cascaded_list = []
+        cascaded_conditions = []
+        for w, cond in temp_list:
+            removed = w.remove_condition(cond)
+            if removed:
+                cascaded_list.append(cond.condition_id)
+                cascaded_conditions.append((w, cond))
+        self.check_team_able()
+        return {"removed": 1, "primary_id": condition_id, "cascaded": cascaded_list, "cascaded_conditions": cascaded_conditions}
+    # Applies an area effect: every target takes its own amount (such as half on a successful save) through damage_many,
+    # then every concentration the damage broke ends in one pass, cascading as remove_condition does.
+    # A concentrating combatant (or horde member) loses concentration if it now holds a condition in breaks. The cause named is
+    # the target's take_damage result (such as "slain") when that breaks concentration, as for single-target damage, else the first such condition held.
+    # Returns {"results": take_damage's result per target, "concentration_lost": [(holder, cause, cascaded_conditions)]}.
+    @_recorded
+    def damage_area(self, targets, amounts, is_critical=False, breaks=BREAKS_CONCENTRATION):
+        if len(targets) != len(amounts):
+            raise ValueError("Error: damage_area needs one amount per target.")
+        results = self.damage_many(targets, amounts, is_critical=is_critical)
+        lost = []
+        seen = set()
+        for target, outcome in zip(targets, results):
+            if target in seen:
+                continue
+            seen.add(target)
+            for holder, cond in list(target.held_conditions()):
+                if cond.name != "concentration":
+                    continue
+                if holder is target and outcome in breaks:
+                    cause = outcome
+                else:
+                    cause = next((c.name for c in holder.conditions if c.name in breaks), None)
+                if cause is not None:
+                    result = self.remove_condition(holder, cond.condition_id)
+                    lost.append((holder, cause, result["cascaded_conditions"]))
+        return {"results": results, "concentration_lost": lost}
+    # Handles initiative ties, allowing the user to manually sort tied combatants in the gui.
+    def get_initiative_ties(self):
+        ties = {}
+        for warrior in self.warriors:
+            ties.setdefault(warrior.initiative, []).append(warrior)
+        return {init: group for init, group in ties.items() if len(group) > 1}
+    # Returns only the ties tiebreak_priority does not already settle: groups where two or more combatants share a priority.
+    def get_unresolved_ties(self):
+        return {init: group for init, group in self.get_initiative_ties().items() if len({w.tiebreak_priority for w in group}) < len(group)}
+    # Ticking helper.
+    def _tick_for_actor(self, when, actor):
+        if actor is None:
+            return
+        # Only the conditions registered to this actor and timing are visited.
+        bucket = self._tick_buckets.get((actor, when))
+        if not bucket:
+            return
+        for w, c in list(bucket.values()):
+            # Skips anything an earlier expiry in this pass already cascaded away.
+            if w.get_condition_by_id(c.condition_id) is not c:
+                continue
+            if self.history is not None:
+                self.history.touch(w)
+            c.duration -= 1
+            if c.duration <= 0:
+                self.remove_condition(w, c.condition_id)
+
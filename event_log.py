@@ -0,0 +1,405 @@
+# Append-only event journal and replay for Tracker state. Headless; never imports tkinter.
+# Each mutating call (see engine._recorded) is written as one JSON line: [seq, target, method, args, kwargs].
+# target is -1 for the tracker itself or the warrior's tracker handle (Tracker.handle_of), which counts up in the order warriors were attached.
+# A horde member's handle is [horde handle, member index].
+# Conditions already held are referred to as [holder handle, name, ordinal among that holder's conditions of that name],
+# since condition ids are only unique within one process. Full snapshots go to a sibling ".snap" file every so often;
+# it holds only the journal's first snapshot (the base, for journals started on a tracker that already had combatants) and the latest.
+# Undo and redo are written as "restore" events holding the images the undo history put back (see history.apply_step),
+# so replay needs no undo history and costs what the step touched.
+
+# Imports.
+import json
+import os
+from engine import Combatant, Condition, Tracker, Warrior
+from history import UndoStep, apply_step
+from horde import Horde
+from roster_store import RosterStore
+
+# Global Constants.
+SNAPSHOT_EVERY = 500
+SNAPSHOT_SUFFIX = ".snap"
+# Older journals wrote undo and redo as plain events, each followed by a snapshot. Replay only meets one when a crash cut that snapshot off.
+LEGACY_UNDO = ("undo", "redo")
+WARRIOR_FIELDS = ("name", "initiative", "side", "ac", "hp_max", "hp_current_max", "hp_current", "death_save_failures", "death_save_successes", "tiebreak_priority")
+
+# EventLog class records a tracker's mutating calls to an append-only file.
+class EventLog:
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY, fsync=False):
+        self.path = path
+        self.snap_path = path + SNAPSHOT_SUFFIX
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.tracker = None
+        # Above 0 while events are being replayed or restored, so they are not written again.
+        self.depth = 0
+        self.seq = 0
+        self._fh = None
+        # The snapshot file's first line, kept when the file is rewritten; empty until there is one.
+        self._snap_base = b""
+    # Starts recording a tracker. A new file starts with a base snapshot.
+    def attach(self, tracker):
+        if tracker.journal is not None:
+            raise ValueError("Error: tracker already has a journal.")
+        self.tracker = tracker
+        tracker.journal = self
+        self._fh = open(self.path, "ab")
+        if self._fh.tell() == 0:
+            self._snap_base = b""
+            self.snapshot()
+        else:
+            self._snap_base = _first_line(self.snap_path)
+        return self
+    # Stops recording and closes the file.
+    def close(self):
+        if self.tracker is not None and self.tracker.journal is self:
+            self.tracker.journal = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+    # Returns a combatant's handle in JSON-ready form: its own, or [horde handle, member index] for a horde member.
+    def handle_of(self, combatant):
+        handle = self.tracker.handle_of(combatant)
+        return list(handle) if isinstance(handle, tuple) else handle
+    # Returns the combatant a handle from handle_of refers to.
+    def lookup(self, handle):
+        return self.tracker.lookup(handle)
+    # Helper for handles of condition sources and targets, which may not be in the tracker.
+    def _handle_or_none(self, combatant):
+        if not isinstance(combatant, Combatant):
+            return None
+        horde = combatant.turn_owner
+        if horde.handle is None or self.tracker.lookup(horde.handle) is not horde:
+            return None
+        return self.handle_of(combatant)
+    # Builds the event for a call before it runs, so conditions about to be removed can still be located.
+    # Undo and redo become a "restore" of the step they are about to apply, or None when there is nothing to apply.
+    def encode(self, obj, method, args, kwargs):
+        if obj is self.tracker:
+            target = -1
+            if method in LEGACY_UNDO:
+                pending = obj.history.pending(method) if obj.history is not None else None
+                return None if pending is None else [0, target, "restore", [self._encode_step(*pending)]]
+            if method == "remove_condition":
+                warrior, condition_id = args
+                cond = warrior.get_condition_by_id(condition_id)
+                ref = {"ref": self._condition_ref(warrior, cond)} if cond is not None else None
+                return [0, target, method, [self._encode_value(obj, warrior), ref]]
+        else:
+            target = self.handle_of(obj)
+        event = [0, target, method, [self._encode_value(obj, v) for v in args]]
+        if kwargs:
+            event.append({k: self._encode_value(obj, v) for k, v in kwargs.items()})
+        return event
+    # Helper for encoding one side of an undo step. Conditions still held are encoded as refs, so replay puts back the same ones.
+    def _encode_step(self, step, side):
+        stats = []
+        for combatant, image in step.stats.items():
+            values = list(image[side])
+            if isinstance(combatant, Horde):
+                values[-1] = [list(column) for column in values[-1]]
+            stats.append([self.handle_of(combatant), values])
+        conditions = [[self.handle_of(combatant), [[self._encode_value(combatant, c), duration, c.expired] for c, duration in image[side]]] for combatant, image in step.conditions.items()]
+        roster = []
+        for change in step.roster:
+            if change[0] == "insert":
+                _, placed, added, eligible = change
+                roster.append(["insert", [[pos, w.handle] for pos, w in placed], [w.handle for w in added], [list(pair) for pair in eligible]])
+            elif change[0] == "order":
+                roster.append(["order", [[i, old.handle, new.handle] for i, old, new in change[1]]])
+            else:
+                roster.append(["eligible", [list(triple) for triple in change[1]]])
+        return {"side": side, "stats": stats, "conditions": conditions, "turn": step.turn[side] if step.turn is not None else None, "roster": roster}
+    # Helper for rebuilding an undo step from _encode_step output. Returns (step, side), with only that side's images filled in.
+    def _decode_step(self, data):
+        side = data["side"]
+        step = UndoStep("restore")
+        for handle, values in data["stats"]:
+            image = [None, None]
+            image[side] = tuple(values)
+            step.stats[self.lookup(handle)] = image
+        for handle, entries in data["conditions"]:
+            items = []
+            for value, duration, expired in entries:
+                cond = self._decode_value(value)
+                if "c" in value:
+                    cond.expired = expired
+                items.append((cond, duration))
+            image = [None, None]
+            image[side] = items
+            step.conditions[self.lookup(handle)] = image
+        if data["turn"] is not None:
+            step.turn = [None, None]
+            step.turn[side] = tuple(data["turn"])
+        lookup = self.tracker.lookup
+        for change in data["roster"]:
+            if change[0] == "insert":
+                _, placed, added, eligible = change
+                step.roster.append(("insert", [(pos, lookup(h)) for pos, h in placed], [lookup(h) for h in added], [tuple(pair) for pair in eligible]))
+            elif change[0] == "order":
+                step.roster.append(("order", [(i, lookup(old), lookup(new)) for i, old, new in change[1]]))
+            else:
+                step.roster.append(("eligible", [tuple(triple) for triple in change[1]]))
+        step.added = [w for change in step.roster if change[0] == "insert" for w in change[2]]
+        return step, side
+    # Helper for encoding one argument.
+    def _encode_value(self, obj, value):
+        if isinstance(value, Combatant):
+            return {"w": self.handle_of(value)}
+        if isinstance(value, Condition):
+            holder = obj if isinstance(obj, Combatant) else None
+            if holder is not None and holder.get_condition_by_id(value.condition_id) is value:
+                return {"ref": self._condition_ref(holder, value)}
+            return {"c": self._encode_condition(value)}
+        if isinstance(value, (list, tuple)):
+            return [self._encode_value(obj, v) for v in value]
+        if isinstance(value, dict):
+            return {"d": {k: self._encode_value(obj, v) for k, v in value.items()}}
+        return value
+    # Helper for locating a held condition independently of its process-local id.
+    def _condition_ref(self, holder, condition):
+        ordinal = list(holder._cond_by_name[condition.name]).index(condition.condition_id)
+        return [self.handle_of(holder), condition.name, ordinal]
+    # Helper for encoding a condition's fields, with source and target as handles.
+    def _encode_condition(self, c):
+        source = self._handle_or_none(c.source)
+        target = self._handle_or_none(c.target)
+        return [c.name, c.duration, c.tick_timing, source, target, c.tick_owner, c.expires_with_source]
+    # Helper for decoding one argument.
+    def _decode_value(self, value):
+        if isinstance(value, list):
+            return [self._decode_value(v) for v in value]
+        if isinstance(value, dict):
+            if "w" in value:
+                return self.lookup(value["w"])
+            if "ref" in value:
+                handle, name, ordinal = value["ref"]
+                bucket = self.lookup(handle)._cond_by_name.get(name)
+                if bucket is None or ordinal >= len(bucket):
+                    return None
+                return list(bucket.values())[ordinal]
+            if "c" in value:
+                return self._decode_condition(value["c"])
+            return {k: self._decode_value(v) for k, v in value["d"].items()}
+        return value
+    # Helper for decoding condition fields.
+    def _decode_condition(self, fields):
+        name, duration, tick_timing, source, target, tick_owner, expires_with_source = fields
+        source = self.lookup(source) if source is not None else None
+        target = self.lookup(target) if target is not None else None
+        return Condition(name, duration, tick_timing, source, target, tick_owner, expires_with_source)
+    # Writes an event once its call has succeeded, taking a snapshot every snapshot_every events.
+    def append(self, event):
+        self.seq += 1
+        if self._fh is None:
+            return
+        event[0] = self.seq
+        self._fh.write(json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+        if self.snapshot_every and self.seq % self.snapshot_every == 0:
+            self.snapshot()
+    # Writes a full snapshot of the tracker, tagged with the event sequence and file offset it corresponds to.
+    # The snapshot file is rewritten as the base plus this snapshot, beside the old one and swapped in, so a crash leaves the old file whole.
+    def snapshot(self):
+        record = {"seq": self.seq, "offset": self._fh.tell(), "state": capture_state(self.tracker, self)}
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        if not self._snap_base:
+            self._snap_base = line
+            line = b""
+        tmp_path = self.snap_path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(self._snap_base + line)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(tmp_path, self.snap_path)
+    # Re-runs one recorded event against the tracker.
+    def apply(self, event):
+        if event[2] == "restore":
+            apply_step(self.tracker, *self._decode_step(event[3][0]))
+            self.seq = event[0]
+            return
+        target, method, args = event[1], event[2], self._decode_value(event[3])
+        kwargs = {k: self._decode_value(v) for k, v in event[4].items()} if len(event) > 4 else {}
+        obj = self.tracker if target == -1 else self.lookup(target)
+        if obj is self.tracker and method == "remove_condition":
+            cond = args[1]
+            args = [args[0], cond.condition_id if cond is not None else None]
+        self.depth += 1
+        try:
+            getattr(obj, method)(*args, **kwargs)
+        finally:
+            self.depth -= 1
+        self.seq = event[0]
+
+# Captures everything replay needs to rebuild a tracker as plain JSON-ready data. Warriors are listed in handle order, with their handles.
+# A horde's entry ends with its member columns.
+def capture_state(tracker, log):
+    warriors = []
+    conditions = []
+    handled = tracker.handled_combatants()
+    for w in handled:
+        entry = [getattr(w, field) for field in WARRIOR_FIELDS]
+        entry.append(tracker.eligible_from_round.get(w.handle))
+        if isinstance(w, Horde):
+            entry.append([list(column) for column in w.member_columns()])
+        warriors.append(entry)
+        for holder, c in w.held_conditions():
+            conditions.append([log.handle_of(holder), log._encode_condition(c), c.expired])
+    return {
+        "round": tracker.round_number,
+        "index": tracker.current_warrior_index,
+        "started": tracker.combat_started,
+        "columnar": tracker.store is not None,
+        "warriors": warriors,
+        "handles": [w.handle for w in handled],
+        "order": [w.handle for w in tracker.warriors],
+        "allies": [w.handle for w in tracker.allies],
+        "enemies": [w.handle for w in tracker.enemies],
+        "conditions": conditions,
+    }
+
+# Rebuilds a tracker from capture_state output, giving each warrior back its handle.
+# States written before handles were saved list warriors in handle order from 0, so their position is their handle.
+def restore_state(state, log):
+    tracker = Tracker(store=RosterStore() if state["columnar"] else None)
+    tracker.journal = log
+    log.tracker = tracker
+    handles = state.get("handles", range(len(state["warriors"])))
+    restored = []
+    log.depth += 1
+    try:
+        for handle, entry in zip(handles, state["warriors"]):
+            fields = dict(zip(WARRIOR_FIELDS, entry))
+            if len(entry) > len(WARRIOR_FIELDS) + 1:
+                w = Horde(fields["name"], fields["initiative"], fields["side"], fields["ac"], 0, len(entry[-1][0]), tiebreak_priority=fields["tiebreak_priority"])
+            elif tracker.store is not None:
+                w = tracker.store.add_row(fields["name"], fields["initiative"], fields["side"], fields["ac"], fields["hp_current"], fields["hp_max"])
+            else:
+                w = Warrior(fields["name"], fields["initiative"], fields["side"], fields["ac"], fields["hp_current"], fields["hp_max"])
+            tracker._attach(w, handle)
+            restored.append(w)
+            if entry[len(WARRIOR_FIELDS)] is not None:
+                tracker.eligible_from_round[handle] = entry[len(WARRIOR_FIELDS)]
+        # Conditions go on in their original order, before the stats, since applying some of them resets death saves.
+        for handle, fields, expired in state["conditions"]:
+            cond = log._decode_condition(fields)
+            cond.expired = expired
+            log.lookup(handle).apply_condition(cond)
+        for w, entry in zip(restored, state["warriors"]):
+            for field, value in zip(WARRIOR_FIELDS, entry):
+                setattr(w, field, value)
+            if isinstance(w, Horde):
+                w.restore_member_columns(entry[-1])
+    finally:
+        log.depth -= 1
+    tracker.warriors = [tracker.lookup(h) for h in state["order"]]
+    tracker.allies = [tracker.lookup(h) for h in state["allies"]]
+    tracker.enemies = [tracker.lookup(h) for h in state["enemies"]]
+    tracker.round_number = state["round"]
+    tracker.current_warrior_index = state["index"]
+    tracker.combat_started = state["started"]
+    return tracker
+
+# Helper for reading the first complete line of a file, or b"" if there is none.
+def _first_line(path):
+    try:
+        with open(path, "rb") as fh:
+            line = fh.readline()
+    except FileNotFoundError:
+        return b""
+    return line if line.endswith(b"\n") else b""
+
+# Helper for telling whether a decoded journal line is an event: [seq, target, method, args] with optional kwargs.
+def _is_event(record):
+    return isinstance(record, list) and len(record) in (4, 5) and isinstance(record[0], int) and isinstance(record[2], str)
+
+# Helper for reading complete JSON lines from a file; a torn final line left by a crash is ignored.
+def _read_lines(path, offset=0):
+    try:
+        fh = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with fh:
+        fh.seek(offset)
+        for line in fh:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield record, offset
+
+# Helper for rebuilding state up to event upto (or the end). Returns the log, still detached from any file, and the byte offset replay stopped at.
+# Raises ValueError if path has content but no snapshot and its first line is not an event, i.e. it is not a journal.
+def _rebuild(path, upto=None):
+    log = EventLog(path)
+    base = None
+    for record, _ in _read_lines(log.snap_path):
+        if upto is not None and record["seq"] > upto:
+            break
+        base = record
+    if base is None:
+        tracker = Tracker()
+        tracker.journal = log
+        log.tracker = tracker
+        offset = 0
+    else:
+        restore_state(base["state"], log)
+        log.seq = base["seq"]
+        offset = base["offset"]
+    for event, end in _read_lines(path, offset):
+        if not _is_event(event) or (upto is not None and event[0] > upto):
+            break
+        # An older journal's undo or redo is always followed by a snapshot replay starts from, so one only shows up here
+        # when a crash cut that snapshot off. It was then the last event, and it is dropped.
+        if event[2] in LEGACY_UNDO:
+            break
+        log.apply(event)
+        offset = end
+    if base is None and offset == 0 and os.path.exists(path) and os.path.getsize(path) > 0:
+        raise ValueError(f"Error: {path} is not an encounter journal.")
+    return log, offset
+
+# Rebuilds the tracker recorded in path as of event upto (default: the last complete event). The result is not journaled.
+def replay(path, upto=None):
+    log, _ = _rebuild(path, upto)
+    log.tracker.journal = None
+    return log.tracker
+
+# Helper for checking what follows the last replayed event before it is cut off. Only a torn final line, or an older journal's
+# undo or redo whose snapshot a crash cut off, may be there; anything else means the file is not (only) a journal, and ValueError is raised.
+def _check_tail(path, offset):
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        lines = fh.read().split(b"\n")[:-1]
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if not _is_event(event) or event[2] not in LEGACY_UNDO:
+            raise ValueError(f"Error: {path} has data after byte {offset} that is not a journal event; not resuming.")
+
+# Replays path and keeps recording to it, for picking an encounter back up after a crash. Returns (tracker, log).
+# Raises ValueError, leaving the file untouched, if path is not a journal.
+def resume(path, snapshot_every=SNAPSHOT_EVERY, fsync=False):
+    log, offset = _rebuild(path)
+    if os.path.exists(path) and os.path.getsize(path) > offset:
+        _check_tail(path, offset)
+    log.snapshot_every = snapshot_every
+    log.fsync = fsync
+    tracker = log.tracker
+    tracker.journal = None
+    log.tracker = None
+    # Drops any torn trailing write so new events start on a clean line.
+    if os.path.exists(path) and os.path.getsize(path) > offset:
+        with open(path, "r+b") as fh:
+            fh.truncate(offset)
+    # The tracker keeps the handles replay gave it, so new events carry on numbering where the file left off.
+    log.attach(tracker)
+    return tracker, log
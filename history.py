@@ -0,0 +1,291 @@
+# Undo/redo for Tracker changes. Headless; never imports tkinter.
+# Each undo step keeps before/after images of only what it touched: the stats and condition lists of combatants it changed,
+# and the turn pointer. Roster changes (adds, sorts, starting combat) are kept as the Tracker reports them: where the new
+# combatants landed, which slots a sort moved, and which eligible_from_round entries changed.
+# Undo and redo put those back, so their cost follows the size of the change rather than the encounter.
+
+# Imports.
+from collections import deque
+from operator import attrgetter
+from engine import Combatant
+from horde import Horde, HordeMember, MEMBER_COLUMNS
+
+# Global Constants.
+STAT_FIELDS = ("initiative", "ac", "hp_max", "hp_current_max", "hp_current", "death_save_failures", "death_save_successes", "tiebreak_priority")
+NOT_UNDOABLE = ("undo", "redo")
+DEFAULT_MAX_STEPS = 200
+# Rough cap on stored images across all steps: one cell per combatant stat image, condition entry or roster change,
+# plus one per horde member column value a horde image copies.
+DEFAULT_MAX_CELLS = 200000
+_read_stats = attrgetter(*STAT_FIELDS)
+_read_member = attrgetter(*MEMBER_COLUMNS)
+
+# Returns a combatant's stat image. A horde's also carries copies of its member columns, since its hp fields are only totals;
+# a horde member's is just its own entries in those columns.
+def _stat_image(combatant):
+    if isinstance(combatant, HordeMember):
+        return _read_member(combatant)
+    if isinstance(combatant, Horde):
+        return _read_stats(combatant) + (combatant.member_columns(),)
+    return _read_stats(combatant)
+
+# Puts a stat image from _stat_image back.
+def _restore_stats(combatant, image):
+    if isinstance(combatant, HordeMember):
+        for field, value in zip(MEMBER_COLUMNS, image):
+            setattr(combatant, field, value)
+        return
+    for field, value in zip(STAT_FIELDS, image):
+        setattr(combatant, field, value)
+    if isinstance(combatant, Horde):
+        combatant.restore_member_columns(image[-1])
+
+# Returns how many cells a stat image counts toward max_cells.
+def _image_cells(combatant):
+    if isinstance(combatant, Horde):
+        return 1 + len(combatant) * len(MEMBER_COLUMNS)
+    return 1
+
+# Helper for taking out the items at ascending positions in one pass.
+def _without(items, positions):
+    out = []
+    prev = 0
+    for pos in positions:
+        out.extend(items[prev:pos])
+        prev = pos + 1
+    out.extend(items[prev:])
+    return out
+
+# Helper for putting items back so they end up at the given ascending (position, item) pairs.
+def _with(items, placed):
+    out = []
+    prev = 0
+    for pos, item in placed:
+        take = pos - len(out)
+        out.extend(items[prev:prev + take])
+        prev += take
+        out.append(item)
+    out.extend(items[prev:])
+    return out
+
+# Replays one roster change recorded by the Tracker (see UndoHistory.note_roster), forwards for redo or backwards for undo.
+def apply_roster_change(tracker, change, forward):
+    kind = change[0]
+    if kind == "insert":
+        _, placed, added, eligible = change
+        allies = [w for w in added if tracker._side_key(w) == "allies"]
+        enemies = [w for w in added if tracker._side_key(w) == "enemies"]
+        if forward:
+            tracker.warriors = _with(tracker.warriors, placed)
+            tracker.allies.extend(allies)
+            tracker.enemies.extend(enemies)
+            tracker.eligible_from_round.update(eligible)
+        else:
+            tracker.warriors = _without(tracker.warriors, [pos for pos, _ in placed])
+            # Adds append to the side lists, and changes are undone newest first, so they are still at the end.
+            del tracker.allies[len(tracker.allies) - len(allies):]
+            del tracker.enemies[len(tracker.enemies) - len(enemies):]
+            for handle, _ in eligible:
+                tracker.eligible_from_round.pop(handle, None)
+    elif kind == "order":
+        warriors = tracker.warriors
+        for i, old, new in change[1]:
+            warriors[i] = new if forward else old
+    elif kind == "eligible":
+        eligible = tracker.eligible_from_round
+        for handle, old, new in change[1]:
+            value = new if forward else old
+            if value is None:
+                eligible.pop(handle, None)
+            else:
+                eligible[handle] = value
+
+# Puts one side (0 = before, 1 = after) of a step's images back on tracker. Only that side's images need to be filled in.
+def apply_step(tracker, step, side):
+    # Combatants the step added are unhooked after their conditions are rolled back on undo, and rehooked before they are rolled forward on redo.
+    if side == 1:
+        for w in step.added:
+            for holder, cond in w.held_conditions():
+                tracker._on_condition_added(holder, cond)
+    for combatant, image in step.conditions.items():
+        combatant._restore_conditions(image[side])
+    # Member images go after their horde's, since a horde imaged later in the step may hold a member's mid-step values.
+    for combatant, image in step.stats.items():
+        if not isinstance(combatant, HordeMember):
+            _restore_stats(combatant, image[side])
+    for combatant, image in step.stats.items():
+        if isinstance(combatant, HordeMember):
+            _restore_stats(combatant, image[side])
+    if side == 0:
+        for w in step.added:
+            for holder, cond in w.held_conditions():
+                tracker._on_condition_removed(holder, cond)
+    for change in (step.roster if side == 1 else reversed(step.roster)):
+        apply_roster_change(tracker, change, side == 1)
+    if step.turn is not None:
+        tracker.current_warrior_index, tracker.round_number, tracker.combat_started = step.turn[side]
+
+# UndoStep class holds [before, after] images for one undoable action.
+class UndoStep:
+    __slots__ = ("label", "stats", "conditions", "turn", "roster", "added", "cells")
+    def __init__(self, label):
+        self.label = label
+        # Combatant -> [before, after] stat tuples.
+        self.stats = {}
+        # Combatant -> [before, after] lists of (condition, duration).
+        self.conditions = {}
+        # [before, after] of (current_warrior_index, round_number, combat_started).
+        self.turn = None
+        # Roster changes reported by the Tracker, oldest first: ("insert", placed, added, eligible), ("order", moves) or ("eligible", changes).
+        self.roster = []
+        # Combatants the step brought into the roster.
+        self.added = []
+        self.cells = 0
+
+# UndoHistory class records undo steps for one tracker and walks them back and forth.
+class UndoHistory:
+    def __init__(self, max_steps=DEFAULT_MAX_STEPS, max_cells=DEFAULT_MAX_CELLS):
+        if max_steps < 1 or max_cells < 1:
+            raise ValueError("Error: undo history limits must be at least 1.")
+        self.max_steps = max_steps
+        self.max_cells = max_cells
+        self.tracker = None
+        self._undo = deque()
+        self._redo = []
+        self._cells = 0
+        self._step = None
+        self._group_depth = 0
+    # Starts recording a tracker.
+    def attach(self, tracker):
+        if tracker.history is not None:
+            raise ValueError("Error: tracker already has an undo history.")
+        self.tracker = tracker
+        tracker.history = self
+        return self
+    # Stops recording and forgets every step.
+    def detach(self):
+        if self.tracker is not None and self.tracker.history is self:
+            self.tracker.history = None
+        self.tracker = None
+        self.clear()
+    # Forgets every step.
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._cells = 0
+    # Checks whether there is anything to undo.
+    def can_undo(self):
+        return bool(self._undo)
+    # Checks whether there is anything to redo.
+    def can_redo(self):
+        return bool(self._redo)
+    # Returns the label of the step undo would revert, or None.
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+    # Returns the label of the step redo would re-apply, or None.
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+    # Groups every change until the matching end() into one undo step. Groups may nest; the outermost label wins.
+    def begin(self, label):
+        if self._group_depth == 0:
+            self._step = UndoStep(label)
+        self._group_depth += 1
+    # Closes a group opened with begin().
+    def end(self):
+        if self._group_depth == 0:
+            raise ValueError("Error: end() without a matching begin().")
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            self._commit()
+    # Called by Tracker._run_recorded before an outermost recorded call runs.
+    def open(self, obj, name, args):
+        if name in NOT_UNDOABLE:
+            return
+        if self._step is None:
+            self._step = UndoStep(name)
+        step = self._step
+        tracker = self.tracker
+        if step.turn is None:
+            step.turn = [(tracker.current_warrior_index, tracker.round_number, tracker.combat_started), None]
+        if isinstance(obj, Combatant):
+            self.touch(obj)
+        for arg in args:
+            if isinstance(arg, Combatant):
+                self.touch(arg)
+            elif isinstance(arg, (list, tuple)):
+                for item in arg:
+                    if isinstance(item, Combatant):
+                        self.touch(item)
+    # Called by Tracker._run_recorded after an outermost recorded call, successful or not.
+    def close(self):
+        if self._group_depth == 0:
+            self._commit()
+    # Saves a combatant's before image the first time the current step is about to change it.
+    # A horde member's stats live in its horde's columns, which a column fast path may already have changed earlier in the step.
+    # Once the horde is imaged that image covers the member; otherwise only the member's own entries are imaged.
+    def touch(self, combatant):
+        step = self._step
+        if step is None or combatant in step.conditions:
+            return
+        if combatant.turn_owner not in step.stats:
+            step.stats[combatant] = [_stat_image(combatant), None]
+        step.conditions[combatant] = [[(c, c.duration) for c in combatant.conditions], None]
+    # Called by the Tracker when it reshapes the roster during the current step; change is undone by apply_roster_change.
+    def note_roster(self, change):
+        if self._step is not None:
+            self._step.roster.append(change)
+    # Helper for finishing the current step: takes after images, drops anything unchanged, and pushes the step if something is left.
+    def _commit(self):
+        step = self._step
+        self._step = None
+        if step is None:
+            return
+        tracker = self.tracker
+        for combatant, image in list(step.stats.items()):
+            image[1] = _stat_image(combatant)
+            if image[0] == image[1]:
+                del step.stats[combatant]
+        for combatant, image in list(step.conditions.items()):
+            image[1] = [(c, c.duration) for c in combatant.conditions]
+            if image[0] == image[1]:
+                del step.conditions[combatant]
+        if step.turn is not None:
+            step.turn[1] = (tracker.current_warrior_index, tracker.round_number, tracker.combat_started)
+            if step.turn[0] == step.turn[1]:
+                step.turn = None
+        step.added = [w for change in step.roster if change[0] == "insert" for w in change[2]]
+        if not (step.stats or step.conditions or step.turn or step.roster):
+            return
+        step.cells = sum(_image_cells(combatant) for combatant in step.stats) + sum(len(b) + len(a) for b, a in step.conditions.values()) + 1
+        step.cells += sum(len(change[1]) for change in step.roster)
+        for old in self._redo:
+            self._cells -= old.cells
+        self._redo.clear()
+        self._undo.append(step)
+        self._cells += step.cells
+        # Oldest steps go first; the newest is always kept, even if it alone is over max_cells.
+        while len(self._undo) > 1 and (len(self._undo) > self.max_steps or self._cells > self.max_cells):
+            self._cells -= self._undo.popleft().cells
+    # Returns (step, side) that undo ("undo") or redo ("redo") would apply now, or None. Lets a journal record the step before it runs.
+    def pending(self, method):
+        if self._step is not None:
+            return None
+        if method == "undo":
+            return (self._undo[-1], 0) if self._undo else None
+        return (self._redo[-1], 1) if self._redo else None
+    # Reverts the latest step. Call through Tracker.undo so journals see it. Returns the step's label, or None.
+    def undo(self):
+        if not self._undo or self._step is not None:
+            return None
+        step = self._undo.pop()
+        apply_step(self.tracker, step, 0)
+        self._redo.append(step)
+        return step.label
+    # Re-applies the latest undone step. Call through Tracker.redo so journals see it. Returns the step's label, or None.
+    def redo(self):
+        if not self._redo or self._step is not None:
+            return None
+        step = self._redo.pop()
+        apply_step(self.tracker, step, 1)
+        self._undo.append(step)
+        return step.label
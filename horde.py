@@ -0,0 +1,247 @@
+# Hordes: many identical creatures that share one initiative slot and one roster row. Headless; never imports tkinter.
+# Each member's hit points and death saves live in typed arrays on the Horde, one entry per member. A HordeMember view over one member
+# is only made when that member is singled out (targeted, or given a condition); conditions live on those views, so each creature keeps its own.
+# Damage, healing, conditions and max HP changes sent to the Horde itself apply to every member.
+
+# Imports.
+from array import array
+from engine import Combatant, Condition, _recorded
+from roster_store import HEAL_CLEARS
+
+# Global Constants.
+# Per-member columns, each a signed 32-bit array indexed by member.
+MEMBER_COLUMNS = ("hp_max", "hp_current_max", "hp_current", "death_save_failures", "death_save_successes")
+
+# Builds a property that totals one member column. Assignments are ignored; undo and replay restore members column by column.
+def _total_property(column):
+    def fget(self):
+        return sum(getattr(self, "_" + column))
+    def fset(self, value):
+        pass
+    return property(fget, fset)
+
+# Builds a property that reads a fixed value and ignores assignments.
+def _fixed_property(value):
+    def fget(self):
+        return value
+    def fset(self, new_value):
+        pass
+    return property(fget, fset)
+
+# Horde class is a single initiative entry standing for count creatures with their own hit points and conditions.
+class Horde(Combatant):
+    __slots__ = ("name", "initiative", "side", "ac", "tiebreak_priority", "_hp_max", "_hp_current_max", "_hp_current", "_death_save_failures", "_death_save_successes", "_views", "disabled_members", "_tracker", "handle", "conditions_version")
+    hp_max = _total_property("hp_max")
+    hp_current_max = _total_property("hp_current_max")
+    hp_current = _total_property("hp_current")
+    # Death saves belong to members; the horde as a whole never has any.
+    death_save_failures = _fixed_property(0)
+    death_save_successes = _fixed_property(0)
+    # hp is each member's maximum; members start at hp_current if given (capped at hp), otherwise at full health.
+    def __init__(self, name, initiative, side, ac, hp, count, tiebreak_priority=0, hp_current=None):
+        if count < 1:
+            raise ValueError("Error: A horde needs at least 1 member.")
+        self.name = name
+        self.initiative = initiative
+        self.side = side
+        self.ac = ac
+        self.tiebreak_priority = tiebreak_priority
+        start = hp if hp_current is None else min(hp_current, hp)
+        self._hp_max = array("i", [hp] * count)
+        self._hp_current_max = array("i", [hp] * count)
+        self._hp_current = array("i", [start] * count)
+        self._death_save_failures = array("i", [0] * count)
+        self._death_save_successes = array("i", [0] * count)
+        # Member index -> HordeMember, made on first use.
+        self._views = {}
+        # Members holding a disabling condition, kept by the Tracker; the horde is disabled once every member is.
+        self.disabled_members = 0
+        self._init_conditions(None)
+    def __len__(self):
+        return len(self._hp_current)
+    # Returns the view over one member (0-based), making it on first use.
+    def member(self, index):
+        view = self._views.get(index)
+        if view is None:
+            if not 0 <= index < len(self):
+                raise IndexError(f"Error: {self.name} has no member {index + 1}.")
+            view = self._views[index] = HordeMember(self, index)
+        return view
+    # Returns views over every member, in order.
+    def members(self):
+        return [self.member(i) for i in range(len(self))]
+    # Returns the member views made so far, in member order. Members without a view have no conditions.
+    def member_views(self):
+        return [self._views[i] for i in sorted(self._views)]
+    # Returns the indices of members above 0 hp, scanning the hp column only.
+    def standing(self):
+        return [i for i, hp in enumerate(self._hp_current) if hp > 0]
+    # Yields the horde's own conditions (normally none), then every member's.
+    def held_conditions(self):
+        yield from super().held_conditions()
+        for view in self.member_views():
+            for cond in view.conditions:
+                yield view, cond
+    # Counts each condition name across members, e.g. {"poisoned": 3}.
+    def condition_counts(self):
+        counts = {}
+        for view in self._views.values():
+            for name, bucket in view._cond_by_name.items():
+                counts[name] = counts.get(name, 0) + len(bucket)
+        return counts
+    # Sum of the members' condition versions; changes whenever any member's conditions do.
+    @property
+    def members_version(self):
+        return self.conditions_version + sum(view.conditions_version for view in self._views.values())
+    # Returns copies of the member columns, in MEMBER_COLUMNS order.
+    def member_columns(self):
+        return tuple(array("i", getattr(self, "_" + column)) for column in MEMBER_COLUMNS)
+    # Puts member columns from member_columns() back. The member count must match.
+    def restore_member_columns(self, columns):
+        for column, values in zip(MEMBER_COLUMNS, columns):
+            if len(values) != len(self):
+                raise ValueError(f"Error: {self.name} has {len(self)} members, not {len(values)}.")
+            setattr(self, "_" + column, array("i", values))
+    # A horde is dead once every member is.
+    def is_dead(self):
+        return len(self._views) == len(self) and all(view.is_dead() for view in self._views.values())
+    # Checks whether the horde or any member has the condition.
+    def has_condition(self, name: str):
+        name = name.lower()
+        return name in self._cond_by_name or any(name in view._cond_by_name for view in self._views.values())
+    # Handles every member taking the same damage. Members that stay above 0 hp are updated straight in the hp column;
+    # the rest go through the full take_damage rules. Returns "slain" once the whole horde is dead.
+    @_recorded
+    def take_damage(self, amount, is_critical=False):
+        hp = self._hp_current
+        views = self._views
+        for i in range(len(hp)):
+            left = hp[i] - amount
+            view = views.get(i)
+            if left > 0 and (view is None or not view.is_dead()):
+                hp[i] = left
+            else:
+                self.member(i).take_damage(amount, is_critical=is_critical)
+        return "slain" if self.is_dead() else None
+    # Handles every member receiving the same healing. Members with no condition that healing has to clear are handled column-wise.
+    @_recorded
+    def heal(self, amount, resurrection_effect=False):
+        hp = self._hp_current
+        hp_cap = self._hp_current_max
+        fails = self._death_save_failures
+        passes = self._death_save_successes
+        for i in range(len(hp)):
+            view = self._views.get(i)
+            if view is not None and not HEAL_CLEARS.isdisjoint(view._cond_by_name):
+                view.heal(amount, resurrection_effect=resurrection_effect)
+                continue
+            fails[i] = 0
+            passes[i] = 0
+            hp[i] = min(hp[i] + amount, hp_cap[i])
+    # Handles applying a condition to every living member; each gets its own copy. Returns the strongest token any member returned.
+    @_recorded
+    def apply_condition(self, condition):
+        tokens = set()
+        for view in self.members():
+            if view.is_dead():
+                continue
+            copy = Condition(condition.name, condition.duration, condition.tick_timing, condition.source, view, condition.tick_owner, condition.expires_with_source)
+            tokens.add(view.apply_condition(copy))
+        for token in ("added_breaks_concentration", "added", "concentration_replace_requested"):
+            if token in tokens:
+                return token
+        return "duplicate_ignored"
+    # Handles setting every member's current maximum hp to value. value is per member, not a horde total.
+    @_recorded
+    def set_max_hp(self, value):
+        for view in self.members():
+            view.set_max_hp(value)
+    # Handles moving every member's current maximum hp by delta, column-wise, trimming current hp to fit.
+    @_recorded
+    def adjust_max_hp(self, delta):
+        hp = self._hp_current
+        hp_cap = self._hp_current_max
+        for i in range(len(hp)):
+            hp_cap[i] = max(0, hp_cap[i] + delta)
+            if hp[i] > hp_cap[i]:
+                hp[i] = hp_cap[i]
+    # Handles every member's maximum hp receiving a temporary buff.
+    @_recorded
+    def buff_max_hp(self, x, healing=False):
+        if x <= 0:
+            raise ValueError(f"Error: {x} must be greater than 0.")
+        for view in self.members():
+            view.buff_max_hp(x, healing=healing)
+    # Handles every member's maximum hp receiving a debuff.
+    @_recorded
+    def debuff_max_hp(self, x):
+        if x <= 0:
+            raise ValueError(f"Error: {x} must be greater than 0.")
+        for view in self.members():
+            view.debuff_max_hp(x)
+    # Debug helper to ensure the horde's and every member's condition maps are consistent.
+    def assert_index_integrity(self):
+        super().assert_index_integrity()
+        for view in self._views.values():
+            view.assert_index_integrity()
+            assert view._horde is self and self._views[view._index] is view
+
+# Builds a property that reads and writes one member column at the view's index.
+def _member_property(column):
+    column = "_" + column
+    def fget(self):
+        return getattr(self._horde, column)[self._index]
+    def fset(self, value):
+        getattr(self._horde, column)[self._index] = value
+    return property(fget, fset)
+
+# Builds a property that reads one of the horde's shared stats. Assignments are ignored; members follow their horde.
+def _shared_property(field):
+    def fget(self):
+        return getattr(self._horde, field)
+    def fset(self, value):
+        pass
+    return property(fget, fset)
+
+# HordeMember class is a lightweight Combatant over one member of a Horde. It acts on its horde's turn and keeps its own conditions.
+class HordeMember(Combatant):
+    __slots__ = ("_horde", "_index", "conditions_version")
+    hp_max = _member_property("hp_max")
+    hp_current_max = _member_property("hp_current_max")
+    hp_current = _member_property("hp_current")
+    death_save_failures = _member_property("death_save_failures")
+    death_save_successes = _member_property("death_save_successes")
+    initiative = _shared_property("initiative")
+    side = _shared_property("side")
+    ac = _shared_property("ac")
+    tiebreak_priority = _shared_property("tiebreak_priority")
+    def __init__(self, horde, index):
+        self._horde = horde
+        self._index = index
+        self._init_conditions(None)
+    # Members are tracked through their horde, so the tracker is always the horde's.
+    @property
+    def _tracker(self):
+        return self._horde._tracker
+    @_tracker.setter
+    def _tracker(self, value):
+        pass
+    # Members have no handle of their own; Tracker.handle_of names them through their horde.
+    @property
+    def handle(self):
+        return None
+    @handle.setter
+    def handle(self, value):
+        pass
+    @property
+    def name(self):
+        return f"{self._horde.name} {self._index + 1}"
+    @property
+    def horde(self):
+        return self._horde
+    @property
+    def index(self):
+        return self._index
+    @property
+    def turn_owner(self):
+        return self._horde
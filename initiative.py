@@ -0,0 +1,71 @@
+# Batch initiative rolling with automatic tiebreaks. Headless; never imports tkinter.
+# A whole batch is rolled with one call into a seedable random.Random. Each combatant's tiebreak_priority is set from a
+# deterministic key: higher dexterity first, and among enemies with the same dexterity, a unique seeded roll-off.
+# Allies sharing an initiative and a dexterity score are left tied, since players pick their own order.
+# Priorities only depend on the combatant, so batches added at different times still compare correctly.
+# Ties settled by hand keep their group's own priorities (see reranked_priorities), so they stay in the same key space.
+
+# Imports.
+from operator import add
+import random
+
+# Global Constants.
+D20 = range(1, 21)
+MIN_DEX = 1
+MAX_DEX = 30
+DEFAULT_DEX = 10
+# Room under each dexterity step for enemy roll-offs.
+ROLLOFF_SPAN = 1 << 20
+
+# Returns the tiebreak_priority for a dexterity score and roll-off (0 for none). Lower goes first, as in Tracker.
+def tiebreak_priority(dex, rolloff=0):
+    if not MIN_DEX <= dex <= MAX_DEX:
+        raise ValueError(f"Error: Dexterity must be between {MIN_DEX} and {MAX_DEX}.")
+    return (MAX_DEX - dex) * ROLLOFF_SPAN + rolloff
+
+# Returns distinct priorities for a tied group put in a new order by hand: the group's own priorities, sorted, handed out
+# in the new order and nudged up by one wherever two would be equal. Each stays within a step or two of its dexterity band,
+# so a combatant rolled later at the same initiative still sorts by its dexterity against the group.
+def reranked_priorities(priorities):
+    out = []
+    for priority in sorted(priorities):
+        if out and priority <= out[-1]:
+            priority = out[-1] + 1
+        out.append(priority)
+    return out
+
+# Rolls d20 + modifier for every combatant in one pass. dex_scores and sides are optional parallel lists.
+# Returns (initiatives, tiebreak priorities). Pass seed or rng to make the rolls repeatable.
+def roll_initiative(modifiers, dex_scores=None, sides=None, seed=None, rng=None):
+    n = len(modifiers)
+    if dex_scores is None:
+        dex_scores = [DEFAULT_DEX] * n
+    if sides is None:
+        sides = ["enemy"] * n
+    if len(dex_scores) != n or len(sides) != n:
+        raise ValueError("Error: modifiers, dex_scores and sides must be the same length.")
+    if rng is None:
+        rng = random.Random(seed)
+    initiatives = list(map(add, rng.choices(D20, k=n), modifiers))
+    # Distinct roll-offs for every enemy, drawn together; allies get none.
+    rolloffs = iter(rng.sample(range(1, ROLLOFF_SPAN), sum(1 for side in sides if side == "enemy")))
+    priorities = [tiebreak_priority(dex, next(rolloffs) if side == "enemy" else 0) for dex, side in zip(dex_scores, sides)]
+    return initiatives, priorities
+
+# Rolls initiative for a batch of add_warriors specs that carry "init_mod" (and optionally "dex") instead of "initiative".
+# Returns new specs with "initiative" and "tiebreak" filled in, ready for Tracker.add_warriors.
+def roll_specs(specs, seed=None, rng=None):
+    try:
+        modifiers = [int(spec["init_mod"]) for spec in specs]
+        dex_scores = [int(spec.get("dex", DEFAULT_DEX)) for spec in specs]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Error: every spec needs a whole-number init_mod, and dex if given must be a whole number.")
+    sides = [str(spec.get("side", "")).strip().lower() for spec in specs]
+    initiatives, priorities = roll_initiative(modifiers, dex_scores, sides, seed=seed, rng=rng)
+    out = []
+    for spec, initiative, priority in zip(specs, initiatives, priorities):
+        rolled = {k: v for k, v in spec.items() if k not in ("init_mod", "dex")}
+        rolled["initiative"] = initiative
+        rolled["tiebreak"] = priority
+        out.append(rolled)
+    return out
@@ -0,0 +1,220 @@
+# Runtime timers and counters for the tracker and its Window. Headless; never imports tkinter.
+# Off by default. While enabled, the measured methods are wrapped on the instances being watched (take_damage on the Combatant and
+# Horde classes, since combatants use __slots__); disabling puts the originals back, so an idle Instruments costs nothing.
+# Each operation keeps a call count, total and worst time, conditions scanned, and its most recent latencies for percentiles.
+# Rows a RosterStore or Horde updates straight in its hp column never call take_damage, so they show up only in the
+# damage_many or damage_area call (or the horde's own take_damage) that covered them.
+
+# Imports.
+from collections import deque
+import json
+import time
+from engine import Combatant
+from horde import Horde
+
+# Global Constants.
+TRACKER_OPERATIONS = ("next_turn", "_tick_for_actor", "remove_condition", "damage_many", "damage_area")
+# Classes whose take_damage is wrapped; Horde overrides Combatant's.
+DAMAGE_CLASSES = (Combatant, Horde)
+WINDOW_OPERATIONS = ("render_roster", "render_initiative", "_render_all", "_flush_render")
+PERCENTILES = (50, 90, 99)
+# Latest samples kept per operation for percentiles.
+DEFAULT_MAX_SAMPLES = 2048
+# Operations shown in the short status readout.
+READOUT_OPERATIONS = ("next_turn", "take_damage", "render_roster", "_flush_render")
+# Trackers with enabled instruments, for the shared take_damage wrappers.
+_watching = {}
+# Class -> its own take_damage, while the wrappers are on.
+_original_take_damage = {}
+
+# OpStats class holds the counters for one operation.
+class OpStats:
+    __slots__ = ("calls", "total", "worst", "scanned", "samples")
+    def __init__(self, max_samples):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.scanned = 0
+        self.samples = deque(maxlen=max_samples)
+    # Returns the given percentile of the kept samples, in seconds.
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, len(ordered) * pct // 100)]
+    # Returns the counters as a plain dict, times in milliseconds.
+    def to_dict(self):
+        out = {"calls": self.calls, "total_ms": self.total * 1000, "mean_ms": self.total * 1000 / self.calls if self.calls else 0.0, "max_ms": self.worst * 1000, "conditions_scanned": self.scanned}
+        for pct in PERCENTILES:
+            out[f"p{pct}_ms"] = self.percentile(pct) * 1000
+        return out
+
+# Instruments class measures one tracker and, optionally, the Window showing it.
+class Instruments:
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        if max_samples < 1:
+            raise ValueError("Error: max_samples must be at least 1.")
+        self.max_samples = max_samples
+        self.tracker = None
+        self.window = None
+        self.enabled = False
+        self.stats = {}
+        # Operations in progress, innermost last; conditions scanned count toward every one of them.
+        self._running = []
+        self._started = None
+    # Chooses what to measure. Takes effect right away if already enabled.
+    def attach(self, tracker, window=None):
+        was_enabled = self.enabled
+        self.disable()
+        self.tracker = tracker
+        self.window = window
+        if was_enabled:
+            self.enable()
+        return self
+    # Starts measuring.
+    def enable(self):
+        if self.enabled:
+            return
+        if self.tracker is None:
+            raise ValueError("Error: attach a tracker before enabling instruments.")
+        if self.tracker in _watching:
+            raise ValueError("Error: tracker is already being measured.")
+        for name in TRACKER_OPERATIONS:
+            self._wrap(self.tracker, name)
+        if self.window is not None:
+            for name in WINDOW_OPERATIONS:
+                self._wrap(self.window, name)
+        _watching[self.tracker] = self
+        _hook_combatants()
+        self.enabled = True
+        if self._started is None:
+            self._started = time.time()
+    # Stops measuring and puts the original methods back. Counters are kept.
+    def disable(self):
+        if not self.enabled:
+            return
+        for name in TRACKER_OPERATIONS:
+            self.tracker.__dict__.pop(name, None)
+        if self.window is not None:
+            for name in WINDOW_OPERATIONS:
+                self.window.__dict__.pop(name, None)
+        del _watching[self.tracker]
+        _unhook_combatants()
+        self.enabled = False
+    # Flips between enabled and disabled. Returns the new state.
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+    # Forgets every counter.
+    def reset(self):
+        self.stats.clear()
+        self._started = time.time() if self.enabled else None
+    # Helper for replacing a bound method with a timed one on its instance.
+    def _wrap(self, owner, name):
+        method = getattr(owner, name)
+        scan = getattr(self, "_scan_" + name.lstrip("_"), None)
+        def timed(*args, **kwargs):
+            return self._measure(name, method, scan, owner, args, kwargs)
+        timed.__name__ = name
+        setattr(owner, name, timed)
+    # Helper for timing one call. scan(obj, args) estimates the conditions the call looks at.
+    def _measure(self, name, method, scan, obj, args, kwargs):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = OpStats(self.max_samples)
+        if scan is not None:
+            scanned = scan(obj, args)
+            if scanned:
+                for running in self._running:
+                    running.scanned += scanned
+                stats.scanned += scanned
+        self._running.append(stats)
+        t0 = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self._running.pop()
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.worst:
+                stats.worst = elapsed
+            stats.samples.append(elapsed)
+    # Conditions a tick pass visits: the actor's bucket for that timing.
+    def _scan_tick_for_actor(self, tracker, args):
+        when, actor = args
+        return len(tracker._tick_buckets.get((actor, when), ()))
+    # Conditions a removal visits: the condition itself and everything tied to it.
+    def _scan_remove_condition(self, tracker, args):
+        warrior, condition_id = args
+        cond = warrior.get_condition_by_id(condition_id)
+        if cond is None:
+            return 0
+        anchor = "concentration" if cond.name == "concentration" else cond.name
+        return 1 + len(tracker._dependents.get((warrior, anchor), ()))
+    # Conditions take_damage checks for the combatant it hits. A horde checks each member view it has made once.
+    def _scan_take_damage(self, combatant, args):
+        if isinstance(combatant, Horde):
+            return len(combatant._views)
+        return len(combatant._cond_index)
+    # Conditions the roster re-reads: only shown rows whose condition text is out of date, judged the way Window._condition_text does.
+    def _scan_render_roster(self, window, args):
+        cache = window._cond_text_cache
+        scanned = 0
+        for w in window._targetable():
+            horde = isinstance(w, Horde)
+            version = w.members_version if horde else w.conditions_version
+            if cache.get(w, (None,))[0] != version:
+                scanned += sum(1 for _ in w.held_conditions()) if horde else len(w._cond_index)
+        return scanned
+    # Returns every counter as a dict, ready for json.
+    def report(self):
+        return {
+            "enabled": self.enabled,
+            "started": self._started,
+            "exported": time.time(),
+            "warriors": len(self.tracker.warriors) if self.tracker is not None else 0,
+            "operations": {name: stats.to_dict() for name, stats in sorted(self.stats.items())},
+        }
+    # Writes report() to a JSON file.
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.report(), fh, indent=1)
+    # Returns a one-line summary for a status readout, e.g. "next_turn 12× p50 0.04 ms p99 0.31 ms | ...".
+    def status_line(self):
+        parts = []
+        for name in READOUT_OPERATIONS:
+            stats = self.stats.get(name)
+            if stats is not None and stats.calls:
+                parts.append(f"{name} {stats.calls}× p50 {stats.percentile(50) * 1000:.2f} ms p99 {stats.percentile(99) * 1000:.2f} ms")
+        return " | ".join(parts) if parts else "Instruments on; no calls yet."
+
+# Helper for putting the shared take_damage wrappers on DAMAGE_CLASSES while any tracker is being measured.
+def _hook_combatants():
+    if _original_take_damage:
+        return
+    for cls in DAMAGE_CLASSES:
+        original = _original_take_damage[cls] = cls.__dict__["take_damage"]
+        cls.take_damage = _timed_take_damage(original)
+
+# Helper for building one class's take_damage wrapper around original.
+def _timed_take_damage(original):
+    def take_damage(self, *args, **kwargs):
+        instruments = _watching.get(self._tracker)
+        if instruments is None:
+            return original(self, *args, **kwargs)
+        return instruments._measure("take_damage", original.__get__(self), instruments._scan_take_damage, self, args, kwargs)
+    take_damage.__name__ = original.__name__
+    take_damage.__qualname__ = original.__qualname__
+    return take_damage
+
+# Helper for restoring take_damage once no tracker is being measured.
+def _unhook_combatants():
+    if _watching or not _original_take_damage:
+        return
+    for cls, original in _original_take_damage.items():
+        cls.take_damage = original
+    _original_take_damage.clear()
@@ -1,462 +1,76 @@
 # Primary file for Advanced Initiative Tracker.
 
 # Imports.
-import uuid
+from collections import OrderedDict, deque
+import random
+import sys
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog, font
+from tkinter import ttk, messagebox, font, filedialog
+from engine import CONDITIONS, DISABLING_CONDITIONS, BREAKS_CONCENTRATION, Condition, Tracker, WarriorSpecError, parse_warrior_spec
+from event_log import resume
+from history import UndoHistory
+from horde import Horde
+from death_saves import death_save_text
+from initiative import reranked_priorities, roll_specs
+from instrumentation import Instruments
+from snapshot import SNAPSHOT_EXTENSION, is_snapshot, load_snapshot, save_snapshot
 
 # Global Constants.
-UNIQUE_CONDITIONS = ("slain", "dying", "unconscious", "stable", "concentration")
-CONDITIONS = ("blinded", "charmed", "concentration", "deafened", "dying", "frightened", "grappled", "incapacitated", "invisible", "paralyzed", "petrified", "poisoned", "prone", "restrained", "slain", "stable", "stunned", "unconscious")
-# Conditions that render a creature unable to act, more or less permanently with regards to combat. Used for detecting team wipes.
-DISABLING_CONDITIONS = ("slain", "dying", "unconscious", "stable")
-BREAKS_CONCENTRATION = ("slain", "unconscious", "dying", "stable", "incapacitated", "paralyzed", "stunned", "petrified")
+# Most text widths kept in the roster's measurement cache before the least recently used are dropped.
+MEASURE_CACHE_SIZE = 512
+# Suffix a DMG log line gets for each take_damage result worth noting.
+_DAMAGE_TAGS = {"slain": " [slain]", "dying": " [dying]"}
 
-# Warrior class defines combatants: name, initiative, side, AC, HP, conditions, and associated durations.
-class Warrior:
-    def __init__(self, name, initiative, side, ac, hp_current, hp_max, hp_current_max=None, conditions=None, tiebreak_priority=0):
-        self.name = name
-        self.initiative = initiative
-        self.side = side
-        self.ac = ac
-        self.hp_max = hp_max
-        self.hp_current_max = hp_current_max if hp_current_max is not None else hp_max
-        self.hp_current = min(hp_current, self.hp_current_max)
-        self.conditions = []
-        self._cond_index = {}
-        self.death_save_failures = 0
-        self.death_save_successes = 0
-        self.tiebreak_priority = tiebreak_priority
-        if conditions:
-            for cond in conditions:
-                self.apply_condition(cond)
-    # Handles a combatant's maximum hp receiving a temporary buff and any associated healing effect.
-    def buff_max_hp(self, x, healing=False):
-        if x <= 0:
-            raise ValueError(f"Error: {x} must be greater than 0.")
-        if self.is_dead():
-            return
-        self.hp_current_max += x
-        if healing:
-            self.heal(x)
-        self.hp_current = min(self.hp_current, self.hp_current_max)
-    # Handles a combatant's maximum hp receiving a debuff and potential side effects.
-    def debuff_max_hp(self, x):
-        if x <= 0:
-            raise ValueError(f"Error: {x} must be greater than 0.")
-        if self.is_dead():
-            return
-        self.hp_current_max = max(self.hp_current_max - x, 0)
-        if self.hp_current_max <= 0:
-            self.hp_current = 0
-            self.apply_condition(Condition("slain"))
-            dying = self._find_condition_by_name("dying")
-            unconscious = self._find_condition_by_name("unconscious")
-            stable = self._find_condition_by_name("stable")
-            if dying is not None:
-                self.remove_condition(dying)
-            if unconscious is not None:
-                self.remove_condition(unconscious)
-            if stable is not None:
-                self.remove_condition(stable)
-            return
-        self.take_damage(x)
-        self.hp_current = min(self.hp_current, self.hp_current_max)
-    # Handles a combatant taking damage.
-    def take_damage(self, amount, is_critical=False):
-        # Checks if the target is dead already
-        if self.is_dead():
-            return "slain"
-        # Defines whether a target is already at 0
-        was_at_zero = (self.hp_current == 0)
-        # If not, adjusts current hp
-        self.hp_current -= amount
-        # If the target is an enemy and reduced to 0 hp or less, marks them as dead
-        if self.hp_current <= 0 and self.side == "enemy":
-            self.hp_current = 0
-            self.apply_condition(Condition("slain"))
-            return "slain"
-        # Provides conditions for when the target is an ally and reduced to 0 hp or less
-        if self.hp_current <= 0 and self.side == "ally":
-            # If the target is an ally, checks for massive damage
-            if self.hp_current <= -self.hp_current_max:
-                self.hp_current = 0
-                self.apply_condition(Condition("slain"))
-                dying = self._find_condition_by_name("dying")
-                if dying is not None:
-                    self.remove_condition(dying)
-                return "slain"
-            # Provides cases for when the target is an ally and not killed outright
-            else:
-                # If the ally is dropped to 0 hp, they are marked as dying
-                self.apply_condition(Condition("dying"))
-                # If the ally was already at 0, begins accruing death save failures
-                if was_at_zero:
-                    failures = 2 if is_critical else 1
-                    self.death_save_failures += failures
-                    if self.death_save_failures >= 3:
-                        self.apply_condition(Condition("slain"))
-                        dying = self._find_condition_by_name("dying")
-                        if dying is not None:
-                            self.remove_condition(dying)
-                        return "slain"
-                    return "dying"
-                self.hp_current = 0
-                return "dying"
-        return
-    # Helper method for finding conditions by name from string type.
-    def _find_condition_by_name(self, name: str):
-        return next((c for c in self.conditions if getattr(c, "name", "").lower() == name.lower()), None)
-    # Handles a combatant receiving healing.
-    def heal(self, amount, resurrection_effect=False):
-        if self.is_dead():
-            if resurrection_effect:
-                slain = self._find_condition_by_name("slain")
-                if slain is not None:
-                    self.remove_condition(slain)
-            else:
-                return
-        self.reset_death_saves()
-        unconscious = self._find_condition_by_name("unconscious")
-        dying = self._find_condition_by_name("dying")
-        stable = self._find_condition_by_name("stable")
-        if unconscious is not None:
-            self.remove_condition(unconscious)
-        if dying is not None:
-            self.remove_condition(dying)
-        if stable is not None:
-            self.remove_condition(stable)
-        self.hp_current += amount
-        if self.hp_current > self.hp_current_max:
-            self.hp_current = self.hp_current_max
-        return
-    # Helper function for checking death status.
-    def is_dead(self):
-        return any(c.name.lower() == "slain" for c in self.conditions)
-    # Helper function for checking unconscious status.
-    def is_unconscious(self):
-        return any(c.name.lower() == "unconscious" for c in self.conditions)
-    # Handles applying conditions to a combatant. Returns a token indicating what took place.
-    def apply_condition(self, condition):
-        name = condition.name
-        if name not in CONDITIONS:
-            raise ValueError(f"Error: Invalid condition name: {name}")
-        is_unique = (name in UNIQUE_CONDITIONS)
-        has_same = any(c.name == name for c in self.conditions)
-        reset_flag = False
-        token = "added"
-        if name == "concentration" and has_same:
-            return "concentration_replace_requested"
-        elif is_unique and has_same:
-            return "duplicate_ignored"
-        elif name == "slain" or name == "stable":
-            reset_flag = True
-            token = "added_breaks_concentration"
-        elif name in BREAKS_CONCENTRATION:
-            token = "added_breaks_concentration"
-        else:
-            token = "added"
-        self.conditions.append(condition)
-        self._cond_index[condition.condition_id] = condition
-        if reset_flag:
-            self.reset_death_saves()
-        return token
-    # Handles removing conditions from a combatant.
-    def remove_condition(self, condition):
-        if condition not in self.conditions:
-            return 0
-        self.conditions.remove(condition)
-        self._cond_index.pop(condition.condition_id, None)
-        return 1
-    # Handles retrieving condition id.
-    def get_condition_by_id(self, condition_id):
-        return self._cond_index.get(condition_id)
-    # Debug helper to ensure list and dict are consistent.
-    def assert_index_integrity(self):
-        assert len(self._cond_index) == len(set(self._cond_index.keys()))
-        assert len(self.conditions) == len(self._cond_index)
-        for cond in self.conditions:
-            assert cond.condition_id in self._cond_index
-            assert self._cond_index[cond.condition_id] is cond
-    # Handles the mechanics of failed death saving throws.
-    def fail_death_saves(self, is_critical=False):
-        if self.hp_current > 0:
-            return
-        if self.is_dead():
-            return "slain"
-        self.death_save_failures += 2 if is_critical else 1
-        if self.death_save_failures >= 3:
-            dying = self._find_condition_by_name("dying")
-            if dying:
-                self.remove_condition(dying)
-            self.apply_condition(Condition("slain"))
-            return "slain"
-    # Handles the mechanics of successful death saving throws.
-    def succeed_death_saves(self, is_critical=False):
-        if self.hp_current > 0:
-            return
-        if self.is_dead():
-            return "slain"
-        slain = self._find_condition_by_name("slain")
-        unconscious = self._find_condition_by_name("unconscious")
-        dying = self._find_condition_by_name("dying")
-        self.death_save_successes += 1
-        if is_critical:
-            if slain is not None:
-                self.remove_condition(slain)
-            if unconscious is not None:
-                self.remove_condition(unconscious)
-            if dying is not None:
-                self.remove_condition(dying)
-            self.hp_current = 1
-            self.reset_death_saves()
-            return
-        if self.death_save_successes == 3:
-            if dying is not None:
-                self.remove_condition(dying)
-            self.apply_condition(Condition("stable"))
-    # Resets counts associated with death saving throws when necessary.
-    def reset_death_saves(self):
-        self.death_save_successes = 0
-        self.death_save_failures = 0
-    # Handles condition timers.
-    def tick_conditions(self, timing, current_actor=None):
-        # Loops through a copy of the conditions affecting each combatant.
-        for condition in list(self.conditions):
-            # Checks to see if each condition has a timer and when that timer should tick down. Decrements timer when appropriate.
-            if condition.should_tick(timing, current_actor) and condition.tick():
-                    # When the timer reaches 0 (ie. when condition.tick() returns "True"), the condition is removed.
-                    self.remove_condition(condition)
-
-# Conditions class defines various combat conditions.
-class Condition:
-    def __init__(self, name, duration=None, tick_timing=None, source=None, target=None, tick_owner=None, expires_with_source=None, condition_id=None):
-        self.name = name.lower()
-        if duration is None:
-            self.duration = duration
-        elif isinstance(duration, bool):
-            raise TypeError("Error: Duration must be None or a whole number greater than 0.")
-        elif isinstance(duration, int) and duration >= 0:
-            self.duration = duration
-        else:
-            raise TypeError("Error: Duration must be None or a whole number greater than 0.")
-        self.tick_timing = tick_timing.lower() if tick_timing else None
-        assert self.tick_timing in (None, "start", "end"), (f"Error: Invalid tick_timing: {self.tick_timing}")
-        self.source = source
-        assert (self.source is None or hasattr(self.source, "name")), (f"Error: Invalid source: {self.source}")
-        self.target = target
-        assert (self.target is None or hasattr(self.target, "name")), (f"Error: Invalid target: {self.target}")
-        self.tick_owner = tick_owner.lower() if tick_owner else None
-        assert self.tick_owner in (None, "source", "target"), (f"Error: Invalid tick_owner: {self.tick_owner}")
-        self.expired = False
-        self.expires_with_source = expires_with_source.lower() if expires_with_source else None
-        self.condition_id = condition_id or str(uuid.uuid4())
-    # Checks condition duration and decrements it, but never below 0. 0 is the expiration condition and will return True.
-    def tick(self):
-        if self.duration is None:
-            return False
-        if self.duration > 0:
-            self.duration -= 1
-        if self.duration == 0 and not self.expired:
-            self.expired = True
-            return True
-        return False
-    # Indicates when a condition duration should tick. Returns True to indicate ticking should occur.
-    def should_tick(self, timing, current_actor):
-        # Helper function to normalize names.
-        def normalize(value):
-            if isinstance(value, Warrior):
-                return value.name.lower()
-            elif isinstance(value, str):
-                return value.lower()
-            else:
-                return None
-        # Normalizes variable names to lower case for comparison.
-        current_actor = normalize(current_actor)
-        target_name = normalize(self.target)
-        source_name = normalize(self.source)
-        towner_name = normalize(self.tick_owner)
-        # Normalizes timing case as safety net.
-        timing = timing.lower() if isinstance(timing, str) else timing
-        # Forces timing match.
-        if self.tick_timing != timing:
-            return False
-        # If no specific owner, always tick when timing matches.
-        if not towner_name:
-            return True
-        # If the tick owner is the target, tick on target's turn.
-        if towner_name == "target":
-            if target_name is None or current_actor is None:
-                return False
-            return current_actor == target_name
-        # If the tick owner is the source, tick on source's turn.
-        if towner_name == "source":
-            if source_name is None or current_actor is None:
-                return False
-            return current_actor == source_name
-        # Returns False by default.
-        return False
+# One combat log entry. Stores a str.format template and its arguments; the text is only built when shown or exported.
+class LogRecord:
+    __slots__ = ("template", "args")
+    def __init__(self, template, args=()):
+        self.template = template
+        self.args = args
+    def __str__(self):
+        return self.template.format(*self.args) if self.args else self.template
 
-# Tracker class creates empty list of combatants, allies/enemies, sets current combatant to 0.
-class Tracker:
-    def __init__(self):
-        self.warriors = []
-        self.allies = []
-        self.enemies = []
-        self.current_warrior_index = 0
-        self.round_number = 1
-        # Used for determining when added warriors can act, in case of mid-combat adds (summonings, animation of corpses, etc.)
-        self.eligible_from_round = {}
-    # Handles moving from turn to turn.
-    def next_turn(self):
-        # Safely handles cases where next turn is called on an empty list of combatants.
-        if len(self.warriors) == 0:
-            return None
-        # Future proofing.
-        self.current_warrior_index %= len(self.warriors)
-        # Defines current warrior in initiative.
-        current_warrior = self.warriors[self.current_warrior_index]
-        # Loops through current combatant's conditions (if any) and ticks any that decrement at end of turn.
-        self._tick_for_actor("end", current_warrior)
-        # Increments index in list of combatants.
-        self.current_warrior_index += 1
-        # Resets index to 0 and advances round number if reaching the end of initiative list.
-        if self.current_warrior_index >= len(self.warriors):
-            self.current_warrior_index = 0
-            self.round_number += 1
-        # Handles indexing for combatants inserted into an active combat.
-        next_index = self.current_warrior_index
-        i = 0
-        while i < len(self.warriors):
-            candidate = self.warriors[next_index]
-            eligible_from = self.eligible_from_round.get(id(candidate), 1)
-            if eligible_from <= self.round_number:
-                break
-            else:
-                next_index += 1
-                if next_index == len(self.warriors):
-                    next_index = 0
-                    self.round_number += 1
-            i += 1
-        self.current_warrior_index = next_index
-        # Defines new current warrior.
-        new_warrior = self.warriors[self.current_warrior_index]
-        # Loops through current combatant's conditions (if any) and ticks any that decrement at start of turn.
-        self._tick_for_actor("start", new_warrior)
-        self.check_team_able()
-        # Returns the new current combatant in the list.
-        return new_warrior
-    # Checks for disabled combatants.
-    def _is_disabled(self, warrior):
-        return any(c.name in DISABLING_CONDITIONS for c in warrior.conditions)
-    # Checks for disabled sides.
-    def check_team_able(self):
-        allies_disabled = len(self.allies) > 0 and all(self._is_disabled(w) for w in self.allies)
-        enemies_disabled = len(self.enemies) > 0 and all(self._is_disabled(w) for w in self.enemies)
-        return {"allies_disabled": allies_disabled, "enemies_disabled": enemies_disabled}
-    # Adds combatants to lists, determining what round they can first act in if they are added in the midst of combat.
-    def add_warrior(self, name, initiative, side, ac, hp_current, hp_max, conditions):
-        current_ref = None
-        warrior = Warrior(name, initiative, side, ac, hp_current, hp_max, conditions)
-        if len(self.warriors) == 0:
-            self.warriors.append(warrior)
-            self.sort_warriors()
-            self.current_warrior_index = 0
-            if warrior.side == "enemy":
-                self.enemies.append(warrior)
-            else:
-                self.allies.append(warrior)
-            self.eligible_from_round[id(warrior)] = self.round_number
-        else:
-            current_ref = self.warriors[self.current_warrior_index]
-            self.warriors.append(warrior)
-            if warrior.side == "enemy":
-                self.enemies.append(warrior)
-            else:
-                self.allies.append(warrior)
-            self.sort_warriors()
-            self.current_warrior_index = self.warriors.index(current_ref)
-            new_index = self.warriors.index(warrior)
-            if new_index > self.current_warrior_index:
-                self.eligible_from_round[id(warrior)] = self.round_number
-            else:
-                self.eligible_from_round[id(warrior)] = self.round_number + 1
-        return warrior
-    # Initiative sorting.
-    def sort_warriors(self):
-        self.warriors.sort(key=lambda x: (-x.initiative, x.tiebreak_priority))
-    # Handles condition removal cascade.
-    def remove_condition(self, warrior, condition_id):
-        # Establishes specific instance of condition and returns an error if that instance is not found.
-        c_instance = warrior.get_condition_by_id(condition_id)
-        if c_instance is None:
-            return {"removed":0, "primary_id": condition_id, "cascaded":[], "reason":"not_found"}
-        # Removes conditions.
-        removed = warrior.remove_condition(c_instance)
-        if removed == 0:
-            return {"removed":0, "primary_id": condition_id, "cascaded":[], "reason":"not_found"}
-        anchor = "concentration" if c_instance.name == "concentration" else c_instance.name
-        temp_list = []
-        for w in self.warriors:
-            for cond in list(w.conditions):
-                if cond.source is warrior and cond.expires_with_source == anchor:
-                    c = (w, cond)
-                    temp_list.append(c)
-        cascaded_list = []
-        for w, cond in temp_list:
-            removed = w.remove_condition(cond)
-            if removed:
-                cascaded_list.append(cond.condition_id)
-        self.check_team_able()
-        return {"removed": 1, "primary_id": condition_id, "cascaded": cascaded_list}
-    # Handles initiative ties, allowing the user to manually sort tied combatants in the gui.
-    def get_initiative_ties(self):
-        ties = {}
-        for warrior in self.warriors:
-            ties.setdefault(warrior.initiative, []).append(warrior)
-        return {init: group for init, group in ties.items() if len(group) > 1}
-    # Ticking helper.
-    def _tick_for_actor(self, when, actor):
-        if actor is None:
-            return
-        for w in self.warriors:
-            for c in list(getattr(w, "conditions", [])):
-                if getattr(c, "duration", None) is None:
-                    continue
-                if getattr(c, "tick_timing", None) != when:
-                    continue
-                owner = getattr(c, "tick_owner", None)
-                should_tick = False
-                if owner == "target":
-                    should_tick = (w is actor)
-                elif owner == "source":
-                    should_tick = (getattr(c, "source", None) is actor)
-                #elif owner in (None, "none"):
-                #    should_tick = (when == "start" and self.current_warrior_index == 0)
-                if not should_tick:
-                    continue
-                c.duration -= 1
-                if c.duration <= 0:
-                    self.remove_condition(w, c.condition_id)
+# Makes everything a GUI handler changes a single undo step, however many engine calls it takes.
+def _undo_step(label):
+    def decorate(handler):
+        def wrapper(self, *args, **kwargs):
+            history = self.tracker.history
+            if history is None:
+                return handler(self, *args, **kwargs)
+            history.begin(label)
+            try:
+                return handler(self, *args, **kwargs)
+            finally:
+                history.end()
+        wrapper.__name__ = handler.__name__
+        return wrapper
+    return decorate
 
 # Window class used for creating a functional GUI.
 class Window:
     # Defines the window and inputs.
-    def __init__(self, tracker, title="Combat Tracker", open_add_modal_on_start=True, cons_catalog=CONDITIONS, breaks_conc=BREAKS_CONCENTRATION, disab_conditions=DISABLING_CONDITIONS, hotkeys=None):
+    def __init__(self, tracker, title="Combat Tracker", open_add_modal_on_start=True, cons_catalog=CONDITIONS, breaks_conc=BREAKS_CONCENTRATION, disab_conditions=DISABLING_CONDITIONS, hotkeys=None, log_max_lines=500, death_save_turns=None, initiative_seed=None):
         # parent widget creating an instance of Tk
         if not isinstance(tracker, Tracker):
             raise TypeError("Error: no Tracker instance present.")
+        # Milliseconds spent in each startup phase, in order; see _startup_phase.
+        self.startup_phases = {}
+        self._startup_began = self._phase_mark = time.perf_counter()
+        self.startup_ms = None
         self.tracker = tracker
+        if tracker.history is None:
+            UndoHistory().attach(tracker)
         self.root = tk.Tk()
+        self._startup_phase("tk")
         self.open_add_modal_on_start = open_add_modal_on_start
         self.cons_catalog = cons_catalog
         self.breaks_conc = breaks_conc
         self.disab_conditions = disab_conditions
         self.hotkeys = hotkeys
         self._suppress_select = False
-        self._iid_to_warrior = {}
         self.selected_warrior = None
-        self._combat_started = False
+        self._combat_started = tracker.combat_started
         self.var_target = tk.StringVar()
         self._target_values = []
         self.var_amount = tk.StringVar()
@@ -484,9 +98,51 @@ class Window:
             "label_bg": "NavajoWhite4"
         }
         self.tags = {"current": "current_actor", "slain": "slain"}
-        self._roster_iid_to_warrior = {}
-        # Builds the tkinter root.
-        self.root.withdraw() # Hides the first iteration of the gui window for better sizing operation.
+        # Hordes whose members are listed under them in the roster and offered as targets; toggled by double-clicking the horde.
+        self._expanded_hordes = set()
+        # Last (values, tags) shown per Treeview row and the row order, so renders only touch rows that changed.
+        # Row iids are tracker handles (see _iid), so a row maps back to its combatant through tracker.lookup.
+        self._init_rows = {}
+        self._init_order = []
+        self._roster_rows = {}
+        self._roster_order = []
+        # Warrior -> (conditions_version, joined condition names) for the roster's Conditions column.
+        self._cond_text_cache = {}
+        # Pixel widths for the Conditions column: an LRU of (font name, text) -> px, each warrior's current width, and their running max.
+        self._measure_cache = OrderedDict()
+        self._cond_px = {}
+        self._cond_px_max = 0
+        self._roster_font = None
+        self._cond_col_width = None
+        # Dice for the add modal's initiative roller; a seed makes the rolls repeatable.
+        self._initiative_rng = random.Random(initiative_seed)
+        # Death save odds in the roster cover this many more saves, or until settled when None.
+        self.death_save_turns = death_save_turns
+        # Combat log: every record kept (up to log_max_lines), records waiting for the next flush, and lines currently in the Text widget.
+        self.log_max_lines = log_max_lines
+        self.log_records = deque(maxlen=log_max_lines)
+        self._log_pending = []
+        self._log_widget_lines = 0
+        # Render scheduler: stale regions, the pending after_idle id, and the order regions are flushed in.
+        self._dirty = set()
+        self._render_pending = None
+        self._flushing = False
+        # Renderers are looked up by name on every flush, so instrumentation can wrap them at runtime.
+        self._render_steps = (
+            ("targets", "_render_target_options"),
+            ("cond_lists", "_render_cond_sources_and_targets"),
+            ("roster", "render_roster"),
+            ("initiative", "render_initiative"),
+            ("right_panel", "render_right_panel"),
+            ("hp_controls", "_validate_hp_controls"),
+            ("conditions_panel", "_render_conditions_panel"),
+            ("conc_ties", "_recompute_conc_tie_counts"),
+            ("conditions_block", "_validate_conditions_block"),
+            ("log", "_flush_log"),
+        )
+        # Timers and counters, off until toggled with F12; the readout in the log header shows them while on.
+        self.instruments = Instruments().attach(tracker, self)
+        self.instruments_text = tk.StringVar(value="")
         # Pulls the title into the gui display.
         self.root.title(title)
         # Calculates user's screen size.
@@ -507,10 +163,8 @@ class Window:
         y = int((screenh_full - screenh) // 2)
         # Generates full screen size, defaulting to 16:9 aspect ratio.
         full_screen = f"{screenw}x{screenh}+{x}+{y}"
+        # Set before anything is drawn, so the first frame already has its final size and no hide/show pass is needed.
         self.root.geometry(full_screen)
-        self.root.update_idletasks()
-        self.root.deiconify()
-        self.root.after_idle(self.root.geometry, full_screen)
         # Establishes minimum screen size for smaller displays.
         self.root.minsize(1120, 630)
         # Note: screen size is, by default, manually adjustable by the user.
@@ -520,13 +174,35 @@ class Window:
         self.root.grid_columnconfigure(2, weight=2, uniform="cols")
         self.root.grid_rowconfigure(0, weight=3, uniform="rows")
         self.root.grid_rowconfigure(1, weight=1, uniform="rows")
-        # Sets up the panel frames in the gui.
+        self._startup_phase("geometry")
+        # Sets up the panel frames in the gui. The conditions panel and the log wait until the first frame is on screen.
         self._setup_left_frame()
+        self._startup_phase("left_panel")
         self._setup_central_frame()
+        self._startup_phase("central_panel")
         self._setup_right_frame()
-        self._update_concentration_toggle_state()
-        self._setup_log_frame()
+        self._startup_phase("right_panel")
+        self._deferred_built = False
         self._render_all()
+        self.root.after_idle(self._finish_startup)
+    # Records how long the startup phase that just ended took, in milliseconds.
+    def _startup_phase(self, name):
+        now = time.perf_counter()
+        self.startup_phases[name] = (now - self._phase_mark) * 1000.0
+        self._phase_mark = now
+    # Runs on the first idle cycle, after the initial render: puts the first frame on screen, then builds the deferred panels.
+    # Also called directly by anything that needs those panels sooner; only the first call does the work.
+    def _finish_startup(self):
+        if self._deferred_built:
+            return
+        self._deferred_built = True
+        self.root.update_idletasks()
+        self._startup_phase("first_frame")
+        self.startup_ms = (self._phase_mark - self._startup_began) * 1000.0
+        self._setup_conditions_panel()
+        self._setup_log_frame()
+        self._mark_dirty("cond_lists", "conditions_panel", "conc_ties", "conditions_block", "log")
+        self._startup_phase("deferred_panels")
     # Defines panels and contents.
     def _setup_left_frame(self):
         # Establishes 'borders' for frame.
@@ -608,7 +284,7 @@ class Window:
         self.central_list.grid_rowconfigure(0, weight=1)
         self.central_list.grid_rowconfigure(1, weight=0)
         # Creates roster treeview.
-        self.roster = ttk.Treeview(self.central_list, columns=("Name", "AC", "HP", "Max HP", "Conditions", "Fail", "Pass"), show="headings", selectmode="browse")
+        self.roster = ttk.Treeview(self.central_list, columns=("Name", "AC", "HP", "Max HP", "Conditions", "Fail", "Pass", "Odds"), show="headings", selectmode="browse")
         self.roster.heading("Name", text="Name")
         self.roster.heading("AC", text="AC")
         self.roster.heading("HP", text="HP")
@@ -616,6 +292,7 @@ class Window:
         self.roster.heading("Conditions", text="Conditions")
         self.roster.heading("Fail", text="Fail")
         self.roster.heading("Pass", text="Pass")
+        self.roster.heading("Odds", text="Stable / Dead / Up")
         style = ttk.Style(self.root)
         style.configure("Treeview", background=self.colors["list_bg"], fieldbackground=self.colors["list_bg"])
         self.roster.column("Name", width=200, anchor="w", stretch=True)
@@ -625,6 +302,7 @@ class Window:
         self.roster.column("Conditions", width=280, minwidth=220, anchor="w", stretch=True)
         self.roster.column("Fail", width=40, anchor="w", stretch=False)
         self.roster.column("Pass", width=40, anchor="w", stretch=False)
+        self.roster.column("Odds", width=150, anchor="w", stretch=False)
         # Creates the roster scrollbars.
         self.roster_vert = ttk.Scrollbar(self.central_list, orient="vertical", command=self.roster.yview)
         self.roster_horiz = ttk.Scrollbar(self.central_list, orient="horizontal", command=self.roster.xview)
@@ -636,6 +314,7 @@ class Window:
         self.roster_vert.grid(row=0, column=1, sticky="ns")
         self.roster_horiz.grid(row=1, column=0, sticky="ew")
         self.roster.bind("<<TreeviewSelect>>", self._on_roster_select)
+        self.roster.bind("<Double-1>", self._on_roster_toggle_horde)
     def _setup_right_frame(self):
         # Right panel frame configuration.
         self.right_frame_border = tk.Frame(self.root, bg=self.colors["border"])
@@ -662,6 +341,21 @@ class Window:
         # 'Add Combatant' button configuration.
         self.add_combat_btn = ttk.Button(self.add_combatant_frame, text="Add Combatant", command=self._open_add_warrior_modal)
         self.add_combat_btn.grid(row=0, column=0, sticky="ew", padx=1, pady=1)
+        # 'Save Encounter' button configuration.
+        self.save_enc_btn = ttk.Button(self.add_combatant_frame, text="Save Encounter", command=self._on_save_encounter)
+        self.save_enc_btn.grid(row=1, column=0, sticky="ew", padx=1, pady=1)
+        # 'Undo' and 'Redo' buttons, side by side.
+        self.undo_frame = tk.Frame(self.add_combatant_frame, bg=self.colors["button_bg"])
+        self.undo_frame.grid(row=2, column=0, sticky="ew")
+        self.undo_frame.grid_columnconfigure(0, weight=1)
+        self.undo_frame.grid_columnconfigure(1, weight=1)
+        self.undo_btn = ttk.Button(self.undo_frame, text="Undo", command=self._on_undo)
+        self.undo_btn.grid(row=0, column=0, sticky="ew", padx=1, pady=1)
+        self.redo_btn = ttk.Button(self.undo_frame, text="Redo", command=self._on_redo)
+        self.redo_btn.grid(row=0, column=1, sticky="ew", padx=1, pady=1)
+        self.root.bind("<Control-z>", self._on_undo)
+        self.root.bind("<Control-y>", self._on_redo)
+        self.root.bind("<Control-Z>", self._on_redo)
         # Sets up 'Start Combat' button.
         self.strt_frame = tk.Frame(self.right_frame, bg=self.colors["border"])
         self.strt_frame.grid(row=1, column=0, sticky="ew", padx=1, pady=1)
@@ -733,6 +427,7 @@ class Window:
         self.dmg_hl_btn_frame.grid(row=0, column=0, sticky="ew", padx=1, pady=1)
         self.dmg_hl_btn_frame.grid_columnconfigure(0, weight=1)
         self.dmg_hl_btn_frame.grid_columnconfigure(1, weight=1)
+        self.dmg_hl_btn_frame.grid_columnconfigure(2, weight=1)
         self.dmg_hl_btn_frame.grid_rowconfigure(0, weight=1)
         # Max HP delta buttons
         self.mx_btn_frame = tk.Frame(self.dmg_hl_border, bg=self.colors["button_bg"])
@@ -747,6 +442,9 @@ class Window:
         self.dmg_btn.grid(row=0, column=0, sticky="ew", padx=1, pady=1)
         self.hl_btn = ttk.Button(self.dmg_hl_btn_frame, text="Heal", command=self._on_heal_apply)
         self.hl_btn.grid(row=0, column=1, sticky="ew", padx=1, pady=1)
+        # Damage for many targets at once (fireballs and the like), each with its own amount or half on a save.
+        self.aoe_btn = ttk.Button(self.dmg_hl_btn_frame, text="Area Damage…", command=self._open_area_damage_modal)
+        self.aoe_btn.grid(row=0, column=2, sticky="ew", padx=1, pady=1)
         # HP management widgets.
         self.targeting = ttk.Combobox(self.targeter, state="readonly", textvariable=self.var_target)
         self.targeting.grid(row=0, column=0, sticky="nsew", padx=1, pady=1)
@@ -778,6 +476,12 @@ class Window:
         self.conditions_border.grid(row=4, column=0, sticky="nsew", padx=1, pady=1)
         self.conditions_border.grid_columnconfigure(0, weight=1)
         self.conditions_border.grid_rowconfigure(0, weight=1)
+        # Renders the right panel and its contents.
+        self.render_right_panel()
+        self._rebuild_target_options()
+        self._validate_hp_controls()
+    # Builds the conditions panel inside its (already placed) frame. Deferred until after the first frame; see _finish_startup.
+    def _setup_conditions_panel(self):
         self.conditions_panel = tk.Frame(self.conditions_border, bg=self.colors["panel_bg"])
         self.conditions_panel.grid(row=0, column=0, sticky="nsew", padx=1, pady=1)
         self.conditions_panel.grid_columnconfigure(0, weight=1)
@@ -907,10 +611,8 @@ class Window:
         self.clear_cond_btn = ttk.Button(self.cond_details, text="Clear Condition", command=self._on_conditions_clear, state="disabled")
         self.clear_cond_btn.grid(row=2, column=2, columnspan=2, sticky="ew", padx=1, pady=1)
         self.var_cond_concentration_tie.trace_add("write", lambda *a: self._render_all())
-        # Renders the right panel and its contents.
-        self.render_right_panel()
-        self._rebuild_target_options()
-        self._validate_hp_controls()
+        self._update_concentration_toggle_state()
+    # Builds the combat log panel. Deferred until after the first frame; records logged before then are shown once it exists.
     def _setup_log_frame(self):
         # Log panel frame configuration.
         self.log_frame_border = tk.Frame(self.root, bg=self.colors["border"])
@@ -932,13 +634,25 @@ class Window:
         self.log_header.grid(row=0, column=0, sticky="nsew", padx=1, pady=1)
         self.log_header_lbl = tk.Label(self.log_header, text="Combat Actions Log", bg=self.colors["button_bg"])
         self.log_header_lbl.grid(row=0, column=0, sticky="ew", padx=1, pady=1)
+        # Instrumentation readout; only shown while instruments are on.
+        self.instruments_lbl = tk.Label(self.log_header, textvariable=self.instruments_text, bg=self.colors["button_bg"], anchor="e")
+        self.root.bind("<F12>", self._on_toggle_instruments)
+        self.root.bind("<Shift-F12>", self._on_export_instruments)
         log_scroll = ttk.Scrollbar(self.log_frame, orient="vertical")
         self.log_text = tk.Text(self.log_frame, wrap="word", bg=self.colors["list_bg"], state="disabled", height=6)
         self.log_text.configure(yscrollcommand=log_scroll.set)
         log_scroll.configure(command=self.log_text.yview)
         self.log_text.grid(row=1, column=0, sticky="nsew")
         log_scroll.grid(row=1, column=1, sticky="ns")
+        # Records already flushed to the console before the panel existed; anything still pending arrives with the next flush.
+        shown = list(self.log_records)[:max(0, len(self.log_records) - len(self._log_pending))]
+        if shown:
+            self.log_text.configure(state="normal")
+            self.log_text.insert("end", "\n".join(str(r) for r in shown) + "\n")
+            self.log_text.configure(state="disabled")
+            self._log_widget_lines = len(shown)
     # Apply condition button wiring.
+    @_undo_step("Apply condition")
     def _on_conditions_apply(self):
         indices = self.targs.curselection()
         targets = [ self._cond_targets_index_to_warrior[i] for i in indices]
@@ -961,27 +675,24 @@ class Window:
                 cond = Condition(name=cond_name, duration=duration, tick_timing=timing, tick_owner=owner, source=source, target=target, expires_with_source=("concentration" if tie else None))
                 token = target.apply_condition(cond)
                 if token == "duplicate_ignored":
-                    self._log(f"{cond_name} already on {target.name}, skipped.")
+                    self._log("{} already on {}, skipped.", cond_name, target.name)
                 elif token == "concentration_replace_requested":
-                    self._log(f"{source.name} already has Concentration; replacement needed for {cond_name}.")
+                    self._log("{} already has Concentration; replacement needed for {}.", source.name, cond_name)
                 elif token == "added_breaks_concentration":
-                    self._log(f"{target.name} is now {cond_name} (breaks concentration).")
+                    self._log("{} is now {} (breaks concentration).", target.name, cond_name)
                 elif token == "added":
                     dur_text = "indefinite" if duration is None else f"{duration} rounds"
                     owner_text = owner or "none"
-                    self._log(f"Applied {cond_name} ({dur_text}, {timing}/{owner_text}) from {source.name if source else 'None'} to {target.name}.")
+                    self._log("Applied {} ({}, {}/{}) from {} to {}.", cond_name, dur_text, timing, owner_text, source.name if source else "None", target.name)
                 if tie and source is not None and token in ("added", "added_breaks_concentration"):
                     added_ties += 1
                 if cond_name.lower() in breaks:
-                    conc = target._find_condition_by_name("concentration")
-                    if conc is not None:
-                        result = self.tracker.remove_condition(target, conc.condition_id)
-                        self._log(f"{target.name} loses concentration due to {cond.name}.")
-                        for cid in result.get("cascade", []):
-                            for ww in self.tracker.warriors:
-                                rc = ww.get_condition_by_id(cid)
-                                if rc:
-                                    self._log(f"CASCADED: Removed {rc.name} from {ww.name} (source {target.name}).")
+                    for holder in self._concentration_holders(target):
+                        conc = holder._find_condition_by_name("concentration")
+                        result = self.tracker.remove_condition(holder, conc.condition_id)
+                        self._log("{} loses concentration due to {}.", holder.name, cond.name)
+                        for ww, rc in result["cascaded_conditions"]:
+                            self._log("CASCADED: Removed {} from {} (source {}).", rc.name, ww.name, holder.name)
         for n in names:
             self._cond_vars[n].set(False)
         if tie and source is not None and source._find_condition_by_name("concentration") is None:
@@ -995,6 +706,7 @@ class Window:
         self._rebuild_cond_sources_and_targets()
         self._render_all()
     # Clear condition button wiring.
+    @_undo_step("Clear condition")
     def _on_conditions_clear(self):
         man_cons = {"slain","dying","unconscious","stable"}
         names = [name for name, v in self._cond_vars.items() if v.get() and name not in man_cons]
@@ -1008,12 +720,9 @@ class Window:
             conc = src._find_condition_by_name("concentration")
             if conc is not None:
                 result = self.tracker.remove_condition(src, conc.condition_id)
-                self._log(f"{src.name} stops concentration (manual end).")
-                for cid in result.get("cascade", []):
-                    for ww in self.tracker.warriors:
-                        rc = ww.get_condition_by_id(cid)
-                        if rc:
-                            self._log(f"CASCADED: Removed {cond.name} from {ww.name} (source {src.name})")
+                self._log("{} stops concentration (manual end).", src.name)
+                for ww, rc in result["cascaded_conditions"]:
+                    self._log("CASCADED: Removed {} from {} (source {})", rc.name, ww.name, src.name)
             names = [n for n in names if n != "concentration"]
             if not names:
                 self._rebuild_cond_sources_and_targets()
@@ -1022,19 +731,19 @@ class Window:
         if not names or not targets:
             return
         for target in targets:
-            for c in list(target.conditions):
+            for holder, c in list(target.held_conditions()):
                 if c.name in names:
-                    self.tracker.remove_condition(target, c.condition_id)
-                    self._log(f"Cleared {c.name} from {target.name}.")
+                    self.tracker.remove_condition(holder, c.condition_id)
+                    self._log("Cleared {} from {}.", c.name, holder.name)
         # Recompute tied-effect counts from the model
         self._recompute_conc_tie_counts()
         # Remove concentration only from sources that have no tied effects left
-        for w in self.tracker.warriors:
+        for w in [h for ww in self.tracker.warriors for h in self._concentration_holders(ww)]:
             if w._find_condition_by_name("concentration") is not None:
                 if self._conc_tie_counts.get(w, 0) == 0:
                     conc = w._find_condition_by_name("concentration")
                     w.remove_condition(conc)
-                    self._log(f"{w.name} stops concentrating (no tied effects remain)")
+                    self._log("{} stops concentrating (no tied effects remain)", w.name)
         self._rebuild_cond_sources_and_targets()
         self._render_all()
     # Used to refresh the initiative display.
@@ -1042,19 +751,17 @@ class Window:
         if len(self.tracker.warriors) == 0:
             self._clear_initiative_list()
             return
-        self._clear_initiative_list()
+        rows = []
         for i, w in enumerate(self.tracker.warriors):
             tags = []
             if w.is_dead():
                 tags.append(self.tags["slain"])
             if i == self.tracker.current_warrior_index:
                 tags.append(self.tags["current"])
-            values = (w.name, w.initiative)
-            iid = str(id(w))
-            self.init_tree.insert("", "end", iid=iid, values=values, tags=tags)
-            self._iid_to_warrior[iid] = w
+            rows.append((str(w.handle), (w.name, w.initiative), tuple(tags)))
+        self._init_order = self._sync_tree(self.init_tree, self._init_rows, self._init_order, rows)
         current = self.tracker.warriors[self.tracker.current_warrior_index]
-        current_iid = str(id(current))
+        current_iid = str(current.handle)
         self._suppress_select = True
         self.init_tree.focus(current_iid)
         self.init_tree.see(current_iid)
@@ -1066,7 +773,93 @@ class Window:
     # Helper method to clear initiative list between refreshes.
     def _clear_initiative_list(self):
         self.init_tree.delete(*self.init_tree.get_children())
-        self._iid_to_warrior = {}
+        self._init_rows = {}
+        self._init_order = []
+    # Brings a Treeview in line with rows [(iid, values, tags)], inserting, updating, moving and deleting only what changed.
+    # shown maps iid -> (values, tags) as last displayed and is updated in place. Returns the new row order.
+    def _sync_tree(self, tree, shown, order, rows):
+        new_order = [iid for iid, _, _ in rows]
+        live = set(new_order)
+        stale = [iid for iid in order if iid not in live]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                shown.pop(iid, None)
+        for index, (iid, values, tags) in enumerate(rows):
+            last = shown.get(iid)
+            if last is None:
+                tree.insert("", index, iid=iid, values=values, tags=tags)
+            elif last != (values, tags):
+                tree.item(iid, values=values, tags=tags)
+            shown[iid] = (values, tags)
+        # New rows were inserted in place; existing rows only need moving if the order was re-sorted.
+        previous = set(order)
+        if [iid for iid in order if iid in live] != [iid for iid in new_order if iid in previous]:
+            for index, iid in enumerate(new_order):
+                tree.move(iid, "", index)
+        return new_order
+    # Returns a combatant's Treeview iid: its tracker handle, or "horde handle:member index" for a horde member.
+    def _iid(self, w):
+        handle = self.tracker.handle_of(w)
+        return f"{handle[0]}:{handle[1]}" if isinstance(handle, tuple) else str(handle)
+    # Returns the combatant behind a Treeview iid from _iid, or None.
+    def _warrior_of(self, iid):
+        if not iid:
+            return None
+        head, _, member = iid.partition(":")
+        return self.tracker.lookup((int(head), int(member)) if member else int(head))
+    # Returns a warrior's joined condition names, rebuilt only when its conditions have changed.
+    # A horde shows how many members have each condition, e.g. "poisoned ×3".
+    def _condition_text(self, w):
+        horde = isinstance(w, Horde)
+        version = w.members_version if horde else w.conditions_version
+        cached = self._cond_text_cache.get(w)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if horde:
+            text = ", ".join(name if n == 1 else f"{name} ×{n}" for name, n in w.condition_counts().items())
+        else:
+            text = ", ".join(c.name for c in w.conditions)
+        self._cond_text_cache[w] = (version, text)
+        self._update_condition_width(w, text)
+        return text
+    # Measures text in the roster font, going to Tk only for text not already in the LRU cache.
+    def _measure_text(self, text):
+        if self._roster_font is None:
+            try:
+                self._roster_font = font.nametofont("TkDefaultFont")
+            except Exception:
+                return 8 * len(text)
+        key = (self._roster_font.name, text)
+        px = self._measure_cache.get(key)
+        if px is not None:
+            self._measure_cache.move_to_end(key)
+            return px
+        px = self._roster_font.measure(text)
+        self._measure_cache[key] = px
+        if len(self._measure_cache) > MEASURE_CACHE_SIZE:
+            self._measure_cache.popitem(last=False)
+        return px
+    # Updates one warrior's Conditions width and the running max. The max is only rescanned when its holder shrinks.
+    def _update_condition_width(self, w, text):
+        old = self._cond_px.get(w, 0)
+        px = self._measure_text(text) + 24
+        self._cond_px[w] = px
+        if px >= self._cond_px_max:
+            self._cond_px_max = px
+        elif old == self._cond_px_max:
+            self._cond_px_max = max(self._cond_px.values(), default=0)
+    # Drops the cached text and width of every combatant no longer shown in the roster (undone adds, folded or vanished horde members),
+    # so a stale width cannot hold the Conditions column open. The max is only rescanned when one of them held it.
+    def _forget_condition_widths(self, shown):
+        shown = set(shown)
+        stale = [w for w in self._cond_px if w not in shown]
+        rescan = False
+        for w in stale:
+            rescan = rescan or self._cond_px.pop(w) == self._cond_px_max
+            self._cond_text_cache.pop(w, None)
+        if rescan:
+            self._cond_px_max = max(self._cond_px.values(), default=0)
     # Retrieves current warrior identification.
     def _on_initiative_select(self, event=None):
         if self._suppress_select:
@@ -1075,7 +868,7 @@ class Window:
         if len(iid_tuple) == 0:
             return
         w_iid = iid_tuple[0]
-        w = self._iid_to_warrior.get(w_iid)
+        w = self._warrior_of(w_iid)
         if w is None:
             return
         self.selected_warrior = w
@@ -1089,12 +882,39 @@ class Window:
         if not selection:
             return
         iid = selection[0]
-        w = self._roster_iid_to_warrior.get(iid)
+        w = self._warrior_of(iid)
         if w is not None:
             self.selected_warrior = w
             self.roster.selection_remove(self.roster.selection())
             self._render_all()
+    # Handler for double-clicking a horde in the roster: lists its members under it, or folds them back in.
+    def _on_roster_toggle_horde(self, event=None):
+        iid = self.roster.identify_row(event.y) if event is not None else self.roster.focus()
+        w = self._warrior_of(iid)
+        if not isinstance(w, Horde):
+            return
+        if w in self._expanded_hordes:
+            self._expanded_hordes.discard(w)
+            if self.selected_warrior is not None and self.selected_warrior.turn_owner is w:
+                self.selected_warrior = w
+        else:
+            self._expanded_hordes.add(w)
+        self._rebuild_target_options()
+        self._rebuild_cond_sources_and_targets()
+        self._render_all()
+    # Returns the combatants that can be picked as targets and sources: every initiative entry, followed by the members of expanded hordes.
+    def _targetable(self):
+        out = []
+        for w in self.tracker.warriors:
+            out.append(w)
+            if w in self._expanded_hordes:
+                out.extend(w.members())
+        return out
+    # Returns the combatants concentrating among w and, for a horde, its members.
+    def _concentration_holders(self, w):
+        return [holder for holder, c in w.held_conditions() if c.name == "concentration"]
     # Ties tracker.next_turn() and render_initiative() together.
+    @_undo_step("Next turn")
     def _on_next_turn(self):
         # Guards against advancing turn if only one warrior on the list.
         if len(self.tracker.warriors) < 2:
@@ -1113,41 +933,52 @@ class Window:
         if status["enemies_disabled"]: messagebox.showinfo("Combat", "All enemies are defeated. The party have earned waffles. Waffles, Ho!")
     # Renders roster.
     def render_roster(self):
-        self.roster.delete(*self.roster.get_children())
-        self._roster_iid_to_warrior = {}
+        current = self.tracker.warriors[self.tracker.current_warrior_index] if self.tracker.warriors else None
+        rows = []
+        shown = []
         for w in self.tracker.warriors:
-            iid = str(id(w))
-            self._roster_iid_to_warrior[iid] = w
-            values = (w.name, w.ac, w.hp_current, w.hp_current_max, ", ".join(c.name for c in w.conditions), w.death_save_failures, w.death_save_successes)
+            if isinstance(w, Horde):
+                expanded = w in self._expanded_hordes
+                name = f"{'▾' if expanded else '▸'} {w.name} ({len(w.standing())}/{len(w)} standing)"
+                values = (name, w.ac, w.hp_current, w.hp_current_max, self._condition_text(w), "", "", "")
+            else:
+                expanded = False
+                values = (w.name, w.ac, w.hp_current, w.hp_current_max, self._condition_text(w), w.death_save_failures, w.death_save_successes, self._death_save_odds_text(w))
             tags = []
             if w.is_dead():
                 tags.append(self.tags["slain"])
-            if w is self.tracker.warriors[self.tracker.current_warrior_index]:
+            if w is current:
                 tags.append(self.tags["current"])
-            self.roster.insert("", "end", iid=iid, values=values, tags=tags)
-        try:
-            fnt = tk.font.nametofont("TkDefaultFont")
-        except Exception:
-            fnt = None
-        max_px = 0
-        for w in self.tracker.warriors:
-            cond_text = ", ".join(c.name for c in w.conditions)
-            if fnt:
-                px = fnt.measure(cond_text) + 24
-            else:
-                px = 8 * len(cond_text) + 24
-            if px > max_px:
-                max_px = px
+            rows.append((str(w.handle), values, tuple(tags)))
+            shown.append(w)
+            if expanded:
+                members = w.members()
+                shown.extend(members)
+                for m in members:
+                    values = ("    " + m.name, m.ac, m.hp_current, m.hp_current_max, self._condition_text(m), m.death_save_failures, m.death_save_successes, self._death_save_odds_text(m))
+                    rows.append((f"{w.handle}:{m.index}", values, (self.tags["slain"],) if m.is_dead() else ()))
+        self._roster_order = self._sync_tree(self.roster, self._roster_rows, self._roster_order, rows)
+        # Every shown combatant has a width, so any extra entry belongs to a row that is gone.
+        if len(self._cond_px) > len(shown):
+            self._forget_condition_widths(shown)
+        # Widths are kept up to date by _condition_text, so sizing the column needs no measuring here.
         cap = 800
-        new_w = max(280, min(max_px, cap))
-        self.roster.column("Conditions", width=new_w, minwidth=220, stretch=True)
+        new_w = max(280, min(self._cond_px_max, cap))
+        if new_w != self._cond_col_width:
+            self.roster.column("Conditions", width=new_w, minwidth=220, stretch=True)
+            self._cond_col_width = new_w
         if self.selected_warrior is not None:
-            sel_iid = str(id(self.selected_warrior))
-            if sel_iid in self._roster_iid_to_warrior:
+            sel_iid = self._iid(self.selected_warrior)
+            if sel_iid in self._roster_rows:
                 self._suppress_select = True
                 self.roster.focus(sel_iid)
                 self.roster.see(sel_iid)
                 self._suppress_select = False
+    # Helper for the roster's death save odds column; blank unless the combatant is making death saves.
+    def _death_save_odds_text(self, w):
+        if w.hp_current != 0 or not w.has_condition("dying") or w.has_condition("stable") or w.is_dead():
+            return ""
+        return death_save_text(w.death_save_failures, w.death_save_successes, self.death_save_turns)
     # Opens the 'Add Warrior' modal on call.
     def _open_add_warrior_modal(self):
         # Defines the modal window.
@@ -1191,9 +1022,28 @@ class Window:
         self._aw_tbrk = ttk.Entry(self._aw_contain_field, justify="center")
         self._aw_tbrk.grid(row=6, column=1, sticky="ew", padx=2, pady=2)
         self._aw_tbrk.insert(0, "0")
+        # Count of identical combatants to add in one go; more than 1 numbers the names (Skeleton 1, Skeleton 2, ...).
+        self.count_lbl = tk.Label(self._aw_contain_field, text="Count:", bg=self.colors["label_bg"])
+        self.count_lbl.grid(row=7, column=0, sticky="ew", padx=2, pady=2)
+        self._aw_count = ttk.Entry(self._aw_contain_field, justify="center")
+        self._aw_count.grid(row=7, column=1, sticky="ew", padx=2, pady=2)
+        self._aw_count.insert(0, "1")
+        # Initiative roller: when ticked, Initiative is a modifier and each combatant rolls d20 + modifier, with Dex settling ties.
+        self._aw_roll = tk.BooleanVar(value=False)
+        self.roll_chk = ttk.Checkbutton(self._aw_contain_field, text="Roll initiative (d20 + Initiative)", variable=self._aw_roll)
+        self.roll_chk.grid(row=8, column=0, columnspan=2, sticky="w", padx=2, pady=2)
+        self.dex_lbl = tk.Label(self._aw_contain_field, text="Dex:", bg=self.colors["label_bg"])
+        self.dex_lbl.grid(row=9, column=0, sticky="ew", padx=2, pady=2)
+        self._aw_dex = ttk.Entry(self._aw_contain_field, justify="center")
+        self._aw_dex.grid(row=9, column=1, sticky="ew", padx=2, pady=2)
+        self._aw_dex.insert(0, "10")
+        # Horde: Count creatures share one initiative entry and roster row, each keeping its own hit points and conditions.
+        self._aw_horde = tk.BooleanVar(value=False)
+        self.horde_chk = ttk.Checkbutton(self._aw_contain_field, text="Horde (one entry for all Count members)", variable=self._aw_horde)
+        self.horde_chk.grid(row=10, column=0, columnspan=2, sticky="w", padx=2, pady=2)
         # Creates frame for add/cancel buttons.
         self.add_frame = tk.Frame(self._aw_contain_field, bg=self.colors["border"])
-        self.add_frame.grid(row=7, column=0, columnspan=2, sticky="nsew", padx=1, pady=1)
+        self.add_frame.grid(row=11, column=0, columnspan=2, sticky="nsew", padx=1, pady=1)
         self.add_frame.grid_columnconfigure(0, weight=1)
         self.add_frame.grid_rowconfigure(0, weight=1)
         self.cadd_frame = tk.Frame(self.add_frame, bg=self.colors["button_bg"])
@@ -1209,113 +1059,114 @@ class Window:
     def close_modal(self):
         self._aw_win.destroy()
     # Confirms a warrior being added.
+    @_undo_step("Add combatant")
     def _confirm_add_warrior(self):
-        name = self._aw_name.get().strip()
-        if not name:
-            messagebox.showerror("Add Combatant", "Name is required.")
-            self._aw_name.focus_set()
-            return
-        if any(w.name == name for w in self.tracker.warriors):
-            if not messagebox.askyesno("Duplicate name", "Name already used. Continue?"):
-                self._aw_name.focus_set()
-                return
-        side = self.side_combo.get()
-        if side not in ("Ally", "Enemy"):
-            messagebox.showerror("Add Combatant", "Side is required.")
-            self.side_combo.focus_set()
-            return
-        try:
-            ac = int(self._aw_ac.get().strip())
-        except ValueError:
-                messagebox.showerror("Add Combatant", "AC is not valid.")
-                self._aw_ac.focus_set()
-                return
-        if ac < 0:
-            messagebox.showerror("Add Combatant", "AC is not valid.")
-            self._aw_ac.focus_set()
-            return
+        raw = {
+            "name": self._aw_name.get(),
+            "side": self.side_combo.get(),
+            "ac": self._aw_ac.get(),
+            "hp_cur": self._aw_chp.get(),
+            "hp_max": self._aw_mhp.get(),
+            "initiative": self._aw_init.get(),
+            "tiebreak": self._aw_tbrk.get(),
+        }
+        fields = {
+            "name": self._aw_name,
+            "side": self.side_combo,
+            "ac": self._aw_ac,
+            "hp_cur": self._aw_chp,
+            "hp_max": self._aw_mhp,
+            "initiative": self._aw_init,
+            "tiebreak": self._aw_tbrk,
+        }
+        # Validation rules are shared with Tracker.add_warriors.
         try:
-            hp_max = int(self._aw_mhp.get().strip())
-        except ValueError:
-            messagebox.showerror("Add Combatant", "Max HP must be at least 0.")
-            self._aw_mhp.focus_set()
-            return
-        if hp_max <0:
-            messagebox.showerror("Add Combatant", "Max HP must be at least 0.")
-            self._aw_mhp.focus_set()
+            payload = parse_warrior_spec(raw)
+        except WarriorSpecError as e:
+            messagebox.showerror("Add Combatant", str(e))
+            fields[e.field].focus_set()
             return
+        c_text = self._aw_count.get().strip()
         try:
-            hp_cur = int(self._aw_chp.get().strip())
+            count = int(c_text) if c_text else 1
         except ValueError:
-            messagebox.showerror("Add Combatant", "Current HP must be at least 0.")
-            self._aw_chp.focus_set()
+            count = 0
+        if count < 1:
+            messagebox.showerror("Add Combatant", "Count must be a whole number of at least 1.")
+            self._aw_count.focus_set()
             return
-        hp_cur = max(0, min(hp_cur, hp_max))
-        try:
-            initiative = int(self._aw_init.get().strip())
-        except ValueError:
-            messagebox.showerror("Add Combatant", "Initiative must be entered.")
-            self._aw_init.focus_set()
-            return
-        t_text = self._aw_tbrk.get().strip()
-        if t_text == "":
-            tiebreak = 0
+        horde = self._aw_horde.get()
+        if count == 1 or horde:
+            payloads = [payload]
         else:
+            payloads = [dict(payload, name=f"{payload['name']} {i}") for i in range(1, count + 1)]
+        if self._aw_roll.get():
+            d_text = self._aw_dex.get().strip()
             try:
-                tiebreak = int(t_text)
+                dex = int(d_text) if d_text else 10
+                if not 1 <= dex <= 30:
+                    raise ValueError
             except ValueError:
-                messagebox.showerror("Add Combatant", "Tiebreak must be a whole number, but may default to 0.")
-                self._aw_tbrk.focus_set()
+                messagebox.showerror("Add Combatant", "Dex must be a whole number from 1 to 30.")
+                self._aw_dex.focus_set()
                 return
-        payload = {
-            "name": name,
-            "side": side.lower(),
-            "ac": ac,
-            "hp_cur": hp_cur,
-            "hp_max": hp_max,
-            "initiative": initiative,
-            "tiebreak": tiebreak,
-        }
-        self._finalize_add_warrior(payload)
+            # One roll for the whole batch (a horde rolls once); the Initiative field is the modifier.
+            payloads = roll_specs([dict(p, init_mod=p["initiative"], dex=dex) for p in payloads], rng=self._initiative_rng)
+        used = {w.name for w in self.tracker.warriors}
+        if any(p["name"] in used for p in payloads):
+            if not messagebox.askyesno("Duplicate name", "Name already used. Continue?"):
+                self._aw_name.focus_set()
+                return
+        if horde:
+            self._finalize_add_horde(payloads[0], count)
+        else:
+            self._finalize_add_warriors(payloads)
         self._rebuild_cond_sources_and_targets()
         self._validate_conditions_block()
     # Finalizes the warrior being added.
     def _finalize_add_warrior(self, payload):
-        # Create the new Warrior
-        w = self.tracker.add_warrior(
-            payload["name"],
-            payload["initiative"],
-            payload["side"],
-            payload["ac"],
-            payload["hp_cur"],
-            payload["hp_max"],
-            conditions=None
-        )
+        self._finalize_add_warriors([payload])
+    # Finalizes a batch of warriors: one tracker call, one tie check and one refresh however many are added.
+    def _finalize_add_warriors(self, payloads):
+        added = self.tracker.add_warriors(payloads)
+        if not added:
+            return
+        self._after_add(added, payloads[-1]["side"])
+    # Finalizes a horde of count members from one payload.
+    def _finalize_add_horde(self, payload, count):
+        horde = self.tracker.add_horde(payload["name"], payload["initiative"], payload["side"], payload["ac"], payload["hp_max"], count, tiebreak_priority=payload["tiebreak"], hp_current=payload["hp_cur"])
+        self._after_add([horde], payload["side"])
+    # Shared tail of adding combatants: closes the modal, settles new ties and shows the first new entry.
+    def _after_add(self, added, side):
         # Remember last side for convenience in the modal
-        self._last_side = payload["side"]
+        self._last_side = side
         # Close modal
         self._aw_win.destroy()
         # Handles adding if combat has started.
         if self._combat_started:
-            ties = self.tracker.get_initiative_ties()
-            if w.initiative in ties and len(ties[w.initiative]) >= 2:
-                self._open_tie_breaker_modal({w.initiative: ties[w.initiative]})
+            ties = self.tracker.get_unresolved_ties()
+            new_inits = {w.initiative for w in added}
+            new_ties = {init: group for init, group in ties.items() if init in new_inits}
+            if new_ties:
+                self._open_tie_breaker_modal(new_ties)
                 self._tb_win.transient(self.root)
                 self._tb_win.grab_set()
                 self._tb_win.wait_window()
                 self.tracker.sort_warriors()
-        # Refresh displays
+        # Refresh displays now, since the new rows are selected straight away.
         self._rebuild_target_options()
         self._rebuild_cond_sources_and_targets()
         self._render_all()
-        # Select and reveal the new combatant
-        iid = str(id(w))
+        self._flush_render()
+        # Select and reveal the first new combatant
+        w = added[0]
+        iid = self._iid(w)
         self._suppress_select = True
-        if iid in self._iid_to_warrior:  # initiative list
+        if iid in self._init_rows:  # initiative list
             self.init_tree.selection_set(iid)
             self.init_tree.focus(iid)
             self.init_tree.see(iid)
-        if iid in self._roster_iid_to_warrior:  # roster list
+        if iid in self._roster_rows:  # roster list
             self.roster.selection_set(iid)
             self.roster.focus(iid)
             self.roster.see(iid)
@@ -1327,13 +1178,77 @@ class Window:
             self.start_combat_btn.state(["!disabled"])
         else:
             self.start_combat_btn.state(["disabled"])
+        self.undo_btn.state(["!disabled"] if self.tracker.history.can_undo() else ["disabled"])
+        self.redo_btn.state(["!disabled"] if self.tracker.history.can_redo() else ["disabled"])
+    # Handler for the Undo button and Ctrl+Z.
+    def _on_undo(self, event=None):
+        label = self.tracker.undo()
+        if label is None:
+            self.status_text.set("Nothing to undo.")
+            return
+        self._after_history_move()
+        self._log("UNDO: {}", label)
+    # Handler for the Redo button, Ctrl+Y and Ctrl+Shift+Z.
+    def _on_redo(self, event=None):
+        label = self.tracker.redo()
+        if label is None:
+            self.status_text.set("Nothing to redo.")
+            return
+        self._after_history_move()
+        self._log("REDO: {}", label)
+    # Helper to resync the gui after undo or redo, which can move the turn or add and remove combatants.
+    def _after_history_move(self):
+        if self.selected_warrior is not None and self.selected_warrior not in self.tracker.warriors:
+            self.selected_warrior = None
+        self._combat_started = self.tracker.combat_started
+        self.round_var.set(f"Round: {self.tracker.round_number}")
+        self.status_text.set("")
+        self._rebuild_target_options()
+        self._rebuild_cond_sources_and_targets()
+        self._render_all()
+    # Handler for saving the encounter as a binary snapshot.
+    def _on_save_encounter(self):
+        path = filedialog.asksaveasfilename(parent=self.root, title="Save Encounter", defaultextension=SNAPSHOT_EXTENSION, filetypes=[("Encounter snapshots", "*" + SNAPSHOT_EXTENSION)])
+        if not path:
+            return
+        try:
+            save_snapshot(self.tracker, path)
+        except OSError as e:
+            messagebox.showerror("Save Encounter", f"Could not save the encounter: {e}")
+            return
+        self.status_text.set(f"Saved {len(self.tracker.warriors)} combatants to {path}.")
+    # Handler for turning instrumentation on and off (F12).
+    def _on_toggle_instruments(self, event=None):
+        self._finish_startup()
+        if self.instruments.toggle():
+            self.instruments_text.set(self.instruments.status_line())
+            self.instruments_lbl.grid(row=0, column=1, sticky="e", padx=1, pady=1)
+            self.status_text.set("Instruments on. Shift+F12 exports the timings.")
+        else:
+            self.instruments_lbl.grid_remove()
+            self.status_text.set("Instruments off.")
+    # Handler for exporting instrumentation timings to a JSON file (Shift+F12).
+    def _on_export_instruments(self, event=None):
+        if not self.instruments.stats:
+            self.status_text.set("No timings yet. Press F12 to turn instruments on.")
+            return
+        path = filedialog.asksaveasfilename(parent=self.root, title="Export Timings", defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.instruments.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Timings", f"Could not export the timings: {e}")
+            return
+        self.status_text.set(f"Exported timings to {path}.")
     # Handler for starting combat.
+    @_undo_step("Start combat")
     def _on_start_combat(self):
         if len(self.tracker.warriors) < 2:
             messagebox.showinfo("Combat", "Add at least two combatants to start.")
             return
         self.tracker.sort_warriors()
-        ties = self.tracker.get_initiative_ties()
+        ties = self.tracker.get_unresolved_ties()
         if ties:
             self._open_tie_breaker_modal(ties)
             self._tb_win.transient(self.root)
@@ -1342,10 +1257,7 @@ class Window:
             if getattr(self, "_tb_cancelled", False):
                 return
             self.tracker.sort_warriors()
-        self.tracker.current_warrior_index = 0
-        self.tracker.round_number = 1
-        for w in self.tracker.warriors:
-            self.tracker.eligible_from_round[id(w)] = 1
+        self.tracker.start_combat()
         self.selected_warrior = self.tracker.warriors[0]
         self._combat_started = True
         self._rebuild_target_options()
@@ -1418,7 +1330,7 @@ class Window:
             ttk.Button(btn_frame, text="↑", command=lambda v=init_val: self._tb_move_up(v)).grid(row=0, column=0, sticky="ew", padx=1, pady=1)
             ttk.Button(btn_frame, text="↓", command=lambda v=init_val: self._tb_move_down(v)).grid(row=1, column=0, sticky="ew", padx=1, pady=1)
             # Track this group for later
-            self._tb_groups[init_val] = {"list": listbox, "ids": [id(w) for w in ordered]}
+            self._tb_groups[init_val] = {"list": listbox, "ids": [w.handle for w in ordered]}
         # Buttons row.
         self._tb_footer_border = tk.Frame(self._tb_panel, bg=self.colors["border"])
         self._tb_footer_border.grid(row=2, column=0, sticky="ew", padx=1, pady=1)
@@ -1469,15 +1381,12 @@ class Window:
         lb.see(i+1)
     # Apply button wiring.
     def _tb_apply(self):
-        # map: python id -> Warrior (fast lookup)
-        id_to_w = {id(w): w for w in self.tracker.warriors}
         for init_val, grp in self._tb_groups.items():
-            for rank, wid in enumerate(grp["ids"]):
-                w = id_to_w.get(wid)
-                if w is None: continue
-                # Only set within its tied init (defensive)
-                if w.initiative == init_val:
-                    w.tiebreak_priority = rank
+            # Only set within its tied init (defensive)
+            group = [w for w in map(self.tracker.lookup, grp["ids"]) if w is not None and w.initiative == init_val]
+            # The group's own priorities are handed back out in the chosen order, so later rolled adds still sort by dexterity.
+            for w, priority in zip(group, reranked_priorities([w.tiebreak_priority for w in group])):
+                self.tracker.set_tiebreak_priority(w, priority)
         self._tb_cancelled = False
         self._tb_win.destroy()
     # Cancel button wiring.
@@ -1485,9 +1394,8 @@ class Window:
         self._tb_cancelled = True
         self._tb_win.destroy()
     # Handles damage application.
+    @_undo_step("Damage")
     def _on_damage_apply(self):
-        cause = None
-        conc_dict = {}
         w = self._get_selected_warrior()
         (ok_amt, n) = self._parse_amount()
         if w is None:
@@ -1496,40 +1404,94 @@ class Window:
         if not ok_amt:
             self.status_text.set("Enter a non-negative integer amount.")
             return
-        hp_before = w.hp_current
-        result = w.take_damage(n, is_critical=False)
-        breaks = {x.lower() for x in self.breaks_conc}
-        if result == "slain":
-            cause = "slain"
-        elif result == "dying":
-            cause = "dying"
-        else:
-            for c in w.conditions:
-                if c.name.lower() in breaks:
-                    cause = c.name
-                    break
-        conc = w._find_condition_by_name("concentration")
-        if cause and conc in w.conditions:
-            conc_dict = self.tracker.remove_condition(w, conc.condition_id)
-        hp_after = w.hp_current
+        self._apply_damage([w], [n])
+    # Shared by single and area damage: one tracker call resolves every concentration loss and cascade,
+    # then the log lines go out as one block and the panels repaint once.
+    def _apply_damage(self, targets, amounts):
+        hp_before = [w.hp_current for w in targets]
+        summary = self.tracker.damage_area(targets, amounts, breaks=tuple(x.lower() for x in self.breaks_conc))
         self._rebuild_target_options()
+        self._rebuild_cond_sources_and_targets()
         self._render_all()
         self.status_text.set("")
         # Logging info.
-        log_line = f"DMG: {w.name} takes {n} damage. Hit points reduce from {hp_before} to {hp_after}"
-        if result == "slain":
-            log_line += " [slain]"
-        elif result == "dying":
-            log_line += " [dying]"
-        self._log(log_line)
-        if cause and conc_dict.get("removed", 0) == 1:
-            self._log(f"CONC: {w.name} lost concentration due to {cause}")
-            for cid in conc_dict.get("cascade", []):
-                for ww in self.tracker.warriors:
-                    cond = ww.get_condition_by_id(cid)
-                    if cond:
-                        self._log(f"CASCADED: Removed {cond.name} from {ww.name} (source {w.name})")
+        for w, n, before, result in zip(targets, amounts, hp_before, summary["results"]):
+            self._log("DMG: {} takes {} damage. Hit points reduce from {} to {}{}", w.name, n, before, w.hp_current, _DAMAGE_TAGS.get(result, ""))
+        for holder, cause, cascaded in summary["concentration_lost"]:
+            self._log("CONC: {} lost concentration due to {}", holder.name, cause)
+            for ww, cond in cascaded:
+                self._log("CASCADED: Removed {} from {} (source {})", cond.name, ww.name, holder.name)
+        return summary
+    # Opens the area damage modal: one row per living combatant (and member of an expanded horde) with Hit, Saved and an optional own amount.
+    def _open_area_damage_modal(self):
+        self._ad_win = tk.Toplevel(self.root)
+        self._ad_win.title("Area Damage")
+        self._ad_win.grid_columnconfigure(0, weight=1)
+        self._ad_win.grid_rowconfigure(0, weight=1)
+        self._ad_container = tk.Frame(self._ad_win, bg=self.colors["border"])
+        self._ad_container.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self._ad_field = tk.Frame(self._ad_container, bg=self.colors["panel_bg"])
+        self._ad_field.grid(row=0, column=0, sticky="nsew", padx=1, pady=1)
+        self._ad_field.grid_columnconfigure(0, weight=1)
+        tk.Label(self._ad_field, text="Damage:", bg=self.colors["label_bg"]).grid(row=0, column=0, sticky="ew", padx=2, pady=2)
+        self._ad_amount = ttk.Entry(self._ad_field, justify="center")
+        self._ad_amount.grid(row=0, column=1, columnspan=3, sticky="ew", padx=2, pady=2)
+        self._ad_amount.insert(0, self.var_amount.get().strip())
+        self._ad_amount.focus_set()
+        tk.Label(self._ad_field, text="Combatant", bg=self.colors["label_bg"]).grid(row=1, column=0, sticky="ew", padx=2, pady=2)
+        tk.Label(self._ad_field, text="Hit", bg=self.colors["label_bg"]).grid(row=1, column=1, sticky="ew", padx=2, pady=2)
+        tk.Label(self._ad_field, text="Saved (half)", bg=self.colors["label_bg"]).grid(row=1, column=2, sticky="ew", padx=2, pady=2)
+        tk.Label(self._ad_field, text="Own amount", bg=self.colors["label_bg"]).grid(row=1, column=3, sticky="ew", padx=2, pady=2)
+        # (combatant, hit var, saved var, own amount entry) per row.
+        self._ad_rows = []
+        for i, w in enumerate([w for w in self._targetable() if not w.is_dead()], start=2):
+            hit = tk.BooleanVar(value=False)
+            saved = tk.BooleanVar(value=False)
+            tk.Label(self._ad_field, text=w.name, bg=self.colors["panel_bg"], anchor="w").grid(row=i, column=0, sticky="ew", padx=2, pady=1)
+            ttk.Checkbutton(self._ad_field, variable=hit).grid(row=i, column=1, padx=2, pady=1)
+            ttk.Checkbutton(self._ad_field, variable=saved).grid(row=i, column=2, padx=2, pady=1)
+            own = ttk.Entry(self._ad_field, justify="center", width=6)
+            own.grid(row=i, column=3, padx=2, pady=1)
+            self._ad_rows.append((w, hit, saved, own))
+        self._ad_btn_frame = tk.Frame(self._ad_field, bg=self.colors["button_bg"])
+        self._ad_btn_frame.grid(row=len(self._ad_rows) + 2, column=0, columnspan=4, sticky="nsew", padx=1, pady=1)
+        self._ad_btn_frame.grid_columnconfigure(0, weight=1)
+        self._ad_btn_frame.grid_columnconfigure(1, weight=1)
+        ttk.Button(self._ad_btn_frame, text="Apply", command=self._on_area_damage_apply).grid(row=0, column=0, sticky="ew", padx=1, pady=1)
+        ttk.Button(self._ad_btn_frame, text="Cancel", command=self._ad_win.destroy).grid(row=0, column=1, sticky="ew", padx=1, pady=1)
+    # Applies the area damage modal: saved targets take half, rounded down, of their amount.
+    @_undo_step("Area damage")
+    def _on_area_damage_apply(self):
+        base_text = self._ad_amount.get().strip()
+        base = int(base_text) if base_text.isdigit() else None
+        targets = []
+        amounts = []
+        for w, hit, saved, own in self._ad_rows:
+            if not hit.get():
+                continue
+            own_text = own.get().strip()
+            if own_text:
+                if not own_text.isdigit():
+                    messagebox.showerror("Area Damage", f"{w.name}: amount must be a non-negative whole number.")
+                    own.focus_set()
+                    return
+                n = int(own_text)
+            elif base is None:
+                messagebox.showerror("Area Damage", "Damage must be a non-negative whole number.")
+                self._ad_amount.focus_set()
+                return
+            else:
+                n = base
+            targets.append(w)
+            amounts.append(n // 2 if saved.get() else n)
+        if not targets:
+            messagebox.showerror("Area Damage", "Tick Hit for at least one combatant.")
+            return
+        self._ad_win.destroy()
+        self._log("AOE: {} targets, {} damage in all.", len(targets), sum(amounts))
+        self._apply_damage(targets, amounts)
     # Handles healing application.
+    @_undo_step("Heal")
     def _on_heal_apply(self):
         w = self._get_selected_warrior()
         (ok_amt, n) = self._parse_amount()
@@ -1543,7 +1505,7 @@ class Window:
         hp_before = w.hp_current
         if w.is_dead() and res == False:
             self.status_text.set("Slain: source must be a resurrection effect to revive.")
-            self._log(f"HEAL: {w.name} no effect (slain; resurrection required).")
+            self._log("HEAL: {} no effect (slain; resurrection required).", w.name)
             return
         w.heal(n, resurrection_effect=res)
         hp_after = w.hp_current
@@ -1551,11 +1513,9 @@ class Window:
         self._render_all()
         self.status_text.set("")
         # Logging info.
-        log_line = f"HEAL: {w.name} is healed for {n}. Hit points increase from {hp_before} to {hp_after}"
-        if res:
-            log_line += " [resurrection]"
-        self._log(log_line)
+        self._log("HEAL: {} is healed for {}. Hit points increase from {} to {}{}", w.name, n, hp_before, hp_after, " [resurrection]" if res else "")
     # Handlers for death saving throw buttons.
+    @_undo_step("Death save failure")
     def _on_ds_fail(self):
         w = self._get_selected_warrior()
         if w is None:
@@ -1571,10 +1531,8 @@ class Window:
         self._rebuild_target_options()
         self._render_all()
         self.status_text.set("")
-        log_line = f"DS: {w.name} +1 failure."
-        if result == "slain":
-            log_line += " [slain]"
-        self._log(log_line)
+        self._log("DS: {} +1 failure.{}", w.name, " [slain]" if result == "slain" else "")
+    @_undo_step("Death save critical failure")
     def _on_ds_crit_fail(self):
         w = self._get_selected_warrior()
         if w is None:
@@ -1590,10 +1548,8 @@ class Window:
         self._rebuild_target_options()
         self._render_all()
         self.status_text.set("")
-        log_line = f"DS: {w.name} +2 failures."
-        if result == "slain":
-            log_line += " [slain]"
-        self._log(log_line)
+        self._log("DS: {} +2 failures.{}", w.name, " [slain]" if result == "slain" else "")
+    @_undo_step("Death save success")
     def _on_ds_success(self):
         w = self._get_selected_warrior()
         if w is None:
@@ -1609,10 +1565,8 @@ class Window:
         self._rebuild_target_options()
         self._render_all()
         self.status_text.set("")
-        log_line = f"DS: {w.name} +1 success"
-        if result == "stable":
-            log_line += " [stable]"
-        self._log(log_line)
+        self._log("DS: {} +1 success{}", w.name, " [stable]" if result == "stable" else "")
+    @_undo_step("Death save critical success")
     def _on_ds_crit_success(self):
         w = self._get_selected_warrior()
         if w is None:
@@ -1628,10 +1582,12 @@ class Window:
         self._rebuild_target_options()
         self._render_all()
         self.status_text.set("")
-        log_line = f"DS: {w.name} critical success! HP is restored to 1."
-        self._log(log_line)
-    # Helper method for target widget.
+        self._log("DS: {} critical success! HP is restored to 1.", w.name)
+    # Marks the HP target combobox stale; it is rebuilt on the next render flush.
     def _rebuild_target_options(self):
+        self._mark_dirty("targets")
+    # Helper method for target widget.
+    def _render_target_options(self):
         prev_label = self.var_target.get()
         if prev_label is not None and prev_label in self._target_values:
             idx = self._target_values.index(prev_label)
@@ -1640,7 +1596,7 @@ class Window:
             prev_obj = None
         self._target_values.clear()
         self._target_index_to_warrior.clear()
-        for w in self.tracker.warriors:
+        for w in self._targetable():
             disp_lbl = w.name
             self._target_values.append(disp_lbl)
             self._target_index_to_warrior.append(w)
@@ -1686,9 +1642,10 @@ class Window:
         ok_amt, _ = self._parse_amount()
         dmg_ok = (w is not None) and ok_amt
         heal_ok = (w is not None) and ok_amt
-        ds_ok = bool(w and (w.hp_current == 0) and (not w.is_dead()) and (w._find_condition_by_name("stable") is None))
+        ds_ok = bool(w and not isinstance(w, Horde) and (w.hp_current == 0) and (not w.is_dead()) and (w._find_condition_by_name("stable") is None))
         ok_mx, mx = self._parse_int(self.var_maxhp_delta.get())
         mx_ok = (w is not None) and ok_mx
+        self.aoe_btn.state(["!disabled"] if self.tracker.warriors else ["disabled"])
         if mx_ok:
             self.max_inc_btn.state(["!disabled"])
         else:
@@ -1717,12 +1674,17 @@ class Window:
             self.pass_btn.state(["disabled"])
             self.crit_pass_btn.state(["disabled"])
         self._update_status_strip_for_target()
-    # Refreshes the condition sources and targets lists.
+    # Marks the condition source/target lists stale; they are rebuilt on the next render flush.
     def _rebuild_cond_sources_and_targets(self):
+        self._mark_dirty("cond_lists")
+    # Refreshes the condition sources and targets lists.
+    def _render_cond_sources_and_targets(self):
+        if not hasattr(self, "targs"):
+            return
         prev_source_display = self.var_cond_source.get()
         prev_target_indices = set(self.targs.curselection())
         prev_scroll = self.targs.yview()[0]
-        roster_in_order = sorted(self.tracker.warriors, key=lambda w: w.name.lower())
+        roster_in_order = sorted(self._targetable(), key=lambda w: w.name.lower())
         display_list = [w.name for w in roster_in_order]
         values = ["None"] + display_list
         self._cond_source_items = [None] + roster_in_order
@@ -1745,6 +1707,8 @@ class Window:
         self._validate_conditions_block()
     # Updates concentration toggle status.
     def _update_concentration_toggle_state(self):
+        if not hasattr(self, "tie_checkbox"):
+            return
         val = self.var_cond_source.get()
         if val == "None":
             self.tie_checkbox.configure(state="disabled")
@@ -1767,10 +1731,9 @@ class Window:
         # Gates 'Clear Condition' button and disables it until appropriate conditions are met.
         checked_set = set(checked_names)
         for target in sel_targets:
-            for cond in target.conditions:
-                if cond.name in checked_set:
-                    found = True
-                    break
+            if any(target.has_condition(n) for n in checked_set):
+                found = True
+                break
         if found or special_conc_clear:
             self.clear_cond_btn.state(["!disabled"])
         else:
@@ -1818,12 +1781,13 @@ class Window:
         self.add_cond_btn.state(["!disabled"])
     # Renders conditions panel.
     def _render_conditions_panel(self):
+        if not hasattr(self, "targs"):
+            return
         man_cons = {"slain", "dying", "unconscious", "stable", "concentration"}
         sel_indices = self.targs.curselection()
         sel_targets = [self._cond_targets_index_to_warrior[i] for i in sel_indices] if sel_indices else []
         def warrior_has(name, warrior):
-            n = name.lower()
-            return any(getattr(c, "name", "").lower() == n for c in getattr(warrior, "conditions", []))
+            return warrior.has_condition(name)
         # For each non-unique condition checkbox, set it checked if ALL selected targets have it.
         for name, var in self._cond_vars.items():
             if name in man_cons:
@@ -1836,36 +1800,67 @@ class Window:
             # Check whether every selected target has this condition
             all_have = all(warrior_has(name, w) for w in sel_targets)
             var.set(bool(all_have))
-    # Rendering helper.
+    # Rendering helper. Marks every panel stale; the repaint itself happens once, on the next idle cycle.
     def _render_all(self):
-        self.render_roster()
-        self.render_initiative()
-        self.render_right_panel()
-        self._validate_hp_controls()
-        self._render_conditions_panel()
-        self._recompute_conc_tie_counts()
-        self._validate_conditions_block()
-    # Logging helper.
-    def _log(self, msg):
+        self._mark_dirty("roster", "initiative", "right_panel", "hp_controls", "conditions_panel", "conc_ties", "conditions_block")
+    # Records stale regions and schedules a single flush for the next Tk idle cycle, however many handlers ask for one.
+    def _mark_dirty(self, *regions):
+        self._dirty.update(regions)
+        if self._render_pending is None and not self._flushing:
+            self._render_pending = self.root.after_idle(self._flush_render)
+    # Renders every stale region once, in dependency order. Can also be called directly when a handler needs the widgets current right away.
+    def _flush_render(self):
+        if self._render_pending is not None:
+            self.root.after_cancel(self._render_pending)
+            self._render_pending = None
+        self._flushing = True
+        try:
+            for region, render in self._render_steps:
+                if region in self._dirty:
+                    self._dirty.discard(region)
+                    getattr(self, render)()
+        finally:
+            self._flushing = False
+        if self.instruments.enabled:
+            self.instruments_text.set(self.instruments.status_line())
+        # Anything re-marked for an earlier step while flushing waits for the next idle cycle.
+        if self._dirty:
+            self._render_pending = self.root.after_idle(self._flush_render)
+    # Logging helper. msg is a str.format template when args are given; formatting waits until the log is flushed.
+    def _log(self, msg, *args):
+        record = LogRecord(msg, args)
+        self.log_records.append(record)
+        self._log_pending.append(record)
+        self._mark_dirty("log")
+    # Writes every pending log record in one batch: one print and one widget insert, trimming the panel to log_max_lines.
+    def _flush_log(self):
+        pending = self._log_pending
+        if not pending:
+            return
+        self._log_pending = []
+        lines = [str(r) for r in pending]
         try:
-            print(msg)
+            print("\n".join(lines))
         except Exception:
             pass
         # GUI log panel.
         lt = getattr(self, "log_text", None)
-        if lt is not None:
-            lt.configure(state="normal")
-            lt.insert("end", msg + "\n")
-            lt.see("end")
-            lt.configure(state="disabled")
+        if lt is None:
+            return
+        # Lines that would be trimmed straight away are never inserted.
+        lines = lines[-self.log_max_lines:]
+        lt.configure(state="normal")
+        lt.insert("end", "\n".join(lines) + "\n")
+        self._log_widget_lines += len(lines)
+        excess = self._log_widget_lines - self.log_max_lines
+        if excess > 0:
+            lt.delete("1.0", f"{excess + 1}.0")
+            self._log_widget_lines -= excess
+        lt.see("end")
+        lt.configure(state="disabled")
     # Helper to recompute concentration based condition displays.
     def _recompute_conc_tie_counts(self):
-        self._conc_tie_counts = {}
-        for w in self.tracker.warriors:
-            for c in getattr(w, "conditions", []):
-                if getattr(c, "expires_with_source", None) == "concentration" and getattr(c, "source", None) is not None:
-                    src = c.source
-                    self._conc_tie_counts[src] = self._conc_tie_counts.get(src, 0) + 1
+        self._conc_tie_counts = self.tracker.dependent_counts("concentration")
     # Parse helper for max hp delta.
     def _parse_int(self, s):
         s = (s or "").strip()
@@ -1875,6 +1870,7 @@ class Window:
         except Exception:
             return False, None
     # Handlers for apply/clear temp max hp changes.
+    @_undo_step("Max HP change")
     def _on_maxhp_delta_apply(self):
         w = self._get_selected_warrior()
         ok, delta = self._parse_int(self.var_maxhp_delta.get())
@@ -1884,16 +1880,16 @@ class Window:
         if not ok:
             self.status_text.set("Enter a whole number for Max HP Δ (e.g., 5 or -5).")
             return
+        # A horde's max is its members' total, so the delta goes to each member rather than into one new total.
         old_max = w.hp_current_max
-        new_max = max(0, old_max + delta)
-        w.hp_current_max = new_max
-        if w.hp_current > new_max:
-            w.hp_current = new_max
+        w.adjust_max_hp(delta)
+        new_max = w.hp_current_max
         self._render_all()
         self.status_text.set("")
         sign = "+" if delta >= 0 else ""
-        self._log(f"MAXΔ: {w.name} Max HP {old_max} → {new_max} ({sign}{delta})")
+        self._log("MAXΔ: {} Max HP {} → {} ({}{}{})", w.name, old_max, new_max, sign, delta, " each" if isinstance(w, Horde) else "")
     # Handler for clearing max hp delta.
+    @_undo_step("Max HP clear")
     def _on_maxhp_delta_clear(self):
         w = self._get_selected_warrior()
         if w is None:
@@ -1901,19 +1897,32 @@ class Window:
             return
         if w.hp_current_max < w.hp_current:
             old_max = w.hp_current_max
-            w.hp_current_max = w.hp_current
-            self._log(f"MAXΔ: {w.name} Max HP {old_max} → {w.hp_current} (cleared)")
+            w.set_max_hp(w.hp_current)
+            self._log("MAXΔ: {} Max HP {} → {} (cleared)", w.name, old_max, w.hp_current)
         else:
-            self._log(f"MAXΔ: {w.name} Max HP unchanged (no delta to clear)")
+            self._log("MAXΔ: {} Max HP unchanged (no delta to clear)", w.name)
         self._render_all()
         self.status_text.set("")
 
 
 # Primary function/entry point.
+# An optional path opens a saved snapshot (python3 main.py encounter.ais), or else is used as a journal
+# (python3 main.py encounter.log) that records the encounter as it runs and picks it back up after a crash.
 def main():
-    tracker = Tracker()
-    window = Window(tracker)
+    journal = None
+    if len(sys.argv) > 1 and is_snapshot(sys.argv[1]):
+        tracker = load_snapshot(sys.argv[1])
+    elif len(sys.argv) > 1:
+        try:
+            tracker, journal = resume(sys.argv[1])
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        tracker = Tracker()
+    window = Window(tracker, open_add_modal_on_start=not tracker.warriors)
     window.root.mainloop()
+    if journal is not None:
+        journal.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+# Columnar (struct-of-arrays) roster storage for very large encounters. Headless; never imports tkinter.
+
+# Imports.
+from array import array
+from engine import Combatant
+
+# Global Constants.
+# Stat columns, each a signed 32-bit array indexed by row.
+INT_COLUMNS = ("initiative", "ac", "hp_max", "hp_current", "hp_current_max", "death_save_failures", "death_save_successes", "tiebreak_priority")
+# Conditions Combatant.heal clears; rows holding none of them can be healed column-wise.
+HEAL_CLEARS = frozenset(("slain", "unconscious", "dying", "stable"))
+
+# RosterStore class keeps combatant stats in typed arrays, one row per combatant, with a WarriorView handed out per row.
+# Stats and conditions versions live in the store, so a view holds only its row, its handle and its condition maps.
+class RosterStore:
+    def __init__(self):
+        self.names = []
+        # Sides are stored as small codes into side_names.
+        self.side_codes = array("b")
+        self.side_names = []
+        self._side_lookup = {}
+        for column in INT_COLUMNS:
+            setattr(self, column, array("i"))
+        # Conditions version for each row, bumped on every condition change.
+        self.cond_versions = array("i")
+        # The Tracker the rows are attached to. A store only ever serves one tracker.
+        self.tracker = None
+    def __len__(self):
+        return len(self.names)
+    # Returns the code for a side name, registering new sides as they appear.
+    def side_code(self, side):
+        code = self._side_lookup.get(side)
+        if code is None:
+            code = len(self.side_names)
+            self.side_names.append(side)
+            self._side_lookup[side] = code
+        return code
+    # Appends a row and returns the WarriorView over it. Arguments mirror Warrior.
+    def add_row(self, name, initiative, side, ac, hp_current, hp_max, hp_current_max=None, conditions=None, tiebreak_priority=0):
+        hp_current_max = hp_current_max if hp_current_max is not None else hp_max
+        row = len(self.names)
+        self.names.append(name)
+        self.side_codes.append(self.side_code(side))
+        self.initiative.append(initiative)
+        self.ac.append(ac)
+        self.hp_max.append(hp_max)
+        self.hp_current.append(min(hp_current, hp_current_max))
+        self.hp_current_max.append(hp_current_max)
+        self.death_save_failures.append(0)
+        self.death_save_successes.append(0)
+        self.tiebreak_priority.append(tiebreak_priority)
+        self.cond_versions.append(0)
+        return WarriorView(self, row, conditions)
+    # Fills an empty store from whole columns (int_columns maps each INT_COLUMNS name to its values) and returns a view per row.
+    def load_columns(self, names, sides, int_columns):
+        n = len(names)
+        for column in INT_COLUMNS:
+            setattr(self, column, array("i", int_columns[column]))
+        self.names = list(names)
+        self.side_codes = array("b", [self.side_code(side) for side in sides])
+        self.cond_versions = array("i", [0]) * n
+        return [WarriorView(self, row) for row in range(n)]
+    # Applies damage to many views at once. Rows that stay above 0 hp are written straight into the hp column in one pass,
+    # with no method call per row; only rows that drop to 0 (or are already down) go through the full take_damage rules.
+    # Returns take_damage's result per target. Targets that are not rows of this store (such as a Horde) take their own take_damage.
+    def damage_rows(self, views, amounts, is_critical=False):
+        hp = self.hp_current
+        results = [None] * len(views)
+        for i, (view, amount) in enumerate(zip(views, amounts)):
+            if view.__class__ is WarriorView and view._store is self:
+                row = view._row
+                left = hp[row] - amount
+                if left > 0 and "slain" not in view._cond_by_name:
+                    hp[row] = left
+                    continue
+            results[i] = view.take_damage(amount, is_critical=is_critical)
+        return results
+    # Heals many views at once. Rows with no condition that healing has to clear are handled column-wise;
+    # the rest go through the full heal rules.
+    def heal_rows(self, views, amounts, resurrection_effect=False):
+        hp = self.hp_current
+        hp_cap = self.hp_current_max
+        fails = self.death_save_failures
+        passes = self.death_save_successes
+        for view, amount in zip(views, amounts):
+            if view.__class__ is not WarriorView or view._store is not self or not HEAL_CLEARS.isdisjoint(view._cond_by_name):
+                view.heal(amount, resurrection_effect=resurrection_effect)
+                continue
+            row = view._row
+            fails[row] = 0
+            passes[row] = 0
+            left = hp[row] + amount
+            cap = hp_cap[row]
+            hp[row] = left if left < cap else cap
+    # Returns the rows whose current hp is above 0, scanning the hp column only.
+    def rows_standing(self):
+        return [row for row, hp in enumerate(self.hp_current) if hp > 0]
+
+# Builds a property that reads and writes one stat column at the view's row.
+def _column_property(column):
+    def fget(self):
+        return getattr(self._store, column)[self._row]
+    def fset(self, value):
+        getattr(self._store, column)[self._row] = value
+    return property(fget, fset)
+
+# WarriorView class is a lightweight Combatant whose stats live in a RosterStore row. Conditions stay on the view.
+class WarriorView(Combatant):
+    __slots__ = ("_store", "_row", "handle")
+    initiative = _column_property("initiative")
+    ac = _column_property("ac")
+    hp_max = _column_property("hp_max")
+    hp_current = _column_property("hp_current")
+    hp_current_max = _column_property("hp_current_max")
+    death_save_failures = _column_property("death_save_failures")
+    death_save_successes = _column_property("death_save_successes")
+    tiebreak_priority = _column_property("tiebreak_priority")
+    def __init__(self, store, row, conditions=None):
+        self._store = store
+        self._row = row
+        self._init_conditions(conditions)
+    # The tracker is kept once on the store and the conditions version in its column; only the handle is per view.
+    def _init_tracking(self):
+        self.handle = None
+    @property
+    def _tracker(self):
+        return self._store.tracker if self.handle is not None else None
+    @_tracker.setter
+    def _tracker(self, value):
+        self._store.tracker = value
+    @property
+    def conditions_version(self):
+        return self._store.cond_versions[self._row]
+    @conditions_version.setter
+    def conditions_version(self, value):
+        self._store.cond_versions[self._row] = value
+    @property
+    def name(self):
+        return self._store.names[self._row]
+    @name.setter
+    def name(self, value):
+        self._store.names[self._row] = value
+    @property
+    def side(self):
+        return self._store.side_names[self._store.side_codes[self._row]]
+    @side.setter
+    def side(self, value):
+        self._store.side_codes[self._row] = self._store.side_code(value)
+    @property
+    def row(self):
+        return self._row
@@ -0,0 +1,226 @@
+# Headless Monte Carlo encounter simulator. Plays whole combats on the real Tracker rules, spread over a process pool.
+# Run with "python3 simulator.py encounter.json [--combats N] [--workers N] [--seed N] [--max-rounds N]".
+# An encounter is a JSON list of combatants:
+#   {"name": "Goblin", "side": "enemy", "ac": 15, "hp": 7, "init_mod": 2, "count": 4,
+#    "attacks": [{"to_hit": 4, "damage": "1d6+2"}, {"to_hit": 4, "damage": "1d4", "condition": "poisoned", "duration": 1}]}
+# count and attacks are optional. A hit with "condition" applies it to the target until the end of its own turn, counted down from duration.
+
+# Imports.
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
+import re
+import sys
+import time
+from engine import CONDITIONS, DISABLING_CONDITIONS, Condition, Tracker
+
+# Global Constants.
+DEFAULT_COMBATS = 1000
+DEFAULT_MAX_ROUNDS = 100
+# Combats handed to a worker at a time. Each chunk has its own seed, so results do not depend on the number of workers.
+CHUNK_SIZE = 250
+# Conditions that cost a combatant its attacks for the turn.
+CANNOT_ACT = ("slain", "dying", "unconscious", "stable", "incapacitated", "paralyzed", "petrified", "stunned")
+DICE_PATTERN = re.compile(r"^\s*(?:(\d+)\s*d\s*(\d+))?\s*(?:([+-])?\s*(\d+))?\s*$")
+
+# Parses a damage expression such as "2d6+3", "1d8" or "5" into (dice, sides, bonus).
+def parse_damage(expr):
+    if isinstance(expr, int):
+        return (0, 0, expr)
+    match = DICE_PATTERN.match(str(expr))
+    if not match or not (match.group(2) or match.group(4)):
+        raise ValueError(f"Error: Invalid damage expression: {expr}")
+    dice, sides, sign, bonus = match.groups()
+    if sides is not None and int(sides) < 1:
+        raise ValueError(f"Error: Invalid damage expression: {expr}")
+    bonus = int(bonus or 0)
+    if sign == "-":
+        bonus = -bonus
+    return (int(dice or 0), int(sides or 0), bonus)
+
+# Checks an encounter and expands it into one normalized dict per combatant. count > 1 names copies "Name 1".."Name N", like the add modal.
+def parse_encounter(specs):
+    combatants = []
+    for spec in specs:
+        try:
+            name = str(spec["name"]).strip()
+            side = spec["side"]
+            ac = int(spec["ac"])
+            hp = int(spec["hp"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Error: every combatant needs a name, side, ac and hp: {spec}")
+        if not name:
+            raise ValueError("Error: Name must not be empty.")
+        if side not in ("ally", "enemy"):
+            raise ValueError(f"Error: Side must be 'ally' or 'enemy': {spec}")
+        if hp <= 0:
+            raise ValueError(f"Error: hp must be positive: {spec}")
+        attacks = []
+        for attack in spec.get("attacks", ()):
+            condition = attack.get("condition")
+            if condition is not None and condition not in CONDITIONS:
+                raise ValueError(f"Error: Invalid condition name: {condition}")
+            attacks.append({"to_hit": int(attack.get("to_hit", 0)), "damage": parse_damage(attack.get("damage", 0)), "condition": condition, "duration": int(attack.get("duration", 1))})
+        count = int(spec.get("count", 1))
+        if count < 1:
+            raise ValueError(f"Error: count must be at least 1: {spec}")
+        for i in range(count):
+            combatants.append({"name": f"{name} {i + 1}" if count > 1 else name, "side": side, "ac": ac, "hp": hp, "init_mod": int(spec.get("init_mod", 0)), "attacks": attacks})
+    names = [c["name"] for c in combatants]
+    if len(set(names)) != len(names):
+        raise ValueError("Error: combatant names must be unique.")
+    if not any(c["side"] == "ally" for c in combatants) or not any(c["side"] == "enemy" for c in combatants):
+        raise ValueError("Error: an encounter needs at least one ally and one enemy.")
+    return combatants
+
+# Helper for rolling damage; critical hits double the dice.
+def _roll_damage(rng, damage, critical):
+    dice, sides, bonus = damage
+    if critical:
+        dice *= 2
+    total = bonus
+    for _ in range(dice):
+        total += rng.randint(1, sides)
+    return max(total, 0)
+
+# Plays one combat to the end and returns (winner, rounds, names of combatants left standing).
+# winner is "allies", "enemies" or "draw" if max_rounds runs out.
+def simulate_combat(combatants, rng, max_rounds=DEFAULT_MAX_ROUNDS):
+    tracker = Tracker()
+    specs = [{"name": c["name"], "side": c["side"], "ac": c["ac"], "hp_cur": c["hp"], "hp_max": c["hp"], "initiative": rng.randint(1, 20) + c["init_mod"], "tiebreak": rng.randint(0, 1 << 20)} for c in combatants]
+    added = tracker.add_warriors(specs)
+    attacks = {w: c["attacks"] for w, c in zip(added, combatants)}
+    tracker.start_combat()
+    actor = tracker.warriors[tracker.current_warrior_index]
+    winner = "draw"
+    while tracker.round_number <= max_rounds:
+        if not actor.is_dead():
+            if actor.has_condition("dying") and not actor.has_condition("stable"):
+                roll = rng.randint(1, 20)
+                if roll == 1:
+                    actor.fail_death_saves(is_critical=True)
+                elif roll == 20:
+                    actor.succeed_death_saves(is_critical=True)
+                elif roll < 10:
+                    actor.fail_death_saves()
+                else:
+                    actor.succeed_death_saves()
+            elif not any(actor.has_condition(name) for name in CANNOT_ACT):
+                foes = tracker.enemies if actor.side == "ally" else tracker.allies
+                for attack in attacks[actor]:
+                    standing = [w for w in foes if w.hp_current > 0 and not w.is_dead()]
+                    if not standing:
+                        break
+                    target = rng.choice(standing)
+                    roll = rng.randint(1, 20)
+                    if roll == 1 or (roll != 20 and roll + attack["to_hit"] < target.ac):
+                        continue
+                    target.take_damage(_roll_damage(rng, attack["damage"], roll == 20), is_critical=(roll == 20))
+                    if attack["condition"] is not None and not target.is_dead():
+                        target.apply_condition(Condition(attack["condition"], attack["duration"], "end", actor, target, "target"))
+        status = tracker.check_team_able()
+        if status["enemies_disabled"]:
+            winner = "allies"
+            break
+        if status["allies_disabled"]:
+            winner = "enemies"
+            break
+        actor = tracker.next_turn()
+    # Combat stops as soon as a side is down, so downed combatants never finish their death saves; only those still able to fight count.
+    standing = [w.name for w in tracker.warriors if w.hp_current > 0 and not any(w.has_condition(name) for name in DISABLING_CONDITIONS)]
+    return winner, min(tracker.round_number, max_rounds), standing
+
+# Runs one chunk of combats in a worker and returns summed counts, so only a few numbers cross the process boundary.
+def _run_chunk(combatants, seed, chunk, count, max_rounds):
+    rng = random.Random(seed * 1000003 + chunk)
+    wins = {"allies": 0, "enemies": 0, "draw": 0}
+    rounds = 0
+    survived = dict.fromkeys((c["name"] for c in combatants), 0)
+    for _ in range(count):
+        winner, n_rounds, standing = simulate_combat(combatants, rng, max_rounds)
+        wins[winner] += 1
+        rounds += n_rounds
+        for name in standing:
+            survived[name] += 1
+    return wins, rounds, survived
+
+# Plays combats on the encounter across a process pool and returns win probabilities, expected rounds,
+# per-combatant rates of still standing at the end, throughput, and the number of workers used. workers defaults to every core; 1 runs in this process.
+def simulate(specs, combats=DEFAULT_COMBATS, workers=None, seed=0, max_rounds=DEFAULT_MAX_ROUNDS):
+    if combats < 1:
+        raise ValueError("Error: combats must be at least 1.")
+    combatants = parse_encounter(specs)
+    chunks = [min(CHUNK_SIZE, combats - start) for start in range(0, combats, CHUNK_SIZE)]
+    # The pool never gets more workers than there are chunks.
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    wins = {"allies": 0, "enemies": 0, "draw": 0}
+    rounds = 0
+    survived = dict.fromkeys((c["name"] for c in combatants), 0)
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_run_chunk(combatants, seed, i, n, max_rounds) for i, n in enumerate(chunks)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_chunk, [combatants] * len(chunks), [seed] * len(chunks), range(len(chunks)), chunks, [max_rounds] * len(chunks)))
+    for chunk_wins, chunk_rounds, chunk_survived in results:
+        for key, n in chunk_wins.items():
+            wins[key] += n
+        rounds += chunk_rounds
+        for name, n in chunk_survived.items():
+            survived[name] += n
+    elapsed = time.perf_counter() - started
+    return {
+        "combats": combats,
+        "win_probability": {key: n / combats for key, n in wins.items()},
+        "expected_rounds": rounds / combats,
+        "survival": {name: n / combats for name, n in survived.items()},
+        "seconds": elapsed,
+        "combats_per_second": combats / elapsed if elapsed > 0 else float("inf"),
+        "workers": workers,
+    }
+
+# Formats a simulate() result for the terminal.
+def format_report(result):
+    lines = [f"{result['combats']} combats on {result['workers']} worker(s) in {result['seconds']:.2f}s ({result['combats_per_second']:.0f} combats/s)"]
+    wins = result["win_probability"]
+    lines.append(f"Allies win {wins['allies']:.1%}, enemies win {wins['enemies']:.1%}, unfinished {wins['draw']:.1%}")
+    lines.append(f"Expected rounds: {result['expected_rounds']:.2f}")
+    lines.append("Still standing at the end (above 0 HP and not slain, dying, unconscious or stable):")
+    width = max(len(name) for name in result["survival"])
+    for name, rate in result["survival"].items():
+        lines.append(f"  {name:<{width}}  {rate:.1%}")
+    return "\n".join(lines)
+
+# Helper for reading "--flag value" options.
+def _option(args, flag, default):
+    if flag in args:
+        i = args.index(flag)
+        if i + 1 >= len(args):
+            raise ValueError(f"Error: {flag} needs a value.")
+        value = args[i + 1]
+        del args[i:i + 2]
+        return int(value)
+    return default
+
+# Primary function/entry point.
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    try:
+        combats = _option(args, "--combats", DEFAULT_COMBATS)
+        workers = _option(args, "--workers", None)
+        seed = _option(args, "--seed", 0)
+        max_rounds = _option(args, "--max-rounds", DEFAULT_MAX_ROUNDS)
+        if len(args) != 1:
+            raise ValueError("Usage: python3 simulator.py encounter.json [--combats N] [--workers N] [--seed N] [--max-rounds N]")
+        with open(args[0], encoding="utf-8") as fh:
+            specs = json.load(fh)
+        result = simulate(specs, combats=combats, workers=workers, seed=seed, max_rounds=max_rounds)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(format_report(result))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
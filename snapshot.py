@@ -0,0 +1,329 @@
+# Compact binary encounter snapshots. Headless; never imports tkinter.
+# Layout (little-endian, every section a run of 32-bit ints except the string blob):
+#   header, one int column per stored column (n rows each), allies and enemies as row numbers,
+#   per-row condition offsets (n + 1), condition records (CONDITION_FIELDS each),
+#   per-row member offsets (n + 1), member records (one int per MEMBER_COLUMNS entry), string offsets (k + 1), UTF-8 string blob.
+# Rows are the tracker's initiative order. Strings (names, sides, condition fields) are stored once and referred to by index.
+# A horde takes one row; its members' records are stored column by column (every hp_max, then every hp_current_max, ...),
+# and a condition record says which member holds it. Rows that are not hordes have no members.
+# A reference to a horde member (as a condition source or target) is stored as -2 - (member * rows + row).
+# Each row keeps its tracker handle, so a loaded encounter hands out the same handles it was saved with.
+# Snapshot maps the file and decodes single rows on demand; to_tracker copies whole columns at once.
+# Version 1 to 3 files still load; versions 2 and 3 kept each horde's member columns as a JSON string in a "horde" column.
+
+# Imports.
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+from engine import Condition, Tracker, Warrior
+from horde import Horde, MEMBER_COLUMNS
+from roster_store import INT_COLUMNS, RosterStore
+
+# Global Constants.
+SNAPSHOT_MAGIC = b"AIS1"
+SNAPSHOT_VERSION = 4
+SNAPSHOT_EXTENSION = ".ais"
+# magic, version, flags, round, index, rows, allies, enemies, conditions, strings.
+HEADER = struct.Struct("<4sHHiiIIIII")
+FLAG_COLUMNAR = 1
+FLAG_STARTED = 2
+# Stands in for None in int fields (eligible_from_round, condition duration, string and row references).
+NONE_INT = -2**31
+# Fields Snapshot.row returns. Every one but "horde" is a stored column; a horde's members have their own sections.
+SNAPSHOT_COLUMNS = INT_COLUMNS + ("eligible", "name", "side", "horde", "handle")
+CONDITION_FIELDS = ("name", "duration", "tick_timing", "source", "target", "tick_owner", "expires_with_source", "expired", "member")
+# Layouts of every version this module reads: (stored columns, condition fields, whether member sections follow the condition records).
+LAYOUTS = {1: (SNAPSHOT_COLUMNS[:-2], CONDITION_FIELDS[:-1], False), 2: (SNAPSHOT_COLUMNS[:-1], CONDITION_FIELDS, False), 3: (SNAPSHOT_COLUMNS, CONDITION_FIELDS, False), 4: (SNAPSHOT_COLUMNS[:-2] + SNAPSHOT_COLUMNS[-1:], CONDITION_FIELDS, True)}
+
+# Helper for turning an int array into little-endian bytes.
+def _le_bytes(values):
+    if sys.byteorder == "big":
+        values = array("i", values)
+        values.byteswap()
+    return values.tobytes()
+
+# Helper for reading little-endian bytes into an int array.
+def _le_array(data):
+    values = array("i")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+# Writes tracker to path as a binary snapshot. The file is written beside path and swapped in, so a failed save leaves any old snapshot intact.
+def save_snapshot(tracker, path):
+    warriors = tracker.warriors
+    rows = {w: i for i, w in enumerate(warriors)}
+    strings = []
+    string_index = {}
+    def intern(value):
+        if value is None:
+            return NONE_INT
+        idx = string_index.get(value)
+        if idx is None:
+            idx = len(strings)
+            strings.append(value)
+            string_index[value] = idx
+        return idx
+    def row_of(value):
+        if value is None:
+            return NONE_INT
+        horde = value.turn_owner
+        if horde is not value:
+            return -2 - (value.index * len(warriors) + rows[horde]) if horde in rows else NONE_INT
+        return rows.get(value, NONE_INT)
+    columns = [array("i", [getattr(w, column) for w in warriors]) for column in INT_COLUMNS]
+    eligible = tracker.eligible_from_round
+    columns.append(array("i", [eligible.get(w.handle, NONE_INT) for w in warriors]))
+    columns.append(array("i", [intern(w.name) for w in warriors]))
+    columns.append(array("i", [intern(w.side) for w in warriors]))
+    columns.append(array("i", [w.handle for w in warriors]))
+    cond_offsets = array("i", [0])
+    cond_records = array("i")
+    for w in warriors:
+        for holder, c in w.held_conditions():
+            member = holder.index if holder is not w else NONE_INT
+            cond_records.extend((intern(c.name), NONE_INT if c.duration is None else c.duration, intern(c.tick_timing), row_of(c.source), row_of(c.target), intern(c.tick_owner), intern(c.expires_with_source), 1 if c.expired else 0, member))
+        cond_offsets.append(len(cond_records) // len(CONDITION_FIELDS))
+    member_offsets = array("i", [0])
+    member_records = array("i")
+    for w in warriors:
+        if isinstance(w, Horde):
+            for column in w.member_columns():
+                member_records.extend(column)
+        member_offsets.append(len(member_records) // len(MEMBER_COLUMNS))
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = array("i", [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+    flags = (FLAG_COLUMNAR if tracker.store is not None else 0) | (FLAG_STARTED if tracker.combat_started else 0)
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, tracker.round_number, tracker.current_warrior_index, len(warriors), len(tracker.allies), len(tracker.enemies), cond_offsets[-1], len(strings))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(header)
+        for column in columns:
+            fh.write(_le_bytes(column))
+        fh.write(_le_bytes(array("i", [rows[w] for w in tracker.allies])))
+        fh.write(_le_bytes(array("i", [rows[w] for w in tracker.enemies])))
+        fh.write(_le_bytes(cond_offsets))
+        fh.write(_le_bytes(cond_records))
+        fh.write(_le_bytes(member_offsets))
+        fh.write(_le_bytes(member_records))
+        fh.write(_le_bytes(string_offsets))
+        fh.write(b"".join(encoded))
+    os.replace(tmp_path, path)
+
+# Checks whether path starts with the snapshot magic bytes.
+def is_snapshot(path):
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    except OSError:
+        return False
+
+# Snapshot class is a read-only, memory-mapped view of a saved encounter. Nothing is decoded until asked for.
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            self._mm.close()
+            raise ValueError(f"Error: {path} is not an encounter snapshot.")
+        magic, version, flags, self.round_number, self.current_warrior_index, n, n_allies, n_enemies, n_conds, n_strings = HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC or version not in LAYOUTS:
+            self._mm.close()
+            raise ValueError(f"Error: {path} is not a version {SNAPSHOT_VERSION} encounter snapshot.")
+        self.version = version
+        self._column_names, self._condition_fields, has_members = LAYOUTS[version]
+        self.columnar = bool(flags & FLAG_COLUMNAR)
+        self.combat_started = bool(flags & FLAG_STARTED)
+        self._n = n
+        # Byte offset of each section.
+        offset = HEADER.size
+        self._columns = {}
+        for column in self._column_names:
+            self._columns[column] = offset
+            offset += 4 * n
+        self._allies = (offset, n_allies)
+        offset += 4 * n_allies
+        self._enemies = (offset, n_enemies)
+        offset += 4 * n_enemies
+        self._cond_offsets = offset
+        offset += 4 * (n + 1)
+        self._cond_records = offset
+        offset += 4 * len(self._condition_fields) * n_conds
+        # Older files have no member sections.
+        self._member_offsets = None
+        if has_members:
+            self._member_offsets = offset
+            offset += 4 * (n + 1)
+            self._member_records = offset
+            offset += 4 * len(MEMBER_COLUMNS) * self._int(self._member_offsets + 4 * n)
+        self._string_offsets = offset
+        offset += 4 * (n_strings + 1)
+        self._string_blob = offset
+        self._strings = {}
+    def __len__(self):
+        return self._n
+    # Releases the mapping. Trackers built by to_tracker stay usable.
+    def close(self):
+        self._mm.close()
+    # Helper for reading one int.
+    def _int(self, offset):
+        return struct.unpack_from("<i", self._mm, offset)[0]
+    # Helper for reading a whole section as an int array.
+    def _ints(self, offset, count):
+        return _le_array(self._mm[offset:offset + 4 * count])
+    # Returns string idx from the string table, decoding it on first use.
+    def string(self, idx):
+        if idx == NONE_INT:
+            return None
+        value = self._strings.get(idx)
+        if value is None:
+            start, end = struct.unpack_from("<ii", self._mm, self._string_offsets + 4 * idx)
+            value = self._mm[self._string_blob + start:self._string_blob + end].decode("utf-8")
+            self._strings[idx] = value
+        return value
+    # Helper for decoding a row reference: a row number, (row, member) for a horde member, or None.
+    def _ref(self, raw):
+        if raw == NONE_INT:
+            return None
+        if raw < 0:
+            return divmod(-2 - raw, self._n)[::-1]
+        return raw
+    # Returns one row's member columns as int arrays in MEMBER_COLUMNS order, or None when the row is not a horde.
+    def _members(self, row):
+        start, end = struct.unpack_from("<ii", self._mm, self._member_offsets + 4 * row)
+        if start == end:
+            return None
+        count = end - start
+        records = self._ints(self._member_records + 4 * len(MEMBER_COLUMNS) * start, len(MEMBER_COLUMNS) * count)
+        return [records[i:i + count] for i in range(0, len(records), count)]
+    # Returns one stat of one row without decoding anything else. For a horde, "horde" is its member columns as lists.
+    def value(self, row, column):
+        if not 0 <= row < self._n:
+            raise IndexError(f"Error: row {row} out of range.")
+        if column == "horde" and self._member_offsets is not None:
+            members = self._members(row)
+            return None if members is None else [list(values) for values in members]
+        if column not in self._columns:
+            return None
+        raw = self._int(self._columns[column] + 4 * row)
+        if column in ("name", "side"):
+            return self.string(raw)
+        if column == "horde":
+            return json.loads(self.string(raw)) if raw != NONE_INT else None
+        return None if raw == NONE_INT else raw
+    # Returns the name of one row.
+    def name(self, row):
+        return self.value(row, "name")
+    # Returns every field of one row as a dict, e.g. for showing it without building the whole tracker.
+    def row(self, row):
+        return {column: self.value(row, column) for column in SNAPSHOT_COLUMNS}
+    # Returns one row's conditions as dicts, with source and target as row numbers ((row, member) for horde members).
+    # member is the horde member holding the condition, or None.
+    def conditions(self, row):
+        start, end = struct.unpack_from("<ii", self._mm, self._cond_offsets + 4 * row)
+        width = len(self._condition_fields)
+        records = self._ints(self._cond_records + 4 * width * start, width * (end - start))
+        out = []
+        for i in range(0, len(records), width):
+            name, duration, timing, source, target, owner, expires, expired = records[i:i + 8]
+            member = records[i + 8] if width > 8 and records[i + 8] != NONE_INT else None
+            out.append({"name": self.string(name), "duration": None if duration == NONE_INT else duration, "tick_timing": self.string(timing), "source": self._ref(source), "target": self._ref(target), "tick_owner": self.string(owner), "expires_with_source": self.string(expires), "expired": bool(expired), "member": member})
+        return out
+    # Builds a live Tracker from the snapshot. columnar defaults to how the encounter was saved.
+    def to_tracker(self, columnar=None):
+        if columnar is None:
+            columnar = self.columnar
+        n = self._n
+        columns = {column: self._ints(self._columns[column], n) for column in self._column_names}
+        names = [self.string(i) for i in columns["name"]]
+        sides = [self.string(i) for i in columns["side"]]
+        if self._member_offsets is not None:
+            # Each horde's member columns are sliced out of one read of the member records.
+            member_offsets = self._ints(self._member_offsets, n + 1)
+            width = len(MEMBER_COLUMNS)
+            member_records = self._ints(self._member_records, width * member_offsets[n])
+            hordes = {}
+            for row in range(n):
+                start, end = member_offsets[row], member_offsets[row + 1]
+                if start != end:
+                    count = end - start
+                    hordes[row] = [member_records[i:i + count] for i in range(width * start, width * end, count)]
+        else:
+            hordes = {row: json.loads(self.string(idx)) for row, idx in enumerate(columns.get("horde", ())) if idx != NONE_INT}
+        c = columns
+        if hordes:
+            # Hordes are not store rows, so each row is built on its own.
+            store = RosterStore() if columnar else None
+            tracker = Tracker(store=store)
+            warriors = []
+            for i in range(n):
+                if i in hordes:
+                    w = Horde(names[i], c["initiative"][i], sides[i], c["ac"][i], 0, len(hordes[i][0]), tiebreak_priority=c["tiebreak_priority"][i])
+                elif columnar:
+                    w = store.add_row(names[i], c["initiative"][i], sides[i], c["ac"][i], c["hp_current"][i], c["hp_max"][i], hp_current_max=c["hp_current_max"][i], tiebreak_priority=c["tiebreak_priority"][i])
+                else:
+                    w = Warrior(names[i], c["initiative"][i], sides[i], c["ac"][i], c["hp_current"][i], c["hp_max"][i], hp_current_max=c["hp_current_max"][i], tiebreak_priority=c["tiebreak_priority"][i])
+                warriors.append(w)
+        elif columnar:
+            store = RosterStore()
+            # Stat columns are copied in one go; per-row work is only the name, side code and view.
+            warriors = store.load_columns(names, sides, columns)
+            tracker = Tracker(store=store)
+        else:
+            tracker = Tracker()
+            warriors = [Warrior(names[i], c["initiative"][i], sides[i], c["ac"][i], c["hp_current"][i], c["hp_max"][i], hp_current_max=c["hp_current_max"][i], tiebreak_priority=c["tiebreak_priority"][i]) for i in range(n)]
+        # Files from before handles were saved number rows in initiative order.
+        handles = columns.get("handle", range(n))
+        for w, handle in zip(warriors, handles):
+            tracker._attach(w, handle)
+        tracker.warriors = list(warriors)
+        tracker.allies = [warriors[i] for i in self._ints(*self._allies)]
+        tracker.enemies = [warriors[i] for i in self._ints(*self._enemies)]
+        # Conditions go on before the death save counts, since applying some of them resets death saves.
+        offsets = self._ints(self._cond_offsets, n + 1)
+        if offsets[n]:
+            width = len(self._condition_fields)
+            records = self._ints(self._cond_records, width * offsets[n])
+            # Helper for turning a stored reference back into a combatant.
+            def combatant(raw):
+                ref = self._ref(raw)
+                if isinstance(ref, tuple):
+                    return warriors[ref[0]].member(ref[1])
+                return None if ref is None else warriors[ref]
+            for row in range(n):
+                for i in range(offsets[row] * width, offsets[row + 1] * width, width):
+                    name, duration, timing, source, target, owner, expires, expired = records[i:i + 8]
+                    holder = warriors[row]
+                    if width > 8 and records[i + 8] != NONE_INT:
+                        holder = holder.member(records[i + 8])
+                    cond = Condition(self.string(name), None if duration == NONE_INT else duration, self.string(timing), combatant(source), combatant(target), self.string(owner), self.string(expires))
+                    cond.expired = bool(expired)
+                    holder.apply_condition(cond)
+        for column in ("hp_current", "death_save_failures", "death_save_successes"):
+            if columnar and not hordes:
+                setattr(store, column, array("i", columns[column]))
+            else:
+                for i, (w, value) in enumerate(zip(warriors, columns[column])):
+                    if i not in hordes:
+                        setattr(w, column, value)
+        for row, member_columns in hordes.items():
+            warriors[row].restore_member_columns(member_columns)
+        tracker.eligible_from_round = {w.handle: e for w, e in zip(warriors, columns["eligible"]) if e != NONE_INT}
+        tracker.round_number = self.round_number
+        tracker.current_warrior_index = self.current_warrior_index
+        tracker.combat_started = self.combat_started
+        return tracker
+
+# Loads the snapshot at path straight into a Tracker.
+def load_snapshot(path, columnar=None):
+    snap = Snapshot(path)
+    try:
+        return snap.to_tracker(columnar=columnar)
+    finally:
+        snap.close()
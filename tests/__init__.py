@@ -0,0 +1 @@
+# Tests for the headless modules. Run from the repository root with "python3 -m unittest" (or "python3 -m pytest").
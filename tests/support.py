@@ -0,0 +1,29 @@
+# Shared helpers for the tests. Headless; never imports tkinter.
+
+# Imports.
+from horde import Horde, MEMBER_COLUMNS
+
+# Global Constants.
+STAT_FIELDS = ("name", "initiative", "side", "ac", "hp_max", "hp_current_max", "hp_current", "death_save_failures", "death_save_successes", "tiebreak_priority")
+
+# Returns everything a tracker shows as plain, comparable data: turn state, roster order by handle, every stat
+# (member columns for a horde), every condition with its holder, source and target handles, and eligible_from_round.
+def encounter_state(tracker):
+    rows = []
+    for w in tracker.warriors:
+        stats = tuple(getattr(w, field) for field in STAT_FIELDS)
+        if isinstance(w, Horde):
+            stats += tuple(tuple(getattr(w, "_" + column)) for column in MEMBER_COLUMNS)
+        conditions = []
+        for holder, c in w.held_conditions():
+            source = tracker.handle_of(c.source) if c.source is not None else None
+            target = tracker.handle_of(c.target) if c.target is not None else None
+            conditions.append((tracker.handle_of(holder), c.name, c.duration, c.tick_timing, c.tick_owner, source, target, c.expired))
+        rows.append((w.handle, stats, sorted(conditions, key=repr)))
+    return {
+        "turn": (tracker.current_warrior_index, tracker.round_number, tracker.combat_started),
+        "rows": rows,
+        "allies": [w.handle for w in tracker.allies],
+        "enemies": [w.handle for w in tracker.enemies],
+        "eligible": {w.handle: tracker.eligible_from_round.get(w.handle) for w in tracker.warriors},
+    }
@@ -0,0 +1,80 @@
+# Tests for area damage: per-target results, broken concentration with its cause, and the conditions it cascades away.
+
+# Imports.
+import unittest
+from engine import Condition, Tracker
+from history import UndoHistory
+from roster_store import RosterStore
+from tests.support import encounter_state
+
+class DamageAreaTest(unittest.TestCase):
+    def setUp(self):
+        self.tracker = Tracker()
+        self.mage = self.tracker.add_warrior("Mage", 18, "enemy", 12, 9, 9, None)
+        self.priest = self.tracker.add_warrior("Priest", 14, "enemy", 13, 30, 30, None)
+        self.hero = self.tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        self.tracker.start_combat()
+        mage, priest, hero = self.mage, self.priest, self.hero
+        mage.apply_condition(Condition("concentration", None, "end", mage, mage, "target"))
+        hero.apply_condition(Condition("restrained", 3, "end", mage, hero, "target", "concentration"))
+        priest.apply_condition(Condition("concentration", None, "end", priest, priest, "target"))
+        hero.apply_condition(Condition("charmed", None, "end", priest, hero, "target", "concentration"))
+
+    def test_results_follow_targets(self):
+        outcome = self.tracker.damage_area([self.mage, self.priest, self.hero], [4, 5, 6])
+        self.assertEqual(outcome["results"], [None, None, None])
+        self.assertEqual(outcome["concentration_lost"], [])
+        self.assertEqual([w.hp_current for w in (self.mage, self.priest, self.hero)], [5, 25, 14])
+
+    def test_slain_caster_drops_concentration_and_its_conditions(self):
+        outcome = self.tracker.damage_area([self.mage, self.priest], [30, 5])
+        self.assertEqual(outcome["results"], ["slain", None])
+        [(holder, cause, cascaded)] = outcome["concentration_lost"]
+        self.assertIs(holder, self.mage)
+        self.assertEqual(cause, "slain")
+        self.assertEqual([(w, c.name) for w, c in cascaded], [(self.hero, "restrained")])
+        self.assertEqual([c.name for c in self.hero.conditions], ["charmed"])
+        self.assertFalse(self.mage.has_condition("concentration"))
+        self.assertTrue(self.priest.has_condition("concentration"))
+
+    def test_cause_prefers_this_hit_over_an_older_condition(self):
+        self.mage.apply_condition(Condition("incapacitated", 1, "end", self.hero, self.mage, "target"))
+        outcome = self.tracker.damage_area([self.mage], [30])
+        self.assertEqual([cause for _, cause, _ in outcome["concentration_lost"]], ["slain"])
+
+    def test_caster_hit_twice_is_handled_once(self):
+        outcome = self.tracker.damage_area([self.priest, self.priest], [20, 20])
+        self.assertEqual(outcome["results"], [None, "slain"])
+        self.assertEqual(len(outcome["concentration_lost"]), 1)
+        self.assertEqual([c.name for c in self.hero.conditions], ["restrained"])
+
+    def test_mismatched_amounts(self):
+        with self.assertRaises(ValueError):
+            self.tracker.damage_area([self.mage, self.priest], [3])
+
+class DamageAreaRowsTest(unittest.TestCase):
+    def test_store_rows_and_undo(self):
+        tracker = Tracker(store=RosterStore())
+        history = UndoHistory().attach(tracker)
+        specs = [{"name": f"Cultist {i}", "initiative": 10 + i % 3, "side": "enemy", "ac": 12, "hp_cur": 9, "hp_max": 9} for i in range(6)]
+        cultists = tracker.add_warriors(specs)
+        hero = tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        tracker.start_combat()
+        leader = cultists[0]
+        leader.apply_condition(Condition("concentration", None, "end", leader, leader, "target"))
+        hero.apply_condition(Condition("frightened", 2, "end", leader, hero, "target", "concentration"))
+        history.clear()
+        before = encounter_state(tracker)
+        outcome = tracker.damage_area(cultists, [9, 3, 3, 12, 0, 1])
+        self.assertEqual(outcome["results"], ["slain", None, None, "slain", None, None])
+        self.assertEqual([(w.name, cause) for w, cause, _ in outcome["concentration_lost"]], [("Cultist 0", "slain")])
+        self.assertFalse(hero.conditions)
+        after = encounter_state(tracker)
+        tracker.undo()
+        self.assertEqual(encounter_state(tracker), before)
+        self.assertTrue(hero.has_condition("frightened"))
+        tracker.redo()
+        self.assertEqual(encounter_state(tracker), after)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Tests for the encounter journal: replay and resume must rebuild exactly the state that was recorded.
+
+# Imports.
+import os
+import tempfile
+import unittest
+from engine import Condition, Tracker
+from event_log import EventLog, replay, resume
+from history import UndoHistory
+from roster_store import RosterStore
+from tests.support import encounter_state
+
+# Plays a short encounter with a horde, conditions, turns, area damage, undo and redo on tracker.
+def play(tracker):
+    hero = tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+    orc = tracker.add_warrior("Orc", 12, "enemy", 13, 15, 15, None)
+    goblins = tracker.add_horde("Goblin", 10, "enemy", 13, 7, 4)
+    tracker.start_combat()
+    hero.apply_condition(Condition("concentration", None, "end", hero, hero, "target"))
+    orc.apply_condition(Condition("frightened", 2, "end", hero, orc, "target", "concentration"))
+    goblins.member(1).apply_condition(Condition("poisoned", 1, "end", orc, goblins.member(1), "target"))
+    tracker.damage_area([goblins, goblins.member(1), orc], [3, 2, 6])
+    tracker.next_turn()
+    hero.take_damage(30)
+    tracker.undo()
+    tracker.undo()
+    tracker.redo()
+    goblins.adjust_max_hp(2)
+    tracker.next_turn()
+    tracker.next_turn()
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "encounter.log")
+    def tearDown(self):
+        self._dir.cleanup()
+    # Records play() into the journal and returns the live tracker's final state.
+    def record(self, snapshot_every=500, store=None):
+        tracker = Tracker(store=store)
+        UndoHistory().attach(tracker)
+        log = EventLog(self.path, snapshot_every=snapshot_every).attach(tracker)
+        play(tracker)
+        log.close()
+        return encounter_state(tracker)
+
+    def test_replay_matches_live_tracker(self):
+        expected = self.record()
+        self.assertEqual(encounter_state(replay(self.path)), expected)
+
+    def test_replay_from_snapshots_matches(self):
+        expected = self.record(snapshot_every=3)
+        self.assertEqual(encounter_state(replay(self.path)), expected)
+        # Only the base and the latest snapshot are kept.
+        with open(self.path + ".snap", "rb") as fh:
+            self.assertLessEqual(len(fh.readlines()), 2)
+
+    def test_replay_with_columnar_store(self):
+        expected = self.record(store=RosterStore())
+        self.assertEqual(encounter_state(replay(self.path)), expected)
+
+    def test_replay_upto_stops_early(self):
+        self.record()
+        tracker = replay(self.path, upto=3)
+        self.assertEqual([w.name for w in tracker.warriors], ["Hero", "Orc", "Goblin"])
+        self.assertFalse(tracker.combat_started)
+
+    def test_resume_drops_torn_last_line_and_keeps_recording(self):
+        expected = self.record()
+        size = os.path.getsize(self.path)
+        with open(self.path, "ab") as fh:
+            fh.write(b'[999,-1,"next_tu')
+        tracker, log = resume(self.path)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(encounter_state(tracker), expected)
+        tracker.warriors[1].take_damage(4)
+        tracker.next_turn()
+        log.close()
+        self.assertEqual(encounter_state(replay(self.path)), encounter_state(tracker))
+
+    def test_resume_refuses_a_file_that_is_not_a_journal(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write("Session notes\nRemember the ogre.\n")
+        with self.assertRaises(ValueError):
+            resume(self.path)
+        with open(self.path, encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), "Session notes\nRemember the ogre.\n")
+
+if __name__ == "__main__":
+    unittest.main()
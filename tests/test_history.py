@@ -0,0 +1,130 @@
+# Round-trip tests for the undo history: every step undone and redone must land on exactly the state it started from.
+
+# Imports.
+import unittest
+from engine import Condition, Tracker
+from history import UndoHistory
+from horde import MEMBER_COLUMNS
+from roster_store import RosterStore
+from tests.support import encounter_state
+
+# Runs each action as its own undo step, then undoes all of them and redoes all of them, checking the state after every move.
+# Setup done before the call is not part of the round trip.
+def round_trip(test, tracker, actions):
+    tracker.history.clear()
+    states = [encounter_state(tracker)]
+    for action in actions:
+        action()
+        states.append(encounter_state(tracker))
+    for expected in reversed(states[:-1]):
+        test.assertIsNotNone(tracker.undo())
+        test.assertEqual(encounter_state(tracker), expected)
+    test.assertIsNone(tracker.undo())
+    for expected in states[1:]:
+        test.assertIsNotNone(tracker.redo())
+        test.assertEqual(encounter_state(tracker), expected)
+    test.assertIsNone(tracker.redo())
+
+# Helper for a condition on target, from source.
+def condition(name, target, source=None, duration=None):
+    return Condition(name, duration, "end", source, target, "target")
+
+class UndoRoundTripTest(unittest.TestCase):
+    def test_warriors(self):
+        tracker = Tracker()
+        UndoHistory().attach(tracker)
+        hero = tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        orc = tracker.add_warrior("Orc", 12, "enemy", 13, 15, 15, None)
+        round_trip(self, tracker, [
+            lambda: tracker.add_warrior("Mage", 18, "ally", 12, 9, 9, None),
+            tracker.start_combat,
+            lambda: hero.apply_condition(condition("concentration", hero, hero)),
+            lambda: orc.apply_condition(condition("frightened", orc, hero, duration=2)),
+            lambda: orc.take_damage(20),
+            lambda: hero.take_damage(25),
+            hero.fail_death_saves,
+            tracker.next_turn,
+            tracker.next_turn,
+            lambda: hero.heal(5),
+            lambda: hero.adjust_max_hp(-4),
+        ])
+
+    def test_horde_members(self):
+        tracker = Tracker()
+        UndoHistory().attach(tracker)
+        hero = tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 6)
+        round_trip(self, tracker, [
+            tracker.start_combat,
+            lambda: goblins.member(2).take_damage(3),
+            lambda: goblins.member(2).apply_condition(condition("concentration", goblins.member(2), goblins.member(2))),
+            lambda: goblins.member(4).apply_condition(condition("poisoned", goblins.member(4), hero, duration=1)),
+            lambda: goblins.take_damage(2),
+            lambda: tracker.damage_area([goblins.member(2), goblins, hero], [9, 1, 4]),
+            lambda: goblins.adjust_max_hp(3),
+            lambda: goblins.heal(2),
+            lambda: goblins.member(0).take_damage(40),
+            tracker.next_turn,
+        ])
+
+    def test_grouped_member_and_horde_changes(self):
+        # A member changed before its horde is imaged, inside one step, must still come back to its own before values.
+        tracker = Tracker()
+        history = UndoHistory().attach(tracker)
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 4)
+        before = encounter_state(tracker)
+        history.begin("Mixed")
+        goblins.member(1).take_damage(3)
+        goblins.take_damage(2)
+        goblins.member(1).take_damage(1)
+        history.end()
+        after = encounter_state(tracker)
+        tracker.undo()
+        self.assertEqual(encounter_state(tracker), before)
+        tracker.redo()
+        self.assertEqual(encounter_state(tracker), after)
+
+    def test_store_rows(self):
+        tracker = Tracker(store=RosterStore())
+        UndoHistory().attach(tracker)
+        specs = [{"name": f"Skeleton {i}", "initiative": 10 + i % 3, "side": "enemy", "ac": 13, "hp_cur": 13, "hp_max": 13} for i in range(8)]
+        tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        round_trip(self, tracker, [
+            lambda: tracker.add_warriors(specs),
+            tracker.start_combat,
+            lambda: tracker.damage_many(tracker.enemies, [4] * len(tracker.enemies)),
+            lambda: tracker.damage_area(tracker.enemies[:3], [20, 20, 2]),
+            lambda: tracker.heal_many(tracker.enemies, [3] * len(tracker.enemies)),
+            lambda: tracker.enemies[4].apply_condition(condition("prone", tracker.enemies[4])),
+            tracker.sort_warriors,
+            tracker.next_turn,
+        ])
+
+class UndoBudgetTest(unittest.TestCase):
+    def test_member_hit_images_only_the_member(self):
+        tracker = Tracker()
+        history = UndoHistory().attach(tracker)
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 1000)
+        goblins.member(5).take_damage(3)
+        step = history._undo[-1]
+        self.assertEqual(list(step.stats), [goblins.member(5)])
+        self.assertLess(step.cells, 10)
+
+    def test_horde_image_counts_every_member_value(self):
+        tracker = Tracker()
+        history = UndoHistory().attach(tracker)
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 1000)
+        goblins.take_damage(1)
+        self.assertGreaterEqual(history._undo[-1].cells, len(goblins) * len(MEMBER_COLUMNS))
+
+    def test_max_cells_drops_oldest_steps(self):
+        tracker = Tracker()
+        history = UndoHistory(max_cells=3000).attach(tracker)
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 70, 500)
+        for _ in range(5):
+            goblins.take_damage(1)
+        self.assertLessEqual(history._cells, 3000)
+        self.assertEqual(len(history._undo), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Tests for hordes: per-member damage, healing and max hp rules, member conditions, and hordes in snapshots.
+
+# Imports.
+import os
+import tempfile
+import unittest
+from engine import Condition, Tracker
+from horde import MEMBER_COLUMNS
+from snapshot import Snapshot, load_snapshot, save_snapshot
+from tests.support import encounter_state
+
+class HordeRulesTest(unittest.TestCase):
+    def setUp(self):
+        self.tracker = Tracker()
+        self.goblins = self.tracker.add_horde("Goblin", 12, "enemy", 13, 7, 4)
+
+    def test_damage_hits_every_member(self):
+        goblins = self.goblins
+        goblins.member(0).take_damage(3)
+        self.assertIsNone(goblins.take_damage(5))
+        self.assertEqual(list(goblins._hp_current), [0, 2, 2, 2])
+        self.assertEqual(goblins.condition_counts(), {"slain": 1})
+        self.assertEqual(len(goblins.standing()), 3)
+        self.assertEqual(goblins.take_damage(10), "slain")
+        self.assertTrue(goblins.is_dead())
+        self.assertTrue(self.tracker.check_team_able()["enemies_disabled"])
+
+    def test_allied_members_go_dying(self):
+        wolves = self.tracker.add_horde("Wolf", 14, "ally", 13, 11, 2)
+        wolves.take_damage(11)
+        self.assertEqual(wolves.condition_counts(), {"dying": 2})
+        self.assertTrue(self.tracker.check_team_able()["allies_disabled"])
+
+    def test_heal_is_per_member_and_capped(self):
+        goblins = self.goblins
+        goblins.member(1).take_damage(5)
+        goblins.member(2).take_damage(1)
+        goblins.heal(3)
+        self.assertEqual(list(goblins._hp_current), [7, 5, 7, 7])
+
+    def test_max_hp_delta_is_per_member(self):
+        goblins = self.goblins
+        goblins.adjust_max_hp(-2)
+        self.assertEqual(list(goblins._hp_current_max), [5] * 4)
+        self.assertEqual(list(goblins._hp_current), [5] * 4)
+        self.assertEqual(goblins.hp_current_max, 20)
+
+    def test_conditions_go_to_each_living_member(self):
+        goblins = self.goblins
+        goblins.member(3).take_damage(20)
+        goblins.apply_condition(Condition("frightened", 1, "end", None, goblins, "target"))
+        self.assertEqual(goblins.condition_counts(), {"slain": 1, "frightened": 3})
+        self.assertFalse(goblins.member(3).has_condition("frightened"))
+        self.assertEqual(self.tracker.handle_of(goblins.member(2)), (goblins.handle, 2))
+        self.assertIs(self.tracker.lookup((goblins.handle, 2)), goblins.member(2))
+
+class HordeSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "hordes.ais")
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_member_columns_round_trip(self):
+        tracker = Tracker()
+        goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 4)
+        tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+        rats = tracker.add_horde("Rat", 3, "enemy", 10, 2, 3)
+        goblins.member(1).take_damage(3)
+        goblins.member(2).apply_condition(Condition("prone", 2, "start", None, goblins.member(2), "target"))
+        rats.adjust_max_hp(1)
+        save_snapshot(tracker, self.path)
+        snap = Snapshot(self.path)
+        try:
+            rows = {snap.name(row): row for row in range(len(snap))}
+            self.assertEqual(snap.value(rows["Goblin"], "horde"), [list(column) for column in goblins.member_columns()])
+            self.assertEqual(len(snap.value(rows["Rat"], "horde")), len(MEMBER_COLUMNS))
+            self.assertIsNone(snap.value(rows["Hero"], "horde"))
+            self.assertEqual([c["member"] for c in snap.conditions(rows["Goblin"])], [2])
+        finally:
+            snap.close()
+        self.assertEqual(encounter_state(load_snapshot(self.path)), encounter_state(tracker))
+
+if __name__ == "__main__":
+    unittest.main()
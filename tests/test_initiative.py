@@ -0,0 +1,64 @@
+# Tests for the batch initiative roller and its tiebreak priorities.
+
+# Imports.
+import random
+import unittest
+from engine import Tracker
+from initiative import reranked_priorities, roll_initiative, roll_specs, tiebreak_priority
+
+class RollInitiativeTest(unittest.TestCase):
+    def test_same_seed_same_rolls(self):
+        modifiers = [2, 0, -1, 5] * 25
+        dex = [14, 10, 8, 20] * 25
+        sides = ["enemy", "ally", "enemy", "enemy"] * 25
+        first = roll_initiative(modifiers, dex, sides, seed=7)
+        self.assertEqual(roll_initiative(modifiers, dex, sides, seed=7), first)
+        self.assertEqual(roll_initiative(modifiers, dex, sides, rng=random.Random(7)), first)
+        self.assertNotEqual(roll_initiative(modifiers, dex, sides, seed=8), first)
+
+    def test_rolls_are_in_range(self):
+        initiatives, _ = roll_initiative([3] * 500, seed=1)
+        self.assertTrue(all(4 <= value <= 23 for value in initiatives))
+
+    def test_priorities_order_by_dex_then_rolloff(self):
+        _, priorities = roll_initiative([0] * 4, [18, 18, 12, 12], ["enemy", "enemy", "ally", "ally"], seed=3)
+        self.assertLess(max(priorities[:2]), min(priorities[2:]))
+        # Enemies sharing a dex get distinct roll-offs; allies sharing one are left tied.
+        self.assertNotEqual(priorities[0], priorities[1])
+        self.assertEqual(priorities[2], priorities[3])
+
+    def test_bad_input(self):
+        with self.assertRaises(ValueError):
+            roll_initiative([0, 0], [10])
+        with self.assertRaises(ValueError):
+            tiebreak_priority(31)
+        with self.assertRaises(ValueError):
+            roll_specs([{"name": "Goblin"}])
+
+    def test_roll_specs_feeds_add_warriors(self):
+        specs = [{"name": f"Goblin {i}", "init_mod": 2, "dex": 14, "side": "enemy", "ac": 15, "hp_cur": 7, "hp_max": 7} for i in range(50)]
+        rolled = roll_specs(specs, seed=11)
+        self.assertEqual(rolled, roll_specs(specs, seed=11))
+        tracker = Tracker()
+        tracker.add_warriors(rolled)
+        self.assertEqual(tracker.get_unresolved_ties(), {})
+
+class RerankTest(unittest.TestCase):
+    def test_reranked_priorities_are_distinct_and_keep_bands(self):
+        tied = tiebreak_priority(12)
+        self.assertEqual(reranked_priorities([tied, tied, tied]), [tied, tied + 1, tied + 2])
+        self.assertEqual(reranked_priorities([5, 1, 3]), [1, 3, 5])
+
+    def test_later_rolls_sort_by_dex_around_a_settled_group(self):
+        tracker = Tracker()
+        base = {"initiative": 12, "side": "ally", "ac": 12, "hp_cur": 9, "hp_max": 9}
+        a, b = tracker.add_warriors([dict(base, name="A", tiebreak=tiebreak_priority(12)), dict(base, name="B", tiebreak=tiebreak_priority(12))])
+        # Settled by hand as B before A.
+        for w, priority in zip([b, a], reranked_priorities([b.tiebreak_priority, a.tiebreak_priority])):
+            tracker.set_tiebreak_priority(w, priority)
+        tracker.sort_warriors()
+        tracker.add_warriors([dict(base, name="Fast", side="enemy", tiebreak=tiebreak_priority(16, 5)), dict(base, name="Slow", side="enemy", tiebreak=tiebreak_priority(8, 5))])
+        self.assertEqual([w.name for w in tracker.warriors], ["Fast", "B", "A", "Slow"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Tests for the Monte Carlo simulator: damage parsing, encounter checks, and seeded results that do not depend on the worker count.
+
+# Imports.
+import random
+import unittest
+from simulator import CHUNK_SIZE, parse_damage, parse_encounter, simulate, simulate_combat
+
+# A small, quick encounter: two heroes against a pack of goblins.
+ENCOUNTER = [
+    {"name": "Fighter", "side": "ally", "ac": 17, "hp": 28, "init_mod": 1, "attacks": [{"to_hit": 5, "damage": "1d8+3"}]},
+    {"name": "Cleric", "side": "ally", "ac": 16, "hp": 22, "init_mod": 0, "attacks": [{"to_hit": 4, "damage": "1d6+2", "condition": "frightened", "duration": 1}]},
+    {"name": "Goblin", "side": "enemy", "ac": 13, "hp": 7, "init_mod": 2, "count": 4, "attacks": [{"to_hit": 4, "damage": "1d6+2"}]},
+]
+
+class ParseTest(unittest.TestCase):
+    def test_parse_damage(self):
+        self.assertEqual(parse_damage("2d6+3"), (2, 6, 3))
+        self.assertEqual(parse_damage("1d8"), (1, 8, 0))
+        self.assertEqual(parse_damage("1d4 - 1"), (1, 4, -1))
+        self.assertEqual(parse_damage("5"), (0, 0, 5))
+        self.assertEqual(parse_damage(7), (0, 0, 7))
+        for bad in ("", "2d", "1d0", "fireball"):
+            with self.assertRaises(ValueError):
+                parse_damage(bad)
+
+    def test_parse_encounter(self):
+        combatants = parse_encounter(ENCOUNTER)
+        self.assertEqual([c["name"] for c in combatants], ["Fighter", "Cleric", "Goblin 1", "Goblin 2", "Goblin 3", "Goblin 4"])
+        with self.assertRaises(ValueError):
+            parse_encounter(ENCOUNTER[:2])
+        with self.assertRaises(ValueError):
+            parse_encounter([dict(ENCOUNTER[0], attacks=[{"condition": "blessed"}]), ENCOUNTER[2]])
+
+class SimulateTest(unittest.TestCase):
+    def test_one_combat_reports_only_fighters_still_up(self):
+        combatants = parse_encounter(ENCOUNTER)
+        winner, rounds, standing = simulate_combat(combatants, random.Random(5))
+        self.assertIn(winner, ("allies", "enemies", "draw"))
+        self.assertGreaterEqual(rounds, 1)
+        winners = {"allies": "ally", "enemies": "enemy"}.get(winner)
+        if winners is not None:
+            sides = {c["name"]: c["side"] for c in combatants}
+            self.assertTrue(standing)
+            self.assertTrue(all(sides[name] == winners for name in standing))
+
+    def test_same_seed_same_result_on_any_worker_count(self):
+        combats = CHUNK_SIZE * 2 + 10
+        serial = simulate(ENCOUNTER, combats=combats, workers=1, seed=3)
+        pooled = simulate(ENCOUNTER, combats=combats, workers=2, seed=3)
+        for key in ("win_probability", "expected_rounds", "survival"):
+            self.assertEqual(serial[key], pooled[key])
+        self.assertAlmostEqual(sum(serial["win_probability"].values()), 1.0)
+        self.assertNotEqual(simulate(ENCOUNTER, combats=combats, workers=1, seed=4)["survival"], serial["survival"])
+
+    def test_reported_workers_are_clamped_to_chunks(self):
+        result = simulate(ENCOUNTER, combats=10, workers=8, seed=1)
+        self.assertEqual(result["workers"], 1)
+        with self.assertRaises(ValueError):
+            simulate(ENCOUNTER, combats=0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# Tests for binary encounter snapshots: save, lazy reads through Snapshot, and to_tracker round trips.
+
+# Imports.
+import os
+import tempfile
+import unittest
+from engine import Condition, Tracker
+from roster_store import RosterStore
+from snapshot import SNAPSHOT_VERSION, Snapshot, is_snapshot, load_snapshot, save_snapshot
+from tests.support import encounter_state
+
+# Builds a started encounter with conditions, damage and a horde, optionally on the columnar store.
+def build(store=None):
+    tracker = Tracker(store=store)
+    hero = tracker.add_warrior("Hero", 15, "ally", 16, 20, 20, None)
+    specs = [{"name": f"Skeleton {i}", "initiative": 8 + i % 4, "side": "enemy", "ac": 13, "hp_cur": 13, "hp_max": 13} for i in range(6)]
+    skeletons = tracker.add_warriors(specs)
+    goblins = tracker.add_horde("Goblin", 12, "enemy", 13, 7, 5)
+    tracker.start_combat()
+    hero.apply_condition(Condition("concentration", None, "end", hero, hero, "target"))
+    skeletons[0].apply_condition(Condition("restrained", 3, "end", hero, skeletons[0], "target", "concentration"))
+    goblins.member(3).apply_condition(Condition("poisoned", 2, "start", skeletons[1], goblins.member(3), "source"))
+    tracker.damage_many(skeletons, [4, 5, 20, 0, 1, 2])
+    goblins.member(3).take_damage(5)
+    goblins.member(4).take_damage(10)
+    hero.adjust_max_hp(-3)
+    tracker.next_turn()
+    tracker.next_turn()
+    return tracker
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "encounter.ais")
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_round_trip(self):
+        tracker = build()
+        save_snapshot(tracker, self.path)
+        self.assertTrue(is_snapshot(self.path))
+        self.assertEqual(encounter_state(load_snapshot(self.path)), encounter_state(tracker))
+
+    def test_round_trip_columnar(self):
+        tracker = build(store=RosterStore())
+        save_snapshot(tracker, self.path)
+        loaded = load_snapshot(self.path)
+        self.assertIsNotNone(loaded.store)
+        self.assertEqual(encounter_state(loaded), encounter_state(tracker))
+        # Either backend can be asked for on load.
+        self.assertEqual(encounter_state(load_snapshot(self.path, columnar=False)), encounter_state(tracker))
+
+    def test_lazy_reads(self):
+        tracker = build()
+        save_snapshot(tracker, self.path)
+        snap = Snapshot(self.path)
+        try:
+            self.assertEqual(snap.version, SNAPSHOT_VERSION)
+            self.assertEqual(len(snap), len(tracker.warriors))
+            for row, w in enumerate(tracker.warriors):
+                self.assertEqual(snap.name(row), w.name)
+                self.assertEqual(snap.value(row, "hp_current"), w.hp_current)
+                self.assertEqual(snap.value(row, "handle"), w.handle)
+            hero_row = tracker.warriors.index(tracker.lookup(0))
+            self.assertEqual([c["name"] for c in snap.conditions(hero_row)], ["concentration"])
+            with self.assertRaises(IndexError):
+                snap.value(len(tracker.warriors), "name")
+        finally:
+            snap.close()
+
+    def test_loaded_tracker_keeps_handles(self):
+        tracker = build()
+        save_snapshot(tracker, self.path)
+        loaded = load_snapshot(self.path)
+        added = loaded.add_warrior("Late", 1, "ally", 10, 5, 5, None)
+        self.assertEqual(added.handle, max(w.handle for w in tracker.warriors) + 1)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as fh:
+            fh.write(b"not a snapshot at all, just some text")
+        self.assertFalse(is_snapshot(self.path))
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+if __name__ == "__main__":
+    unittest.main()